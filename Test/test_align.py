@@ -0,0 +1,98 @@
+import numpy as np
+
+from sub_generation.align import align_words, speech_segments
+from sub_generation.sub import align_words_offline, format_timestamp, parse_srt, timestamp_to_seconds, write_word_srt
+from utils.ffmpeg import encode_audio
+
+SAMPLE_RATE = 16000
+
+
+def narration(*spans, duration):
+    # A 220 Hz tone over each (start, end) span on a faint noise floor
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 1e-4, int(duration * SAMPLE_RATE)).astype(np.float32)
+    for start, end in spans:
+        t = np.arange(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)) / SAMPLE_RATE
+        samples[int(start * SAMPLE_RATE):int(start * SAMPLE_RATE) + len(t)] += 0.3 * np.sin(2 * np.pi * 220 * t)
+    return samples
+
+
+def test_speech_segments_find_the_spans_of_speech():
+    samples = narration((0.5, 1.5), (2.0, 3.0), duration=3.5)
+    segments = speech_segments(samples, SAMPLE_RATE)
+    assert len(segments) == 2
+    for (start, end), (expected_start, expected_end) in zip(segments, [(0.5, 1.5), (2.0, 3.0)]):
+        assert abs(start - expected_start) <= 0.02
+        assert abs(end - expected_end) <= 0.02
+
+
+def test_speech_segments_bridge_short_pauses_and_drop_clicks():
+    # A 50 ms pause is part of the speech, a 20 ms burst is noise
+    samples = narration((0.5, 1.0), (1.05, 1.5), (2.5, 2.52), duration=3.0)
+    segments = speech_segments(samples, SAMPLE_RATE)
+    assert len(segments) == 1
+    assert abs(segments[0][0] - 0.5) <= 0.02
+    assert abs(segments[0][1] - 1.5) <= 0.02
+
+
+def test_speech_segments_of_too_short_audio():
+    assert speech_segments(np.zeros(10, dtype=np.float32), SAMPLE_RATE) == []
+
+
+def test_align_words_skip_the_silences():
+    samples = narration((0.5, 1.5), (2.0, 3.0), duration=3.5)
+    aligned = align_words("paper, table", samples, SAMPLE_RATE)
+
+    assert [word for word, _, _ in aligned] == ["paper", "table"]
+    (_, first_start, first_end), (_, second_start, second_end) = aligned
+    # Words of the same weight over two equal spans of speech get one span each
+    assert abs(first_start - 0.5) <= 0.02 and abs(first_end - 1.5) <= 0.02
+    assert abs(second_start - 2.0) <= 0.02 and abs(second_end - 3.0) <= 0.02
+
+
+def test_align_words_are_ordered_and_inside_the_speech():
+    samples = narration((0.2, 1.4), (1.9, 2.6), (3.0, 4.8), duration=5.0)
+    aligned = align_words("The quick brown fox jumps over the extraordinarily lazy dog.", samples, SAMPLE_RATE)
+    segments = speech_segments(samples, SAMPLE_RATE)
+
+    assert len(aligned) == 10
+    previous_end = 0.0
+    for word, start, end in aligned:
+        assert start >= previous_end - 1e-6
+        assert end > start
+        assert any(seg_start - 1e-6 <= start and end <= seg_end + 1e-6 for seg_start, seg_end in segments), word
+        previous_end = end
+    # Longer words take longer to say
+    durations = {word: end - start for word, start, end in aligned}
+    assert durations["extraordinarily"] > durations["fox"]
+
+
+def test_align_words_without_words_or_speech():
+    samples = narration((0.5, 1.5), duration=2.0)
+    assert align_words("  ... ", samples, SAMPLE_RATE) == []
+    assert align_words("hello", np.zeros(5, dtype=np.float32), SAMPLE_RATE) == []
+
+
+def test_offline_alignment_writes_a_word_level_srt(tmp_path):
+    audio_path = str(tmp_path / "narration.wav")
+    encode_audio(narration((0.5, 1.5), (2.0, 3.0), duration=3.5), SAMPLE_RATE, audio_path)
+    words = align_words_offline(audio_path, "paper table", sample_rate=SAMPLE_RATE)
+
+    srt_path = str(tmp_path / "words.srt")
+    write_word_srt(words, srt_path)
+    subtitles = parse_srt(srt_path)
+    assert [text for _, _, text in subtitles] == ["paper", "table"]
+    for (start, end, _), (_, word_start, word_end) in zip(subtitles, words):
+        assert abs(start - word_start) <= 0.0005 and abs(end - word_end) <= 0.0005
+
+
+def test_srt_timestamps_round_to_whole_milliseconds():
+    assert format_timestamp(0) == "00:00:00,000"
+    assert format_timestamp(1.2344) == "00:00:01,234"
+    assert format_timestamp(1.2346) == "00:00:01,235"
+    # Rounding up carries into the seconds, minutes and hours instead of printing 1000 ms
+    assert format_timestamp(1.9996) == "00:00:02,000"
+    assert format_timestamp(59.9999) == "00:01:00,000"
+    assert format_timestamp(3599.9999) == "01:00:00,000"
+    assert format_timestamp(3723.5) == "01:02:03,500"
+    assert timestamp_to_seconds(format_timestamp(3723.5)) == 3723.5
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from pipeline.artifact_cache import ArtifactCache
+
+
+def cache_files(cache):
+    return sorted(os.path.relpath(os.path.join(root, name), cache.cache_folder) for root, _, names in os.walk(cache.cache_folder) for name in names)
+
+
+def test_keys_depend_on_stage_inputs_and_params(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    key = cache.key("tts", "Hello there.", voice="alloy")
+    assert key.startswith("tts/")
+    assert cache.key("tts", "Hello there.", voice="alloy") == key
+    assert cache.key("tts", "Hello there!", voice="alloy") != key
+    assert cache.key("tts", "Hello there.", voice="echo") != key
+    assert cache.key("stt", "Hello there.", voice="alloy").split("/")[1] != key.split("/")[1]
+
+
+def test_file_inputs_are_keyed_by_content(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    first.write_bytes(b"narration")
+    second.write_bytes(b"narration")
+    # Same content under another name is the same input
+    assert cache.key("stt", str(first)) == cache.key("stt", str(second))
+
+    second.write_bytes(b"other narration")
+    assert cache.key("stt", str(first)) != cache.key("stt", str(second))
+
+
+def test_store_and_restore(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    source = tmp_path / "video.mp4"
+    source.write_bytes(b"video")
+    key = cache.key("render", "plan")
+
+    assert cache.restore(key, ".mp4", str(tmp_path / "out" / "video.mp4")) is None
+    cache.store(key, ".mp4", str(source))
+    restored = cache.restore(key, ".mp4", str(tmp_path / "out" / "video.mp4"))
+    assert restored == str(tmp_path / "out" / "video.mp4")
+    assert open(restored, "rb").read() == b"video"
+    assert cache.cached_path(key, ".mp4") == os.path.join(cache.cache_folder, f"{key}.mp4")
+    assert cache.stats() == {"hits": 2, "misses": 1}
+
+
+def test_least_recently_used_artifacts_are_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_bytes=25)
+    keys = [cache.key("tts", text) for text in ("one", "two")]
+    for index, key in enumerate(keys):
+        cache.store_with(key, ".wav", lambda path: open(path, "wb").write(b"x" * 10))
+        os.utime(cache._path(key, ".wav"), (1000 + index, 1000 + index))
+
+    # Reading the older artifact makes the other one the least recently used
+    assert cache.cached_path(keys[0], ".wav") is not None
+    third = cache.key("tts", "three")
+    cache.store_with(third, ".wav", lambda path: open(path, "wb").write(b"x" * 10))
+    assert cache.cached_path(keys[1], ".wav") is None
+    assert cache.cached_path(keys[0], ".wav") is not None
+    assert cache.cached_path(third, ".wav") is not None
+
+
+def test_failed_writers_leave_no_temporary_files(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    key = cache.key("stt", "words")
+
+    def fail_with(error):
+        def write(path):
+            with open(path, "wb") as partial_file:
+                partial_file.write(b"partial")
+            raise error
+        return write
+
+    # Errors writing the file are reported and swallowed; any other error is raised
+    cache.store_with(key, ".json", fail_with(OSError("disk full")))
+    with pytest.raises(ValueError):
+        cache.store_with(key, ".json", fail_with(ValueError("not serializable")))
+    assert cache_files(cache) == []
+    assert cache.cached_path(key, ".json") is None
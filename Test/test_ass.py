@@ -0,0 +1,81 @@
+import pytest
+
+from benchmarks.fixtures import make_background_clips
+from sub_generation import sub
+from sub_generation.ass import escape_ass_text, format_ass_timestamp, write_word_ass
+from sub_generation.sub import write_word_srt
+from utils.ffmpeg import probe_media
+
+
+def test_timestamps_are_in_centiseconds():
+    assert format_ass_timestamp(0) == "0:00:00.00"
+    assert format_ass_timestamp(1.5) == "0:00:01.50"
+    assert format_ass_timestamp(61.25) == "0:01:01.25"
+    assert format_ass_timestamp(3723.5) == "1:02:03.50"
+
+
+def test_timestamps_round_and_carry():
+    assert format_ass_timestamp(0.004) == "0:00:00.00"
+    assert format_ass_timestamp(0.006) == "0:00:00.01"
+    assert format_ass_timestamp(59.999) == "0:01:00.00"
+    assert format_ass_timestamp(3599.996) == "1:00:00.00"
+
+
+def test_negative_timestamps_are_clamped():
+    assert format_ass_timestamp(-2.0) == "0:00:00.00"
+
+
+def test_escaping():
+    assert escape_ass_text("plain") == "plain"
+    assert escape_ass_text("{\\b1}bold") == "\\{\\\\b1\\}bold"
+    assert escape_ass_text("two\nlines") == "two\\Nlines"
+
+
+def test_word_ass_file(tmp_path):
+    path = str(tmp_path / "words.ass")
+    assert write_word_ass([("hello", 0.0, 0.5), ("{world}", 0.5, 1.25)], path, play_res=(1080, 1920)) == path
+
+    with open(path, encoding="utf-8") as ass_file:
+        lines = ass_file.read().splitlines()
+    assert "PlayResX: 1080" in lines
+    assert "PlayResY: 1920" in lines
+    dialogue = [line for line in lines if line.startswith("Dialogue:")]
+    assert dialogue == [
+        "Dialogue: 0,0:00:00.00,0:00:00.50,Caption,,0,0,0,,{\\pos(540,844)}HELLO",
+        "Dialogue: 0,0:00:00.50,0:00:01.25,Caption,,0,0,0,,{\\pos(540,844)}\\{WORLD\\}",
+    ]
+
+
+def test_word_ass_extends_empty_words(tmp_path):
+    path = str(tmp_path / "words.ass")
+    write_word_ass([("a", 2.0, 2.0), ("b", 3.0, 2.5)], path)
+    with open(path, encoding="utf-8") as ass_file:
+        dialogue = [line for line in ass_file.read().splitlines() if line.startswith("Dialogue:")]
+    assert dialogue[0].startswith("Dialogue: 0,0:00:02.00,0:00:02.10,")
+    assert dialogue[1].startswith("Dialogue: 0,0:00:03.00,0:00:03.10,")
+
+
+def test_word_ass_scales_the_style(tmp_path):
+    path = str(tmp_path / "words.ass")
+    write_word_ass([], path, play_res=(540, 960), scale=0.5)
+    with open(path, encoding="utf-8") as ass_file:
+        style = next(line for line in ass_file.read().splitlines() if line.startswith("Style:"))
+    fields = style[len("Style: "):].split(",")
+    assert fields[2] == "27.5"
+    assert fields[16:18] == ["1.5", "0.5"]
+
+
+def test_burn_in_without_a_known_frame_rate(tmp_path, monkeypatch):
+    video = make_background_clips(str(tmp_path / "clips"), resolutions=((64, 48),), count=1, duration=1.0, fps=10)[0]
+    srt_path = str(tmp_path / "words.srt")
+    write_word_srt([("hello", 0.1, 0.5)], srt_path)
+
+    # A probe that finds no frame rate: the output keeps the input's rate instead of failing
+    def probe_without_fps(path):
+        return dict(probe_media(path), fps=None)
+
+    monkeypatch.setattr(sub, "probe_media", probe_without_fps)
+    output = sub.burn_in_subtitles(video, srt_path, str(tmp_path / "burned.mp4"))
+    media = probe_media(output)
+    assert media["fps"] == 10
+    assert media["duration"] == pytest.approx(1.0, abs=0.1)
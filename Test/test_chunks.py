@@ -0,0 +1,97 @@
+import threading
+import time
+
+import numpy as np
+
+from sub_generation.chunks import CHUNK_PADDING_SECONDS, encode_chunk, plan_chunks, recognize_chunks
+
+SAMPLE_RATE = 16000
+
+
+def narration(spans, duration):
+    # A 220 Hz tone over each (start, end) span on a faint noise floor
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 1e-4, int(duration * SAMPLE_RATE)).astype(np.float32)
+    for start, end in spans:
+        first, last = int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)
+        samples[first:last] += 0.3 * np.sin(2 * np.pi * 220 * np.arange(first, last) / SAMPLE_RATE)
+    return samples
+
+
+def test_short_narration_is_one_padded_chunk():
+    chunks = plan_chunks(narration([(1.0, 3.0)], 4.0), SAMPLE_RATE)
+    assert len(chunks) == 1
+    start, end = chunks[0]
+    assert abs(start - (1.0 - CHUNK_PADDING_SECONDS)) <= 0.02
+    assert abs(end - (3.0 + CHUNK_PADDING_SECONDS)) <= 0.02
+
+
+def test_padding_stays_inside_the_audio():
+    chunks = plan_chunks(narration([(0.05, 1.95)], 2.0), SAMPLE_RATE)
+    assert chunks[0][0] >= 0.0
+    assert chunks[0][1] <= 2.0
+
+
+def test_chunks_are_cut_in_the_middle_of_pauses():
+    # One second of speech every two seconds
+    spans = [(0.5 + 2 * index, 1.5 + 2 * index) for index in range(10)]
+    chunks = plan_chunks(narration(spans, 20.0), SAMPLE_RATE, max_chunk_seconds=4.5)
+
+    assert len(chunks) > 1
+    for (_, end), (next_start, _) in zip(chunks, chunks[1:]):
+        # Consecutive chunks meet, halfway between two spans of speech
+        assert end == next_start
+        assert any(abs(end - (span_end + next_span_start) / 2) <= 0.02 for (_, span_end), (next_span_start, _) in zip(spans, spans[1:]))
+    for start, end in chunks:
+        assert end - start <= 4.5 + 1e-9
+    # Every span of speech lies within a single chunk
+    for span_start, span_end in spans:
+        assert any(start <= span_start and span_end <= end for start, end in chunks)
+
+
+def test_long_speech_is_cut_at_fixed_intervals():
+    chunks = plan_chunks(narration([(0.5, 10.5)], 11.0), SAMPLE_RATE, max_chunk_seconds=4.0)
+    lengths = [end - start for start, end in chunks]
+    assert len(chunks) == 3
+    assert abs(lengths[0] - 4.0) <= 1e-9 and abs(lengths[1] - 4.0) <= 1e-9
+    assert all(length <= 4.0 + 1e-9 for length in lengths)
+    assert abs(chunks[-1][1] - (10.5 + CHUNK_PADDING_SECONDS)) <= 0.02
+
+
+def test_silence_has_no_chunks():
+    assert plan_chunks(np.zeros(5, dtype=np.float32), SAMPLE_RATE) == []
+
+
+def test_chunks_are_recognized_concurrently_and_merged_in_order():
+    spans = [(0.5 + 2 * index, 1.5 + 2 * index) for index in range(6)]
+    samples = narration(spans, 12.0)
+    lock = threading.Lock()
+    calls = []
+    in_flight = [0, 0]
+
+    def recognize_chunk(content, offset):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+            calls.append((offset, len(content)))
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        # One word per chunk, the later chunks answering first
+        return [(f"word{offset:.2f}", offset + 0.1, offset + 0.2)]
+
+    words = recognize_chunks(samples, SAMPLE_RATE, recognize_chunk, encoding="linear16", max_workers=2, max_chunk_seconds=4.5)
+    chunks = plan_chunks(samples, SAMPLE_RATE, max_chunk_seconds=4.5)
+
+    assert sorted(offset for offset, _ in calls) == [start for start, _ in chunks]
+    # LINEAR16 uploads are two bytes per sample of the chunk
+    for (offset, size), (start, end) in zip(sorted(calls), chunks):
+        assert size == 2 * (int(end * SAMPLE_RATE) - int(start * SAMPLE_RATE))
+    assert in_flight[1] == 2
+    assert [start for _, start, _ in words] == sorted(start for _, start, _ in words)
+    assert len(words) == len(chunks)
+
+
+def test_flac_chunks_are_smaller_than_linear16():
+    samples = narration([(0.5, 3.5)], 4.0)
+    assert len(encode_chunk(samples, SAMPLE_RATE, "flac")) < len(encode_chunk(samples, SAMPLE_RATE, "linear16")) == 2 * len(samples)
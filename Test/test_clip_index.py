@@ -0,0 +1,105 @@
+import json
+import os
+import random
+
+import pytest
+
+from video_editing import clip_index
+from video_editing.clip_index import ClipIndex, select_clips
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    # Files probed by the index; a clip's duration is its size in bytes, "bad" clips are unreadable
+    probed = []
+
+    def probe_media(path):
+        probed.append(os.path.basename(path))
+        if "bad" in path:
+            raise RuntimeError("moov atom not found")
+        return {"duration": float(os.path.getsize(path)), "width": 1080, "height": 1920, "fps": 30.0, "video_codec": "h264"}
+
+    monkeypatch.setattr(clip_index, "probe_media", probe_media)
+    return probed
+
+
+def write_clip(folder, name, size, mtime=1000):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as clip_file:
+        clip_file.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_refresh_probes_each_clip_once(tmp_path, probes):
+    write_clip(tmp_path, "a.mp4", 5)
+    write_clip(tmp_path, "b.mp4", 7)
+    write_clip(tmp_path, "notes.txt", 3)
+
+    entries = ClipIndex(str(tmp_path)).refresh()
+    assert [(os.path.basename(entry["path"]), entry["duration"]) for entry in entries] == [("a.mp4", 5.0), ("b.mp4", 7.0)]
+    assert sorted(probes) == ["a.mp4", "b.mp4"]
+
+    # A new index over the same folder answers from the index file
+    assert ClipIndex(str(tmp_path)).refresh() == entries
+    assert len(probes) == 2
+
+
+def test_changed_clips_are_probed_again(tmp_path, probes):
+    write_clip(tmp_path, "a.mp4", 5)
+    write_clip(tmp_path, "b.mp4", 7)
+    ClipIndex(str(tmp_path)).refresh()
+    del probes[:]
+
+    write_clip(tmp_path, "a.mp4", 9)
+    write_clip(tmp_path, "b.mp4", 7, mtime=2000)
+    entries = ClipIndex(str(tmp_path)).refresh()
+    assert sorted(probes) == ["a.mp4", "b.mp4"]
+    assert {os.path.basename(entry["path"]): entry["duration"] for entry in entries} == {"a.mp4": 9.0, "b.mp4": 7.0}
+    assert entries[1]["mtime"] == 2000
+
+
+def test_removed_and_unreadable_clips_leave_the_index(tmp_path, probes):
+    write_clip(tmp_path, "a.mp4", 5)
+    write_clip(tmp_path, "b.mp4", 7)
+    index = ClipIndex(str(tmp_path))
+    index.refresh()
+
+    os.remove(tmp_path / "a.mp4")
+    write_clip(tmp_path, "bad.mp4", 4)
+    assert [os.path.basename(entry["path"]) for entry in index.refresh()] == ["b.mp4"]
+    with open(tmp_path / ".clip_index.json", encoding="utf-8") as index_file:
+        assert list(json.load(index_file)) == ["b.mp4"]
+
+
+def test_unreadable_index_file_is_rebuilt(tmp_path, probes):
+    write_clip(tmp_path, "a.mp4", 5)
+    (tmp_path / ".clip_index.json").write_text("{torn", encoding="utf-8")
+    assert [entry["duration"] for entry in ClipIndex(str(tmp_path)).refresh()] == [5.0]
+
+
+def entries(*durations):
+    return [{"path": f"clip{index}.mp4", "duration": duration} for index, duration in enumerate(durations)]
+
+
+def test_selection_covers_the_duration_and_trims_the_last_clip():
+    selection = select_clips(entries(4.0, 4.0, 4.0, 4.0), 10.0, random.Random(1))
+    assert [duration for _, duration in selection] == [4.0, 4.0, 2.0]
+    assert len({path for path, _ in selection}) == 3
+
+
+def test_selection_stops_on_an_exact_fit():
+    assert [duration for _, duration in select_clips(entries(5.0, 5.0, 5.0), 10.0, random.Random(0))] == [5.0, 5.0]
+
+
+def test_short_library_is_used_whole():
+    selection = select_clips(entries(2.0, 3.0), 10.0, random.Random(0))
+    assert sorted(duration for _, duration in selection) == [2.0, 3.0]
+
+
+def test_selection_is_reproducible_and_leaves_the_entries_alone():
+    library = entries(1.0, 2.0, 3.0, 4.0, 5.0, 6.0)
+    first = select_clips(library, 12.0, random.Random(42))
+    assert select_clips(library, 12.0, random.Random(42)) == first
+    assert sum(duration for _, duration in first) == pytest.approx(12.0)
+    assert [entry["path"] for entry in library] == [f"clip{index}.mp4" for index in range(6)]
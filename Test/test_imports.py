@@ -0,0 +1,24 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("moviepy", "google.cloud.speech", "openai")
+
+
+def loaded_modules(statement):
+    # A fresh interpreter, so modules loaded by other tests don't count
+    code = statement + "\nimport sys\nprint('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_importing_the_pipeline_loads_no_sdk():
+    modules = loaded_modules("import pipeline.stages, pipeline.batch, app")
+    assert not [name for name in modules if name.startswith(HEAVY)]
+
+
+def test_installing_the_fakes_loads_no_sdk():
+    modules = loaded_modules("from benchmarks.fakes import install_fakes\ninstall_fakes()")
+    assert not [name for name in modules if name.startswith(HEAVY)]
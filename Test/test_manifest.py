@@ -0,0 +1,167 @@
+import json
+import os
+
+import pytest
+
+from pipeline import manifest as manifest_module
+from pipeline.manifest import MANIFEST_NAME, JobManifest
+
+
+def write_stage(path, content="data"):
+    # A stage run writing one output file, counting its runs
+    runs = []
+
+    def run():
+        runs.append(1)
+        with open(path, "w", encoding="utf-8") as output_file:
+            output_file.write(content)
+        return {"path": path}
+
+    return run, runs
+
+
+def test_finished_stage_is_reused(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    run, runs = write_stage(str(tmp_path / "audio.wav"))
+
+    first = manifest.checkpoint("audio", run, params={"voice": "a"})
+    second = manifest.checkpoint("audio", run, params={"voice": "a"})
+    assert first == second == {"path": str(tmp_path / "audio.wav")}
+    assert len(runs) == 1
+
+
+def test_manifest_resumes_from_disk(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    run, runs = write_stage(str(tmp_path / "audio.wav"))
+    manifest.checkpoint("audio", run, inputs={"script": "s.txt"})
+
+    resumed = JobManifest(str(tmp_path))
+    assert resumed.resumed
+    assert resumed.data["job_id"] == "job"
+    assert resumed.completed("audio", inputs={"script": "s.txt"}) == {"path": str(tmp_path / "audio.wav")}
+    resumed.checkpoint("audio", run, inputs={"script": "s.txt"})
+    assert len(runs) == 1
+
+
+def test_changed_inputs_or_params_rerun_the_stage(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    run, runs = write_stage(str(tmp_path / "audio.wav"))
+    manifest.checkpoint("audio", run, inputs={"script": "a.txt"}, params={"voice": "a"})
+
+    assert manifest.completed("audio", inputs={"script": "b.txt"}, params={"voice": "a"}) is None
+    assert manifest.completed("audio", inputs={"script": "a.txt"}, params={"voice": "b"}) is None
+    manifest.checkpoint("audio", run, inputs={"script": "a.txt"}, params={"voice": "b"})
+    assert len(runs) == 2
+
+
+def test_params_compare_as_recorded(tmp_path):
+    # Tuples read back as lists and other values as their str
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    run, runs = write_stage(str(tmp_path / "audio.wav"))
+    manifest.checkpoint("audio", run, params={"size": (1080, 1920), "folder": tmp_path})
+    assert JobManifest(str(tmp_path)).completed("audio", params={"size": (1080, 1920), "folder": tmp_path}) is not None
+
+
+def test_missing_or_changed_output_file_reruns_the_stage(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    path = str(tmp_path / "audio.wav")
+    run, runs = write_stage(path)
+    manifest.checkpoint("audio", run)
+
+    with open(path, "a", encoding="utf-8") as output_file:
+        output_file.write("more")
+    assert manifest.completed("audio") is None
+
+    os.remove(path)
+    assert manifest.completed("audio") is None
+    manifest.checkpoint("audio", run)
+    assert len(runs) == 2
+
+
+def test_rerunning_a_stage_invalidates_the_later_stages(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    audio, _ = write_stage(str(tmp_path / "audio.wav"))
+    subtitles, _ = write_stage(str(tmp_path / "words.srt"))
+    video, _ = write_stage(str(tmp_path / "video.mp4"))
+    manifest.checkpoint("audio", audio, params={"voice": "a"})
+    manifest.checkpoint("subtitles", subtitles)
+    manifest.checkpoint("video", video)
+
+    manifest.checkpoint("subtitles", subtitles, params={"words": 2})
+    assert list(manifest.data["stages"]) == ["audio", "subtitles"]
+    assert manifest.completed("audio", params={"voice": "a"}) is not None
+    assert manifest.completed("video") is None
+
+
+def test_failed_stage_is_recorded_and_rerun(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+
+    def fail():
+        raise RuntimeError("quota exceeded")
+
+    with pytest.raises(RuntimeError):
+        manifest.checkpoint("audio", fail)
+    assert manifest.status == "failed"
+    with open(tmp_path / MANIFEST_NAME, encoding="utf-8") as manifest_file:
+        stage = json.load(manifest_file)["stages"]["audio"]
+    assert stage["status"] == "failed"
+    assert stage["error"] == "RuntimeError: quota exceeded"
+
+    resumed = JobManifest(str(tmp_path))
+    assert resumed.completed("audio") is None
+    run, runs = write_stage(str(tmp_path / "audio.wav"))
+    resumed.checkpoint("audio", run)
+    assert len(runs) == 1
+    assert resumed.status == "running"
+
+
+def test_unreadable_manifest_starts_a_new_job(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text("{torn", encoding="utf-8")
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    assert not manifest.resumed
+    assert manifest.data["stages"] == {}
+
+
+def test_finished_output_needs_the_same_options_and_an_unchanged_video(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    output = tmp_path / "final.mp4"
+    output.write_bytes(b"video")
+    manifest.data.update(status="done", options={"profile": "final"}, output={"path": str(output), "size": 5})
+
+    assert manifest.finished_output({"profile": "final"}) == str(output)
+    assert manifest.finished_output({"profile": "draft"}) is None
+    output.write_bytes(b"other video")
+    assert manifest.finished_output({"profile": "final"}) is None
+
+
+def test_finalize_removes_the_recorded_intermediates(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest_module, "verify_video", lambda path: {"duration": 2.0})
+    manifest = JobManifest(str(tmp_path / "job"), job_id="job")
+    (tmp_path / "job" / "parts").mkdir(parents=True)
+    audio, _ = write_stage(str(tmp_path / "job" / "parts" / "audio.wav"))
+    video, _ = write_stage(str(tmp_path / "job" / "final.mp4"))
+    manifest.checkpoint("audio", audio)
+    manifest.checkpoint("video", video)
+    (tmp_path / "job" / "notes.txt").write_text("not ours")
+
+    assert manifest.finalize(str(tmp_path / "job" / "final.mp4"), options={"profile": "final"}) == str(tmp_path / "job" / "final.mp4")
+    assert sorted(os.listdir(tmp_path / "job")) == sorted(["final.mp4", "notes.txt", MANIFEST_NAME])
+    resumed = JobManifest(str(tmp_path / "job"))
+    assert resumed.status == "done" and resumed.data["duration"] == 2.0
+    assert resumed.finished_output({"profile": "final"}) == str(tmp_path / "job" / "final.mp4")
+
+    # Without the manifest only the caller's own files are left
+    manifest.finalize(str(tmp_path / "job" / "final.mp4"), keep_manifest=False)
+    assert sorted(os.listdir(tmp_path / "job")) == ["final.mp4", "notes.txt"]
+
+
+def test_finalize_keeps_everything_when_the_video_is_broken(tmp_path):
+    manifest = JobManifest(str(tmp_path), job_id="job")
+    audio, _ = write_stage(str(tmp_path / "audio.wav"))
+    manifest.checkpoint("audio", audio)
+    (tmp_path / "final.mp4").write_bytes(b"")
+
+    with pytest.raises(RuntimeError):
+        manifest.finalize(str(tmp_path / "final.mp4"))
+    assert os.path.isfile(tmp_path / "audio.wav")
+    assert JobManifest(str(tmp_path)).status == "failed"
@@ -0,0 +1,62 @@
+import os
+import random
+import re
+import subprocess
+
+import pytest
+
+from benchmarks.fixtures import make_background_clips
+from utils.ffmpeg import ffmpeg_binary, probe_media
+from video_editing import mezzanine
+from video_editing.mezzanine import MEZZANINE_FPS, MEZZANINE_GOP_SECONDS, MEZZANINE_HEIGHT, MEZZANINE_WIDTH, build_background_track, conform_library
+
+
+def keyframe_times(path):
+    # Timestamps of the keyframes, from decoding only the keyframes
+    result = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-skip_frame", "nokey", "-i", path, "-vf", "showinfo", "-f", "null", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    return [float(time) for time in re.findall(r"pts_time:([\d.]+)", result.stderr)]
+
+
+@pytest.fixture(scope="module")
+def library(tmp_path_factory):
+    # Two small 2.5 s clips at another size and rate than the mezzanine, conformed once
+    root = tmp_path_factory.mktemp("mezzanine")
+    clips_folder = str(root / "clips")
+    make_background_clips(clips_folder, resolutions=((160, 90),), count=2, duration=2.5, fps=25)
+    cache_folder = str(root / "cache")
+    return clips_folder, cache_folder, conform_library(clips_folder, cache_folder)
+
+
+def test_clips_are_conformed_to_the_mezzanine_profile(library):
+    _, _, conformed = library
+    assert len(conformed) == 2
+    for entry in conformed:
+        media = probe_media(entry["path"])
+        assert (media["width"], media["height"]) == (MEZZANINE_WIDTH, MEZZANINE_HEIGHT)
+        assert media["fps"] == MEZZANINE_FPS
+        assert entry["duration"] == pytest.approx(2.5, abs=0.05)
+        # A keyframe opens every GOP and there are no others
+        assert keyframe_times(entry["path"]) == pytest.approx([0.0, MEZZANINE_GOP_SECONDS, 2 * MEZZANINE_GOP_SECONDS], abs=0.01)
+
+
+def test_unchanged_clips_are_not_conformed_again(library, monkeypatch):
+    clips_folder, cache_folder, conformed = library
+    conformed_clips = []
+    monkeypatch.setattr(mezzanine, "conform_clip", lambda source, output: conformed_clips.append(source))
+    assert conform_library(clips_folder, cache_folder) == conformed
+    assert conformed_clips == []
+
+
+def test_background_track_has_the_requested_duration(library, tmp_path):
+    clips_folder, cache_folder, _ = library
+    output_path = str(tmp_path / "track.mp4")
+    build_background_track(clips_folder, 4.2, output_path, cache_folder=cache_folder, rng=random.Random(0))
+    media = probe_media(output_path)
+    assert (media["width"], media["height"]) == (MEZZANINE_WIDTH, MEZZANINE_HEIGHT)
+    # Stream-copy cuts land on whole frames, so the track may run a few frames long
+    assert media["duration"] == pytest.approx(4.2, abs=4 / MEZZANINE_FPS)
+    # The work folder of the concat is removed
+    assert sorted(name for name in os.listdir(cache_folder) if not name.endswith(".mp4")) == ["sources.json"]
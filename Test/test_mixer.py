@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from music_generation.library import MusicTrack
+from music_generation.mixer import ENVELOPE_SECONDS, ducking_gain, iter_mix, level_gain
+
+SAMPLE_RATE = 16000
+
+
+def music(amplitude, seconds=1.0):
+    samples = np.full((int(seconds * SAMPLE_RATE), 2), amplitude, dtype=np.float32)
+    rms_db = 20 * np.log10(amplitude)
+    return MusicTrack("track.wav", samples, SAMPLE_RATE, {"rms": amplitude, "rms_db": rms_db, "peak": amplitude, "peak_db": rms_db})
+
+
+def mix(track, **options):
+    narration = np.zeros((0, 2), dtype=np.float32)
+    return np.concatenate(list(iter_mix(narration, track, 1.0, fade_in=0.01, fade_out=0.01, **options)))
+
+
+def test_level_gain():
+    assert level_gain(None) == 1.0
+    assert level_gain({"rms": 0.0, "rms_db": -100.0, "peak_db": -100.0}) == 1.0
+    # Loud tracks come down to the reference, quiet ones go up by at most the boost
+    assert level_gain({"rms": 0.5, "rms_db": -6.0, "peak_db": 0.0}, reference_db=-16.0) == pytest.approx(10 ** (-10 / 20))
+    assert level_gain({"rms": 0.01, "rms_db": -40.0, "peak_db": -20.0}, reference_db=-16.0, max_boost_db=6.0) == pytest.approx(10 ** (6 / 20))
+    # Never past full scale
+    assert level_gain({"rms": 0.05, "rms_db": -26.0, "peak_db": -2.0}, reference_db=-16.0, max_boost_db=6.0) == pytest.approx(10 ** (2 / 20))
+
+
+def test_music_plays_at_the_fixed_gain_by_default():
+    # The baseline mix: the track's own level times music_gain
+    assert mix(music(0.5))[SAMPLE_RATE // 2] == pytest.approx([0.075, 0.075])
+    assert mix(music(0.1))[SAMPLE_RATE // 2] == pytest.approx([0.015, 0.015])
+
+
+def test_leveling_brings_tracks_to_the_same_level():
+    loud = mix(music(0.5), level=True)[SAMPLE_RATE // 2]
+    quiet = mix(music(0.1), level=True)[SAMPLE_RATE // 2]
+    assert loud == pytest.approx(quiet, rel=1e-4)
+    assert loud[0] == pytest.approx(0.15 * 10 ** (-16 / 20), rel=1e-4)
+
+
+def tone(seconds, amplitude=0.3):
+    # Whole periods in every 10 ms hop, so every hop measures the same level
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 500 * t)).astype(np.float32)
+
+
+def test_silence_leaves_the_music_alone():
+    hop_times, gain = ducking_gain(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+    assert len(hop_times) == len(gain) == round(1 / ENVELOPE_SECONDS)
+    assert gain == pytest.approx(1.0)
+
+
+def test_speech_ducks_the_music_by_duck_db():
+    hop_times, gain = ducking_gain(tone(2.0), SAMPLE_RATE, duck_db=-9.0)
+    assert gain[-1] == pytest.approx(10 ** (-9.0 / 20), rel=1e-3)
+    assert np.all(gain <= 1.0)
+
+
+def test_hop_times_are_hop_centres():
+    hop_times, _ = ducking_gain(tone(0.1), SAMPLE_RATE)
+    assert hop_times == pytest.approx((np.arange(10) + 0.5) * ENVELOPE_SECONDS)
+
+
+def test_quiet_speech_ducks_less_inside_the_knee():
+    # About -13.5 dB RMS is 1.5 dB into a 6 dB knee above a -15 dB threshold: a quarter of the duck
+    _, gain = ducking_gain(tone(2.0, amplitude=0.3), SAMPLE_RATE, threshold_db=-15.0, duck_db=-8.0, knee_db=6.0)
+    level_db = 10 * np.log10(0.3 ** 2 / 2)
+    expected_db = -8.0 * (level_db + 15.0) / 6.0
+    assert 20 * np.log10(gain[-1]) == pytest.approx(expected_db, abs=0.05)
+
+
+def test_attack_is_faster_than_release():
+    narration = np.concatenate([tone(1.0), np.zeros(SAMPLE_RATE, dtype=np.float32)])
+    hop_times, gain = ducking_gain(narration, SAMPLE_RATE, attack=0.05, release=0.4)
+    gain_db = 20 * np.log10(gain)
+
+    def seconds_to(start, reached):
+        # Time from start until the gain first satisfies reached
+        after = np.flatnonzero((hop_times >= start) & reached)
+        return hop_times[after[0]] - start
+
+    # 90% of the way to the ducked level, and back
+    attack_time = seconds_to(0.0, gain_db <= -8.1)
+    release_time = seconds_to(1.0, gain_db >= -0.9)
+    assert attack_time < 0.15
+    assert 0.8 < release_time < 1.0
+    assert gain_db[np.searchsorted(hop_times, 1.0) - 1] == pytest.approx(-9.0, abs=0.01)
+
+
+def test_stereo_narration_is_measured_as_mono():
+    mono = tone(1.0)
+    _, mono_gain = ducking_gain(mono, SAMPLE_RATE)
+    _, stereo_gain = ducking_gain(np.stack([mono, mono], axis=1), SAMPLE_RATE)
+    assert stereo_gain == pytest.approx(mono_gain)
+
+
+def test_empty_narration():
+    hop_times, gain = ducking_gain(np.zeros(0, dtype=np.float32), SAMPLE_RATE)
+    assert list(gain) == [1.0]
+
+
+def test_mix_ducks_the_music_under_the_narration():
+    narration = np.concatenate([tone(0.5), np.zeros(SAMPLE_RATE // 2, dtype=np.float32)])
+    narration = np.stack([narration, narration], axis=1)
+    track = music(0.5)
+    blocks = list(iter_mix(narration, track, 1.0, fade_in=0.01, fade_out=0.01, block_size=4000))
+    assert [len(block) for block in blocks] == [4000, 4000, 4000, 4000]
+
+    # Where the narration crosses zero only the ducked music is left
+    mixed = np.concatenate(blocks)
+    assert mixed[SAMPLE_RATE // 4, 0] == pytest.approx(0.075 * 10 ** (-9 / 20), rel=0.01)
+    # and it recovers with the release time after the narration ends
+    ducked = 0.075 * 10 ** (-9 / 20)
+    assert ducked * 1.5 < mixed[SAMPLE_RATE - SAMPLE_RATE // 10, 0] < 0.075
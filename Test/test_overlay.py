@@ -0,0 +1,74 @@
+import numpy as np
+
+from sub_generation.overlay import CaptionEvent, CaptionSprite, SubtitleOverlay
+
+
+def sprite(width=4, height=2, color=200, opacity=1.0):
+    rgb = np.full((height, width, 3), color, dtype=np.uint8)
+    mask = np.full((height, width), opacity, dtype=np.float32)
+    return CaptionSprite(rgb, mask)
+
+
+def event(start, end, x=0, y=0, caption=None):
+    return CaptionEvent(start, end, x, y, caption or sprite())
+
+
+def test_active_events_at_interval_edges():
+    first, second = event(0.0, 1.0), event(1.0, 2.0)
+    overlay = SubtitleOverlay([second, first])
+    assert overlay.active_events(-0.1) == []
+    assert overlay.active_events(0.0) == [first]
+    assert overlay.active_events(0.999) == [first]
+    # Events are half-open: the first ends as the second starts
+    assert overlay.active_events(1.0) == [second]
+    assert overlay.active_events(2.0) == []
+
+
+def test_active_events_find_long_events_behind_short_ones():
+    long_event = event(0.0, 10.0)
+    short_events = [event(start, start + 0.5) for start in range(1, 9)]
+    overlay = SubtitleOverlay([long_event] + short_events)
+    assert overlay.active_events(5.2) == [long_event, short_events[4]]
+    assert overlay.active_events(5.7) == [long_event]
+
+
+def test_events_starting_together_keep_their_order():
+    shadow, text = event(1.0, 2.0), event(1.0, 2.0)
+    assert SubtitleOverlay([shadow, text]).active_events(1.5) == [shadow, text]
+
+
+def test_apply_blends_only_the_active_sprite_box():
+    overlay = SubtitleOverlay([event(0.0, 1.0, x=1, y=1, caption=sprite(width=2, height=1, color=200, opacity=0.5))])
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    blended = overlay.apply(frame, 0.5)
+    assert blended is not frame and not blended[0].any()
+    assert blended[1, 1:3].tolist() == [[100, 100, 100]] * 2
+    assert blended[1, 0].tolist() == [0, 0, 0] and blended[1, 3].tolist() == [0, 0, 0]
+    # Frames without captions are returned as they are
+    assert overlay.apply(frame, 1.5) is frame
+    assert not frame.any()
+
+
+def test_apply_clips_sprites_at_the_frame_edges():
+    overlay = SubtitleOverlay([event(0.0, 1.0, x=-2, y=3, caption=sprite(width=4, height=2, color=255))])
+    blended = overlay.apply(np.zeros((4, 4, 3), dtype=np.uint8), 0.0)
+    assert blended[3, :2].tolist() == [[255, 255, 255]] * 2
+    assert not blended[3, 2:].any() and not blended[:3].any()
+
+
+def test_sprites_are_cropped_to_their_visible_pixels():
+    rgb = np.full((6, 8, 3), 50, dtype=np.uint8)
+    mask = np.zeros((6, 8), dtype=np.float32)
+    mask[2:4, 3:7] = 1.0
+    caption = CaptionSprite(rgb, mask)
+    assert (caption.width, caption.height) == (8, 6)
+    assert (caption.x, caption.y) == (3, 2)
+    assert caption.alpha.shape == (2, 4, 1)
+
+    # Events place the full raster, so the cropped box lands where it was in it
+    placed = CaptionEvent(0.0, 1.0, 10, 20, caption)
+    assert (placed.x, placed.y) == (13, 22)
+    restored = CaptionSprite.from_arrays(caption.arrays())
+    assert (restored.x, restored.y, restored.width, restored.height) == (3, 2, 8, 6)
+    assert np.array_equal(restored.rgb, caption.rgb)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from audio_generation.pcm import Narration, pcm16_to_float
+
+
+def pcm16(values, channels=1):
+    return pcm16_to_float(np.array(values, dtype="<i2").tobytes(), channels)
+
+
+def test_wav_round_trip_keeps_16_bit_samples(tmp_path):
+    values = [1000, -1000, 20000, 5, 0, 1, -1, 32767, -32768]
+    narration = Narration(pcm16(values), 24000)
+    path = narration.write(str(tmp_path / "narration.wav"))
+
+    restored = Narration.read(path)
+    assert restored.sample_rate == 24000
+    assert np.array_equal(restored.samples, narration.samples)
+    assert np.round(restored.samples[:, 0] * 32768).astype(int).tolist() == values
+
+
+def test_digest_survives_repeated_write_and_read(tmp_path):
+    rng = np.random.default_rng(0)
+    narration = Narration(pcm16(rng.integers(-32768, 32768, size=(4800, 2)).ravel(), channels=2), 24000)
+    digest = narration.digest()
+
+    for cycle in range(3):
+        narration = Narration.read(narration.write(str(tmp_path / f"narration{cycle}.wav")))
+        assert narration.channels == 2
+        assert narration.digest() == digest
+
+
+def test_float_samples_are_rounded_once_then_stable(tmp_path):
+    # Samples off the 16-bit grid (e.g. resampled ones) are rounded by the first write only
+    narration = Narration(np.array([0.5, -0.25, 0.123456, 1.5, -1.5], dtype=np.float32), 16000)
+    first = Narration.read(narration.write(str(tmp_path / "first.wav")))
+    assert np.allclose(first.samples[:, 0], [0.5, -0.25, 0.123456, 32767 / 32768, -1.0], atol=0.5 / 32768)
+
+    second = Narration.read(first.write(str(tmp_path / "second.wav")))
+    assert second.digest() == first.digest()
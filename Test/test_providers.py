@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+
+from utils import providers
+from utils.providers import AdaptiveLimit, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Monotonic time of the token buckets, advanced by the test
+    now = [1000.0]
+    monkeypatch.setattr(providers.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_unlimited_bucket_never_waits(clock):
+    bucket = TokenBucket(rate=None)
+    assert [bucket.reserve() for _ in range(100)] == [0.0] * 100
+
+
+def test_bucket_allows_a_burst_then_spaces_requests(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    waits = [bucket.reserve() for _ in range(6)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    # Queued callers are handed tokens in order, one every 1 / rate seconds
+    assert waits[3:] == pytest.approx([0.5, 1.0, 1.5])
+
+
+def test_bucket_refills_over_time_up_to_the_burst(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    for _ in range(3):
+        bucket.reserve()
+    clock[0] += 1.0
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.5])
+
+    clock[0] += 60.0
+    assert [bucket.reserve() for _ in range(4)] == pytest.approx([0.0, 0.0, 0.0, 0.5])
+
+
+def test_bucket_burst_defaults_to_one_second_of_requests(clock):
+    assert TokenBucket(rate=5.0).burst == 5.0
+    assert TokenBucket(rate=0.5).burst == 1.0
+
+
+def test_throttling_halves_the_rate_down_to_a_floor(clock):
+    bucket = TokenBucket(rate=8.0, burst=1)
+    for expected in [4.0, 2.0, 1.0, 0.5, 0.5]:
+        bucket.update(throttled=True)
+        assert bucket.rate == expected
+    # At the lower rate queued requests are spaced further apart
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.0, 2.0, 4.0])
+
+
+def test_rate_recovers_with_successes_up_to_the_configured_rate(clock):
+    bucket = TokenBucket(rate=8.0)
+    bucket.update(throttled=True)
+    for expected in [4.5, 5.0, 5.5, 6.0, 6.5, 7.0, 7.5, 8.0, 8.0]:
+        bucket.update()
+        assert bucket.rate == expected
+
+
+def test_rate_change_keeps_the_tokens_earned_so_far(clock):
+    bucket = TokenBucket(rate=4.0, burst=4)
+    for _ in range(4):
+        bucket.reserve()
+    clock[0] += 0.5
+    bucket.update(throttled=True)
+    # Two tokens were earned at 4 per second before the rate dropped to 2
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.5])
+
+
+def test_unlimited_bucket_ignores_throttling(clock):
+    bucket = TokenBucket(rate=None)
+    bucket.update(throttled=True)
+    assert bucket.rate is None and bucket.reserve() == 0.0
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_provider_backs_off_on_rate_limits(clock, monkeypatch):
+    monkeypatch.setattr(providers.time, "sleep", lambda seconds: None)
+    provider = providers.Provider("test", lambda: "client", rate=10.0, max_concurrency=8, base_delay=0.0)
+    responses = [RateLimited(), RateLimited(), "ok"]
+
+    def request(client):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert provider.call(request) == "ok"
+    stats = provider.stats()
+    assert stats["throttled"] == 2 and stats["retries"] == 2
+    assert stats["limit"] == 2
+    assert stats["rate"] == pytest.approx(2.5 + 10.0 / 16)
+    assert stats["active"] == 0
+
+
+def test_limit_caps_requests_in_flight():
+    limit = AdaptiveLimit(max_concurrency=3)
+    assert [limit.try_enter() for _ in range(4)] == [True, True, True, False]
+    limit.leave()
+    assert limit.active == 2
+    assert limit.try_enter()
+
+
+def test_throttling_halves_the_limit_down_to_the_minimum():
+    limit = AdaptiveLimit(max_concurrency=16, min_concurrency=2)
+    for expected in [8, 4, 2, 2]:
+        limit.enter()
+        limit.leave(throttled=True)
+        assert limit.limit == expected
+
+
+def test_limit_grows_back_by_one_per_limit_successes():
+    limit = AdaptiveLimit(max_concurrency=4)
+    limit.enter()
+    limit.leave(throttled=True)
+    assert limit.limit == 2
+
+    # Two successes at a limit of 2, then three at 3, then four would be needed past the maximum
+    for expected in [2, 3, 3, 3, 4, 4, 4, 4, 4, 4]:
+        limit.enter()
+        limit.leave()
+        assert limit.limit == expected
+
+
+def test_throttling_resets_the_success_count():
+    limit = AdaptiveLimit(max_concurrency=8)
+    limit.enter()
+    limit.leave(throttled=True)
+    for _ in range(3):
+        limit.enter()
+        limit.leave()
+    limit.enter()
+    limit.leave(throttled=True)
+    assert limit.limit == 2
+    limit.enter()
+    limit.leave()
+    assert limit.limit == 2
+
+
+def test_waiting_caller_enters_when_a_slot_frees():
+    limit = AdaptiveLimit(max_concurrency=1)
+    limit.enter()
+    entered = threading.Event()
+
+    def wait_for_slot():
+        limit.enter()
+        entered.set()
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    assert not entered.wait(0.1)
+    limit.leave()
+    assert entered.wait(2.0)
+    waiter.join()
+    assert limit.active == 1
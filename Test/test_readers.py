@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import make_background_clips
+from video_editing.readers import ReaderPool
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    # Three small clips with different test patterns
+    return make_background_clips(str(tmp_path_factory.mktemp("clips")), resolutions=((64, 48),), count=3, duration=2.0, fps=10)
+
+
+def running(pool):
+    return pool.stats()["open_readers"]
+
+
+def test_same_clip_is_shared_until_its_last_release(clips):
+    pool = ReaderPool(max_open=4)
+    first = pool.acquire(clips[0])
+    second = pool.acquire(clips[0])
+    assert second is first
+    assert pool.stats()["clips"] == 1 and pool.stats()["reused"] == 1
+
+    # Other options are another reader
+    scaled = pool.acquire(clips[0], target_resolution=(24, 32))
+    assert scaled is not first and tuple(scaled.size) == (32, 24)
+
+    pool.release(first)
+    assert pool.stats()["clips"] == 2 and first.reader.proc
+    pool.release(second)
+    pool.release(scaled)
+    assert pool.stats()["clips"] == 0 and running(pool) == 0
+    assert first.reader is None
+
+
+def test_idle_readers_are_suspended_and_resume_where_they_were(clips):
+    pool = ReaderPool(max_open=2)
+    opened = [pool.acquire(path) for path in clips]
+    assert running(pool) == 2 and pool.stats()["suspended"] == 1
+
+    expected = [clip.get_frame(1.5) for clip in opened]
+    assert running(pool) <= 2
+    # Reading from a suspended reader restarts it at the requested position
+    for clip, frame in zip(opened, expected):
+        assert np.array_equal(clip.get_frame(1.5), frame)
+        assert running(pool) <= 2
+    assert pool.stats()["suspended"] >= 3
+
+    for clip in opened:
+        pool.release(clip)
+    assert running(pool) == 0
+
+
+def test_sessions_release_their_readers_when_a_stage_fails(clips):
+    pool = ReaderPool(max_open=4)
+    with pytest.raises(RuntimeError):
+        with pool.session() as readers:
+            readers.open(clips[0])
+            readers.open(clips[1])
+            readers.open(clips[0])
+            assert pool.stats()["clips"] == 2
+            raise RuntimeError("encode failed")
+    assert pool.stats()["clips"] == 0 and running(pool) == 0
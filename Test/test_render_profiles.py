@@ -0,0 +1,44 @@
+import pytest
+
+from utils.render_profiles import RENDER_PROFILES, RenderProfile, get_render_profile
+
+
+def test_profiles_are_looked_up_by_name():
+    assert get_render_profile().name == "standard"
+    assert get_render_profile("draft") is RENDER_PROFILES["draft"]
+    custom = RenderProfile("custom", scale=0.5, preset="fast", crf=28)
+    assert get_render_profile(custom) is custom
+    with pytest.raises(ValueError, match="draft, standard, archive"):
+        get_render_profile("preview")
+
+
+def test_draft_decodes_at_an_even_fraction_of_the_size():
+    draft = get_render_profile("draft")
+    assert draft.target_resolution(1080, 1920) == (640, 360)
+    # Odd results are rounded down to even dimensions
+    assert draft.target_resolution(1000, 1750) == (582, 332)
+    assert draft.target_resolution(4, 4) == (2, 2)
+    assert get_render_profile("standard").target_resolution(1080, 1920) is None
+    # Sources of unknown size are decoded as they are
+    assert draft.target_resolution(None, 1920) is None
+
+
+def test_write_options():
+    draft = get_render_profile("draft").write_options(fps=30)
+    assert draft["fps"] == 15
+    assert draft["preset"] == "ultrafast"
+    assert draft["audio_bitrate"] == "64k"
+    assert draft["ffmpeg_params"] == ["-crf", "30", "-pix_fmt", "yuv420p"]
+    # Profiles without a frame rate keep the source's
+    assert get_render_profile("standard").write_options(fps=25)["fps"] == 25
+    assert get_render_profile("archive").write_options(fps=25)["ffmpeg_params"][:2] == ["-crf", "17"]
+
+
+def test_description_covers_the_settings_that_change_the_output():
+    descriptions = [profile.describe() for profile in RENDER_PROFILES.values()]
+    assert len({str(sorted(description.items())) for description in descriptions}) == len(descriptions)
+
+    # Threads don't change the video, the CRF does
+    threaded = RenderProfile("standard", scale=1, preset="medium", crf=23, threads=4)
+    assert threaded.describe() == get_render_profile("standard").describe()
+    assert RenderProfile("standard", scale=1, preset="medium", crf=24).describe() != get_render_profile("standard").describe()
@@ -0,0 +1,139 @@
+import json
+import random
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fakes import FakeOpenAI
+from script_generation import pool as pool_module
+from script_generation.pool import ScriptPool, build_pool, draw_script, request_scripts, script_briefs
+from script_generation.script import STYLES, TOPICS
+from utils.providers import TokenBucket, chat
+
+TEXT = "Wake up early and chase the goals you set for yourself, because nobody else will chase them for you today."
+
+
+def script(text, topic="discipline", **fields):
+    return dict({"text": text, "topic": topic, "style": "coach", "sentences": 2, "call_to_action": False}, **fields)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return ScriptPool(str(tmp_path / "pools" / "scripts.sqlite3"))
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(chat, "bucket", TokenBucket(rate=None))
+
+
+def test_identical_and_near_identical_scripts_are_skipped(pool):
+    assert pool.add([script(TEXT)]) == 1
+    # Only case, punctuation and spacing differ
+    assert pool.add([script("  " + TEXT.upper().replace(",", ";") + "  ")]) == 0
+    # One word swapped still shares most of its trigrams
+    assert pool.add([script(TEXT.replace("today", "tonight"))]) == 0
+    # Near-duplicates of another topic's script are kept, exact ones and empty scripts never
+    assert pool.add([script(TEXT.replace("today", "tonight"), topic="focus"), script(TEXT, topic="focus"), script("   ")]) == 1
+    # Duplicates within one batch
+    fresh = "Every small step you take this morning builds the person you will be proud of next year."
+    assert pool.add([script(fresh), script(fresh + "!")]) == 1
+    assert pool.stats() == {"scripts": 3, "unused": 3, "used": 0}
+
+
+def test_draw_hands_out_the_oldest_unused_script_once(pool):
+    assert pool.draw() is None
+    texts = [f"Script number {word} is about something else entirely, with words of its own." for word in ("one", "two", "three")]
+    pool.add([script(text, topic=str(index)) for index, text in enumerate(texts)])
+
+    assert pool.draw("job-1") == texts[0]
+    assert pool.draw("job-2") == texts[1]
+    assert pool.unused_count() == 1
+    assert pool.stats() == {"scripts": 3, "unused": 1, "used": 2}
+
+    # Reopening the database keeps what was used
+    reopened = ScriptPool(pool.db_path)
+    assert reopened.draw() == texts[2]
+    assert reopened.draw() is None
+
+
+def test_concurrent_draws_never_share_a_script(pool):
+    pool.add([script(f"Unique script {index}", topic=str(index)) for index in range(40)])
+    drawn = []
+    lock = threading.Lock()
+
+    def worker():
+        mine = [ScriptPool(pool.db_path).draw() for _ in range(5)]
+        with lock:
+            drawn.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(drawn) == 40 and len(set(drawn)) == 40
+    assert pool.unused_count() == 0
+
+
+def test_briefs_cover_the_styles_and_topics_evenly():
+    cells = len(STYLES) * len(TOPICS)
+    briefs = script_briefs(cells * 2, rng=random.Random(1))
+    counts = {}
+    for brief in briefs:
+        counts[(brief["style"], brief["topic"])] = counts.get((brief["style"], brief["topic"]), 0) + 1
+        assert 2 <= brief["sentences"] <= 8
+    assert len(counts) == cells and set(counts.values()) == {2}
+    assert len(script_briefs(3)) == 3
+
+
+def request_scripts_with(client, briefs):
+    chat.set_client(client)
+    try:
+        return request_scripts(briefs)
+    finally:
+        chat.set_client(None)
+
+
+def test_batch_answers_are_matched_to_their_briefs(no_rate_limit):
+    content = json.dumps({"scripts": [
+        {"index": 2, "text": "Second."},
+        {"index": 1, "text": "First."},
+        {"index": 7, "text": "Not asked for."},
+    ]})
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))]),
+    )))
+    briefs = script_briefs(2)
+    scripts = request_scripts_with(client, briefs)
+    assert [item["text"] for item in scripts] == ["Second.", "First."]
+    assert scripts[1]["topic"] == briefs[0]["topic"] and scripts[0]["style"] == briefs[1]["style"]
+
+
+def test_build_pool_fills_the_pool_in_batches(pool, no_rate_limit):
+    fake = FakeOpenAI(word_count=30)
+    calls = []
+    create = fake.chat.completions.create
+    fake.chat.completions.create = lambda **kwargs: calls.append(kwargs) or create(**kwargs)
+    chat.set_client(fake)
+    try:
+        added = build_pool(pool, 12, per_request=5, max_workers=2)
+    finally:
+        chat.set_client(None)
+    assert len(calls) == 3
+    assert 0 < added <= 12 and pool.stats()["scripts"] == added
+
+
+def test_draw_script_refills_a_low_pool_and_falls_back_when_empty(pool, monkeypatch):
+    refills = []
+    monkeypatch.setattr(pool_module, "refill_in_background", lambda pool: refills.append(pool))
+    monkeypatch.setattr(pool_module, "generate_script", lambda: "Generated directly.")
+    monkeypatch.setattr(pool_module, "REFILL_THRESHOLD", 1)
+
+    pool.add([script("Pooled one.", topic="a"), script("Pooled two.", topic="b")])
+    assert draw_script(pool, job_id="job") == "Pooled one."
+    assert refills == []
+    assert draw_script(pool) == "Pooled two."
+    assert refills == [pool]
+    assert draw_script(pool) == "Generated directly."
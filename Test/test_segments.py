@@ -0,0 +1,36 @@
+import pytest
+
+from video_editing.segments import check_segments, plan_segments
+
+
+def test_segments_start_on_keyframe_boundaries():
+    plan = plan_segments(10.0, 30, 4, boundary_seconds=1.0)
+    assert plan == [(0, 90), (90, 90), (180, 90), (270, 30)]
+
+
+def test_segments_cover_every_frame_once():
+    for duration, fps, segments in [(10.0, 30, 3), (7.3, 24, 5), (59.97, 29.97, 8), (0.5, 30, 4)]:
+        plan = plan_segments(duration, fps, segments, boundary_seconds=2.0)
+        total_frames = int(round(duration * fps))
+        assert len(plan) <= segments
+        assert plan[0][0] == 0
+        for (start, count), (next_start, _) in zip(plan, plan[1:]):
+            assert start + count == next_start
+        assert sum(count for _, count in plan) == total_frames
+
+
+def test_one_segment_is_the_whole_timeline():
+    assert plan_segments(12.0, 25, 1, boundary_seconds=2.0) == [(0, 300)]
+
+
+def test_short_timeline_is_not_split_inside_a_boundary():
+    assert plan_segments(1.0, 30, 4, boundary_seconds=2.0) == [(0, 30)]
+
+
+def test_segmented_renders_need_the_conformed_background():
+    check_segments(1, conform=False)
+    check_segments(4, conform=True)
+    check_segments(None, conform=True)
+    for segments in (2, None):
+        with pytest.raises(ValueError, match="conform"):
+            check_segments(segments, conform=False)
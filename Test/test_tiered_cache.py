@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+from audio_generation.segment_cache import TTSSegmentCache, normalize_sentence
+from utils.tiered_cache import TieredCache
+
+
+def load_text(path):
+    with open(path, "rb") as cache_file:
+        return cache_file.read().decode("utf-8")
+
+
+def save_text(cache_file, value):
+    cache_file.write(value.encode("utf-8"))
+
+
+def make_cache(folder=None, max_entries=2, max_disk_bytes=None):
+    return TieredCache(".txt", load_text, save_text, max_entries, folder, max_disk_bytes, label="text")
+
+
+def age(path, seconds):
+    # Moves a file's modification time into the past
+    info = os.stat(path)
+    os.utime(path, (info.st_atime - seconds, info.st_mtime - seconds))
+
+
+def test_memory_tier_evicts_the_least_recently_used_entry():
+    cache = make_cache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    # "b" was the least recently used when "c" came in
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 1, "evictions": 1, "disk_evictions": 0, "entries": 2}
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    make_cache(str(tmp_path)).put("key", "value")
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    # A new process starts with an empty memory tier
+    cache = make_cache(str(tmp_path))
+    assert cache.get("key") == "value"
+    assert cache.get("key") == "value"
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["hits"] == 1
+
+    cache.clear()
+    assert cache.get("key") == "value" and cache.stats()["disk_hits"] == 2
+
+
+def test_disk_hits_refresh_the_modification_time(tmp_path):
+    cache = make_cache(str(tmp_path))
+    cache.put("key", "value")
+    path = tmp_path / "key.txt"
+    age(path, 3600)
+    before = os.stat(path).st_mtime
+
+    cache.clear()
+    cache.get("key")
+    assert os.stat(path).st_mtime > before
+
+
+def test_disk_tier_evicts_the_least_recently_used_files(tmp_path):
+    cache = make_cache(str(tmp_path), max_entries=8, max_disk_bytes=25)
+    for index, key in enumerate(["old", "used", "new"]):
+        cache.put(key, "x" * 10)
+        age(tmp_path / f"{key}.txt", 300 - index * 100)
+    # Over the bound once the third file was written: the oldest went
+    assert sorted(os.listdir(tmp_path)) == ["new.txt", "used.txt"]
+    assert cache.stats()["disk_evictions"] == 1
+
+    # Reading "used" makes it the most recently used, so "new" goes next
+    cache.clear()
+    cache.get("used")
+    cache.put("newest", "x" * 10)
+    assert sorted(os.listdir(tmp_path)) == ["newest.txt", "used.txt"]
+    assert cache.stats()["disk_evictions"] == 2
+
+
+def test_eviction_ignores_other_files(tmp_path):
+    (tmp_path / "notes.md").write_text("y" * 100)
+    cache = make_cache(str(tmp_path), max_disk_bytes=15)
+    cache.put("key", "x" * 10)
+    assert sorted(os.listdir(tmp_path)) == ["key.txt", "notes.md"]
+
+
+def test_unreadable_files_are_misses(tmp_path):
+    (tmp_path / "broken.txt").write_bytes(b"\xff\xfe")
+    cache = make_cache(str(tmp_path))
+    assert cache.get("broken") is None
+    assert cache.get("absent") is None
+    assert cache.stats()["misses"] == 2
+
+    # A write that can't reach the folder is reported, not raised
+    blocked = tmp_path / "file"
+    blocked.write_text("")
+    make_cache(str(blocked / "cache")).put("key", "value")
+
+
+def test_segments_are_shared_across_spellings_of_a_sentence(tmp_path):
+    assert normalize_sentence("“It’s  here,”\n she said.") == "\"It's here,\" she said."
+    assert normalize_sentence("Hello.") != normalize_sentence("hello.")
+
+    cache = TTSSegmentCache(max_entries=4, cache_folder=str(tmp_path))
+    segment = np.arange(240, dtype="<i2")
+    cache.put("It’s  here.", "tts-1", "onyx", 24000, segment)
+    np.testing.assert_array_equal(cache.get("It's here.", "tts-1", "onyx", 24000), segment)
+    assert cache.get("It's here.", "tts-1", "alloy", 24000) is None
+    assert cache.stats()["cached_seconds"] == pytest.approx(0.01)
+
+    # Kept on disk as .npy files for the next run
+    again = TTSSegmentCache(max_entries=4, cache_folder=str(tmp_path))
+    np.testing.assert_array_equal(again.get("It's here.", "tts-1", "onyx", 24000), segment)
+    assert again.stats()["disk_hits"] == 1
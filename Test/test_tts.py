@@ -0,0 +1,134 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from audio_generation import audio
+from audio_generation.pcm import pcm16_to_float
+from audio_generation.segment_cache import TTSSegmentCache
+from utils.providers import TokenBucket, tts
+
+
+def spoken(text):
+    # Samples a sentence is "spoken" as: one sample per character, its value set by the text
+    value = sum(map(ord, text)) % 20000 + 1
+    return np.full(len(text), value, dtype="<i2")
+
+
+class Stream:
+    def __init__(self, content, fail_after=None):
+        self.content = content
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_bytes(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise ConnectionError("stream reset")
+            yield self.content[start:start + chunk_size]
+
+
+class FakeTTS:
+    # OpenAI client stand-in answering streamed speech requests, counting them per sentence
+    def __init__(self, failures=0):
+        self.requests = []
+        self.failures = failures
+        self._lock = threading.Lock()
+        self.audio = SimpleNamespace(speech=SimpleNamespace(
+            with_streaming_response=SimpleNamespace(create=self.create),
+        ))
+
+    def create(self, model, input, voice, response_format):
+        assert response_format == "pcm"
+        with self._lock:
+            self.requests.append(input)
+            failing = self.failures > 0
+            self.failures -= failing
+        content = spoken(input).tobytes()
+        return Stream(content, fail_after=len(content) // 2 if failing else None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # A fresh in-memory segment cache and no rate limit, so tests neither share nor wait
+    fake = FakeTTS()
+    monkeypatch.setattr(audio, "tts_segment_cache", TTSSegmentCache(max_entries=64))
+    monkeypatch.setattr(tts, "bucket", TokenBucket(rate=None))
+    tts.set_client(fake)
+    yield fake
+    tts.set_client(None)
+
+
+def test_split_sentences():
+    text = 'First one. Second?  "Quoted!" Then e.g. this\nLast one'
+    assert audio.split_sentences(text) == ["First one.", "Second?", '"Quoted!"', "Then e.g.", "this\nLast one"]
+    assert audio.split_sentences("  ") == []
+    assert audio.split_sentences("Version 2.0 is out.") == ["Version 2.0 is out."]
+
+
+def test_iter_speech_yields_whole_samples_from_odd_chunks(client, monkeypatch):
+    monkeypatch.setattr(audio, "STREAM_CHUNK_BYTES", 3)
+    blocks = list(audio.iter_speech("Odd chunks."))
+    assert all(block.dtype == np.dtype("<i2") for block in blocks)
+    np.testing.assert_array_equal(np.concatenate(blocks), spoken("Odd chunks."))
+
+
+def test_read_speech_requests_a_broken_stream_again(client, monkeypatch):
+    monkeypatch.setattr(audio, "STREAM_CHUNK_BYTES", 4)
+    client.failures = 1
+    np.testing.assert_array_equal(audio.read_speech("Broken once."), spoken("Broken once."))
+    assert client.requests == ["Broken once.", "Broken once."]
+
+
+def test_read_speech_raises_errors_that_are_not_retryable(client, monkeypatch):
+    monkeypatch.setattr(Stream, "iter_bytes", lambda self, size: (_ for _ in ()).throw(ValueError("bad")))
+    with pytest.raises(ValueError):
+        audio.read_speech("Never works.")
+    assert client.requests == ["Never works."]
+
+
+def test_sentences_are_synthesized_once_and_spliced_in_order(client):
+    script = "The sky is blue. Water is wet. The sky is blue. Follow for more!"
+    speech, offsets = audio.synthesize_sentences(script, max_workers=3)
+
+    # The repeated sentence is requested once
+    assert sorted(client.requests) == sorted(["The sky is blue.", "Water is wet.", "Follow for more!"])
+
+    sentences = audio.split_sentences(script)
+    expected = np.concatenate([spoken(sentence) for sentence in sentences])
+    np.testing.assert_array_equal(speech, pcm16_to_float(expected.tobytes()))
+    assert speech.shape == (len(expected), 1)
+
+    # Each sentence's span covers exactly its samples, back to back
+    position = 0
+    for (sentence, start, end), text in zip(offsets, sentences):
+        assert sentence == text
+        assert start == position / audio.TTS_SAMPLE_RATE
+        position += len(text)
+        assert end == position / audio.TTS_SAMPLE_RATE
+
+
+def test_cached_sentences_are_not_requested_again(client):
+    audio.synthesize_sentences("Cached sentence. Another one.")
+    client.requests.clear()
+    speech, offsets = audio.synthesize_sentences("Another one. Cached  sentence. A new one.")
+    assert client.requests == ["A new one."]
+    assert [sentence for sentence, _, _ in offsets] == ["Another one.", "Cached  sentence.", "A new one."]
+    # The cached copy is reused even though the spacing differs
+    assert round((offsets[1][2] - offsets[1][1]) * audio.TTS_SAMPLE_RATE) == len("Cached sentence.")
+    assert audio.tts_segment_cache.stats()["cached_seconds"] > 0
+
+
+def test_narration_in_sentence_mode_keeps_the_sentence_spans(client):
+    narration = audio.synthesize_narration("One. Two.", mode="sentences")
+    assert [sentence for sentence, _, _ in narration.sentences] == ["One.", "Two."]
+    padding = round(audio.SILENCE_DURATION * audio.TTS_SAMPLE_RATE)
+    assert len(narration.samples) == len("One.") + len("Two.") + padding
+    with pytest.raises(ValueError):
+        audio.synthesize_narration("One.", mode="words")
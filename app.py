@@ -1,43 +1,231 @@
-from script_generation.script import generate_script
-from audio_generation.audio import generate_audio
-from video_editing.video import add_audio_to_video
-from sub_generation.sub import add_subtitles_to_video, generate_word_level_srt, clear_folder
-from utils.utils import ensure_folder_exists
-from music_generation.music import add_background_music
+from utils.render_profiles import RENDER_PROFILES, get_render_profile
+from utils.tracing import tracer
 
+import os
+import sys
 import time
+import inspect
+import argparse
 
-def create_video_with_audio_and_subtitles(background_clips_folder):
-    # Generate the script using GPT
-    script_text = generate_script()
-    
+def create_video_with_audio_and_subtitles(
+    background_clips_folder,
+    single_pass=True,
+    scratch_folder=None,
+    script_text=None,
+    music_folder="music_clips",
+    output_folder="final_videos",
+    output_video_file=None,
+    conform=False,
+    seed=None,
+    stt_backend="google",
+    tts_mode="single",
+    script_source="generate",
+    profile="standard",
+    segments=1,
+    caption_backend="sprites",
+    job_id=None
+):
     timestamp = int(time.time())
 
-    # Generate the audio from the provided script
-    audio_file = generate_audio(script_text)
+    # The job id names the job's folder and manifest, so running a job again with the same id
+    # resumes it. It is the given one, the caller's traced job or the output file's name; a job
+    # without any of these gets a new id and isn't meant to be resumed, so its manifest is
+    # removed with its intermediates once it succeeds
+    job_id = job_id or tracer.job_id or (os.path.splitext(output_video_file)[0] if output_video_file else None)
+    named = job_id is not None
+    if job_id is None:
+        job_id = f"finalvid{timestamp}"
+    if output_video_file is None:
+        output_video_file = f"{job_id}.mp4"
 
-    # Add audio to the randomized and trimmed video clips
-    video_file = add_audio_to_video(background_clips_folder, audio_file, output_video=f"final_audio{timestamp}.mp4")
+    options = job_record(locals())
 
-    # Generate the SRT file from the audio
-    srt_file = generate_word_level_srt(audio_file)
+    with tracer.job(job_id), tracer.span("video", single_pass=single_pass, profile=get_render_profile(profile).name):
+        try:
+            return _create_video(
+                background_clips_folder=background_clips_folder,
+                single_pass=single_pass,
+                scratch_folder=scratch_folder,
+                script_text=script_text,
+                music_folder=music_folder,
+                output_folder=output_folder,
+                output_video_file=output_video_file,
+                conform=conform,
+                seed=seed,
+                stt_backend=stt_backend,
+                tts_mode=tts_mode,
+                script_source=script_source,
+                profile=profile,
+                segments=segments,
+                caption_backend=caption_backend,
+                timestamp=timestamp,
+                options=options,
+                named=named
+            )
+        except Exception:
+            print(f"Job {job_id} failed; run it again with job_id={job_id!r} (--job-id {job_id}) to resume it")
+            raise
 
-    # Add subtitles to the final video
-    video_with_subtitles = add_subtitles_to_video(video_file, srt_file, output_video_with_subs=f"final_sub{timestamp}.mp4")
 
-    final_video_with_music = add_background_music(video_with_subtitles,  output_video_file=f"finalvid{timestamp}.mp4" )
+def job_record(options):
+    """
+    Every option of a create_video_with_audio_and_subtitles call, defaults included, as it is
+    recorded in the job manifest. scratch_folder and job_id are left out: they only say where
+    the job runs. The render profile is recorded by its settings.
+    """
+    signature = inspect.signature(create_video_with_audio_and_subtitles)
+    arguments = signature.bind(**{name: value for name, value in options.items() if name in signature.parameters})
+    arguments.apply_defaults()
+    record = dict(arguments.arguments)
+    record.pop("scratch_folder")
+    record.pop("job_id")
+    record["profile"] = get_render_profile(record["profile"]).describe()
+    return record
 
+
+def produced(video_file):
+    # The render steps return None when they fail; a failed step must not be checkpointed
+    if video_file is None:
+        raise RuntimeError("No video was produced")
+    return video_file
+
+
+def _create_video(*, background_clips_folder, single_pass, scratch_folder, script_text, music_folder, output_folder, output_video_file, conform, seed, stt_backend, tts_mode, script_source, profile, segments, caption_backend, timestamp, options, named):
+    # The stages are imported when a video is actually made, so --help, dry runs and
+    # worker processes that don't render start without loading moviepy and the API SDKs
+    from pipeline.stages import checkpoint_assets, checkpoint_render
+    from pipeline.manifest import JobManifest, JOBS_FOLDER
+
+    # Intermediates and the job manifest go to the job's own folder, which outlives a failed
+    # run: running the same job (same job id, by default the output file's name) again resumes
+    # where it stopped
+    job_id = tracer.job_id
+    scratch_folder = scratch_folder or os.path.join(JOBS_FOLDER, job_id)
+    manifest = JobManifest(scratch_folder, job_id=job_id)
+    finished = manifest.finished_output(options)
+    if finished is not None:
+        print(f"Job {job_id} already finished: {finished}")
+        return finished
+    if manifest.resumed:
+        print(f"Resuming job {job_id} from {manifest.path}")
+
+    # Generate the script, its audio and the SRT file from the audio
+    assets = checkpoint_assets(manifest, scratch_folder, script_text, stt_backend=stt_backend, tts_mode=tts_mode, script_source=script_source)
+
+    if single_pass:
+        # Compose background, narration, subtitles and music and encode them once
+        final_video_with_music = checkpoint_render(
+            manifest,
+            scratch_folder,
+            assets,
+            background_clips_folder,
+            output_video_file=output_video_file,
+            music_folder=music_folder,
+            output_folder=output_folder,
+            conform=conform,
+            seed=seed,
+            profile=profile,
+            segments=segments,
+            caption_backend=caption_backend
+        )
+    else:
+        from video_editing.video import add_audio_to_video
+        from sub_generation.sub import add_subtitles_to_video
+        from music_generation.music import add_background_music
+
+        inputs = {"narration": os.path.join(scratch_folder, "narration.wav"), "srt_file": assets["srt_file"]}
+        params = {key: options[key] for key in ("background_clips_folder", "music_folder", "output_folder", "output_video_file", "conform", "seed", "profile", "caption_backend")}
+
+        # Add audio to the randomized and trimmed video clips
+        audio_step = manifest.checkpoint("audio", lambda: {"video": produced(add_audio_to_video(
+            background_clips_folder, assets["narration"], output_video=f"final_audio{timestamp}.mp4",
+            output_folder=os.path.join(scratch_folder, "audio_vids"), conform=conform, profile=profile
+        ))}, inputs=inputs, params=params)
+
+        # Add subtitles to the final video
+        subtitles_step = manifest.checkpoint("subtitles", lambda: {"video": produced(add_subtitles_to_video(
+            audio_step["video"], assets["srt_file"], output_video_with_subs=f"final_sub{timestamp}.mp4",
+            output_folder=os.path.join(scratch_folder, "sub_vids"), profile=profile, caption_backend=caption_backend
+        ))}, inputs={"video": audio_step["video"], "srt_file": assets["srt_file"]}, params=params)
+
+        music_step = manifest.checkpoint("music", lambda: {"video": produced(add_background_music(
+            subtitles_step["video"], output_video_file=output_video_file, music_folder=music_folder,
+            output_folder=output_folder, profile=profile
+        ))}, inputs={"video": subtitles_step["video"]}, params=params)
+        final_video_with_music = music_step["video"]
+
+    # The intermediates are only removed once the final video is known to be sound
+    manifest.finalize(final_video_with_music, options, keep_manifest=named)
     print(f"Final Video Created: {final_video_with_music}")
+    return final_video_with_music
 
-    # Clean up temporary files
-    clear_folder('audio_outputs')
-    clear_folder('audio_vids')
-    clear_folder('transcripts')
-    clear_folder('sub_vids')
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a narrated, subtitled short video with background music.")
+    parser.add_argument("background_clips_folder", nargs="?", default="background_clips")
+    parser.add_argument("--script", help="Script to narrate instead of generating one")
+    parser.add_argument("--script-file", help="File with the script to narrate")
+    parser.add_argument("--script-source", choices=("generate", "pool"), default="generate", help="Without a script: generate one, or draw one from the script pool")
+    parser.add_argument("--music-folder", default="music_clips")
+    parser.add_argument("--output-folder", default="final_videos")
+    parser.add_argument("--output", dest="output_video_file", help="Filename of the final video (default: <job id>.mp4)")
+    parser.add_argument("--job-id", help="Id of the job; running a failed job again with its id (or its --output) resumes it")
+    parser.add_argument("--multi-step", action="store_true", help="Run the three standalone render steps instead of a single pass")
+    parser.add_argument("--scratch-folder", help="Folder for the intermediates and the job manifest (default: jobs/<output name>)")
+    parser.add_argument("--conform", action="store_true", help="Build the background from the conformed clip cache")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--stt-backend", default="google", help="google, google_chunked or align")
+    parser.add_argument("--tts-mode", default="single", help="single, or sentences to synthesize the sentences in parallel")
+    parser.add_argument("--profile", choices=list(RENDER_PROFILES), default="standard")
+    parser.add_argument("--segments", type=int, default=1, help="Render in this many parallel segments (0 for one per CPU); needs --conform")
+    parser.add_argument("--caption-backend", default="sprites", help="sprites or ass")
+    parser.add_argument("--dry-run", action="store_true", help="Check the inputs and print the job without running it")
+    return parser.parse_args(argv)
 
-# Example usage
-if __name__ == "__main__":
-    background_clips_folder = "background_clips"  # Replace with your actual folder containing clips
 
-    # Specify the output folder where the video should be saved
-    create_video_with_audio_and_subtitles(background_clips_folder)
+def main(argv=None):
+    args = parse_args(argv)
+    if args.segments != 1 and not args.conform:
+        # Checked before the job starts, rather than when its render stage is reached
+        print("--segments needs --conform: segments are cut at the keyframes of the conformed clips")
+        return 2
+
+    script_text = args.script
+    if args.script_file:
+        with open(args.script_file, "r", encoding="utf-8") as script_file:
+            script_text = script_file.read().strip()
+
+    options = dict(
+        background_clips_folder=args.background_clips_folder,
+        single_pass=not args.multi_step,
+        scratch_folder=args.scratch_folder,
+        script_text=script_text,
+        music_folder=args.music_folder,
+        output_folder=args.output_folder,
+        output_video_file=args.output_video_file,
+        conform=args.conform,
+        seed=args.seed,
+        stt_backend=args.stt_backend,
+        tts_mode=args.tts_mode,
+        script_source=args.script_source,
+        profile=args.profile,
+        segments=args.segments or None,
+        caption_backend=args.caption_backend,
+        job_id=args.job_id,
+    )
+
+    if args.dry_run:
+        # Nothing heavy is imported: only the inputs are checked
+        missing = [folder for folder in (args.background_clips_folder, args.music_folder) if not os.path.isdir(folder)]
+        for key, value in options.items():
+            print(f"{key}: {value!r}")
+        if missing:
+            print(f"Missing folders: {', '.join(missing)}")
+            return 1
+        return 0
+
+    create_video_with_audio_and_subtitles(**options)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
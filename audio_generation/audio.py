@@ -1,45 +1,160 @@
-from openai import OpenAI
+import re
 import time
 import os
-from moviepy.editor import AudioFileClip, concatenate_audioclips
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from audio_generation.pcm import Narration, pcm16_to_float, silence
+from audio_generation.segment_cache import tts_segment_cache, normalize_sentence
+from utils.providers import tts, is_retryable
+from utils.tracing import tracer
 
-client = OpenAI()
+# Text-to-speech settings; they are part of the cache key of generated narrations
+TTS_MODEL = "tts-1"
+TTS_VOICE = "onyx"
+SILENCE_DURATION = 1.5  # Seconds of silence added after the narration
+# The API's raw "pcm" format is 24 kHz, 16-bit, mono
+TTS_SAMPLE_RATE = 24000
 
-# Set your OpenAI API key
-client.api_key = os.getenv("OPENAI_API_KEY")
+# Synthesis modes: the whole script in one request, or one request per sentence in parallel
+TTS_MODES = ("single", "sentences")
+# Bytes read at a time from a streamed speech response
+STREAM_CHUNK_BYTES = 16384
 
-def generate_audio(script_text, output_folder="audio_outputs"):
-    # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+SENTENCE_END = re.compile(r"""(?:(?<=[.!?])|(?<=[.!?]["'”’)]))\s+""")
 
-    timestamp = int(time.time())
 
-    # Generate the output audio file name using the first word, saved in the specified folder
-    output_audio_file = os.path.join(output_folder, f"output_audio_{timestamp}.mp3")
+def split_sentences(script_text):
+    # Sentences of the script, split at whitespace after ., ! or ? (or one closing quote after them)
+    return [sentence.strip() for sentence in SENTENCE_END.split(script_text.strip()) if sentence.strip()]
+
+
+def iter_speech(text):
+    """
+    Synthesizes text as raw PCM, yielding the samples as the streamed response arrives.
+
+    Yields:
+    - numpy.ndarray: Consecutive int16 blocks of whole samples, mono at TTS_SAMPLE_RATE.
+    """
+    pending = b""
+    with tts.stream(lambda client: client.audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        input=text,
+        voice=TTS_VOICE,
+        response_format="pcm",
+    )) as response:
+        for chunk in response.iter_bytes(STREAM_CHUNK_BYTES):
+            # A chunk can end in the middle of a sample; its first byte waits for the next chunk
+            data = pending + chunk
+            whole = len(data) // 2 * 2
+            pending = data[whole:]
+            if whole:
+                yield np.frombuffer(data[:whole], dtype="<i2")
+
+
+def read_speech(text):
+    """
+    Synthesizes text, converting the streamed samples block by block as they arrive. A stream
+    that breaks off after it started is requested again, up to the TTS provider's retries,
+    since a partial sentence can't be resumed.
+
+    Returns:
+    - numpy.ndarray: int16 samples, mono at TTS_SAMPLE_RATE.
+    """
+    for attempt in range(tts.max_retries + 1):
+        blocks = []
+        try:
+            for block in iter_speech(text):
+                blocks.append(block)
+        except Exception as error:
+            # Failures before any audio arrived were already retried by the provider
+            if not blocks or attempt == tts.max_retries or not is_retryable(error):
+                raise
+            print(f"TTS stream broke off ({type(error).__name__}: {error}); requesting it again")
+            continue
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype="<i2")
+
+
+def synthesize_sentences(script_text, max_workers=None):
+    """
+    Assembles the narration of the script sentence by sentence. Sentences found in the TTS
+    segment cache are reused; the others are synthesized, at most max_workers at a time (by
+    default the TTS provider's concurrency cap), and cached. The sentences are spliced in order
+    at whole-sample boundaries, without crossfades.
+
+    Returns:
+    - tuple: (float32 samples shaped (n, 1), [(sentence, start, end), ...] in seconds).
+    """
+    sentences = split_sentences(script_text)
+    max_workers = max_workers or tts.concurrency.max_concurrency
+
+    segments = [tts_segment_cache.get(sentence, TTS_MODEL, TTS_VOICE, TTS_SAMPLE_RATE) for sentence in sentences]
+    # Sentences to synthesize, once each even if the script repeats them
+    missing = list(dict.fromkeys(
+        normalize_sentence(sentence) for sentence, segment in zip(sentences, segments) if segment is None
+    ))
+
+    def synthesize(sentence):
+        started = time.perf_counter()
+        # A whole number of samples, so every sentence starts exactly where the last one ended
+        return read_speech(sentence), time.perf_counter() - started
 
-    # Call the API to create the audio content
-    response = client.audio.speech.create(
-        model="tts-1",
-        input=script_text,
-        voice="onyx",
-    )
+    synthesized = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for sentence, (segment, seconds) in zip(missing, executor.map(synthesize, missing)):
+            # The workers' spans are not this thread's, so record the API time here
+            tracer.observe("api", seconds)
+            tts_segment_cache.put(sentence, TTS_MODEL, TTS_VOICE, TTS_SAMPLE_RATE, segment)
+            synthesized[sentence] = segment
 
-    # Write the audio file to the specified folder
-    with open(output_audio_file, 'wb') as audio_file:
-        audio_file.write(response.content)
+    offsets = []
+    position = 0
+    for index, sentence in enumerate(sentences):
+        if segments[index] is None:
+            segments[index] = synthesized[normalize_sentence(sentence)]
+        offsets.append((sentence, position / TTS_SAMPLE_RATE, (position + len(segments[index])) / TTS_SAMPLE_RATE))
+        position += len(segments[index])
+
+    print(f"Synthesized {len(missing)} of {len(sentences)} sentences; TTS segment cache: {tts_segment_cache.stats()}")
+    speech = pcm16_to_float(np.concatenate(segments).tobytes()) if segments else np.zeros((0, 1), dtype=np.float32)
+    return speech, offsets
+
+
+def synthesize_narration(script_text, mode="single"):
+    if mode not in TTS_MODES:
+        raise ValueError(f"Unknown TTS mode {mode!r}, expected one of {TTS_MODES}")
+
+    if mode == "sentences":
+        speech, sentences = synthesize_sentences(script_text)
+    else:
+        speech, sentences = synthesize_script(script_text), None
 
     # Add silence to the end of the audio
-    original_audio = AudioFileClip(output_audio_file)
-    silence_duration = 1.5  # 1.5 seconds of silence
-    silent_audio = AudioFileClip(os.path.join("background_clips", "silence.mp3")).set_duration(silence_duration)
+    with tracer.span("padding") as span:
+        padding = silence(SILENCE_DURATION, TTS_SAMPLE_RATE)
+        narration = Narration(np.concatenate([speech, padding]), TTS_SAMPLE_RATE, sentences=sentences)
+        span.set(duration=round(narration.duration, 3))
+
+    return narration
+
+
+def synthesize_script(script_text):
+    # Stream the whole script as raw PCM, so nothing has to be decoded and the samples are
+    # converted while the rest arrives; rate limited and retried by the shared TTS provider
+    return pcm16_to_float(read_speech(script_text).tobytes())
+
+
+def generate_audio(script_text, output_folder="audio_outputs", mode="single"):
+    # Ensure the output folder exists
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    timestamp = int(time.time())
 
-    # Concatenate original audio with silent audio
-    final_audio = concatenate_audioclips([original_audio, silent_audio])
+    narration = synthesize_narration(script_text, mode)
 
-    # Write the final audio to a new file
+    # Write the final audio to the specified folder, encoding it once
     final_output_audio_file = os.path.join(output_folder, f"output_audio_final_{timestamp}.mp3")
-    final_audio.write_audiofile(final_output_audio_file)
+    narration.write(final_output_audio_file)
 
     return final_output_audio_file
 
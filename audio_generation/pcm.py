@@ -0,0 +1,114 @@
+# pcm.py
+
+import os
+import wave
+import hashlib
+
+import numpy as np
+from utils.ffmpeg import encode_audio, resample_audio
+
+
+def pcm16_to_float(data, channels=1):
+    # Little-endian signed 16-bit PCM bytes to float32 samples shaped (n, channels)
+    samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    return samples.reshape(-1, channels)
+
+
+def silence(duration, sample_rate, channels=1):
+    return np.zeros((int(round(duration * sample_rate)), channels), dtype=np.float32)
+
+
+def resample(samples, source_rate, target_rate):
+    """
+    Resamples (n, channels) float32 samples with a band-limited (soxr) resampler.
+    """
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    return resample_audio(samples, source_rate, target_rate)
+
+
+def remix(samples, channels):
+    # Up- or down-mix (n, c) samples to the requested channel count
+    if samples.shape[1] == channels:
+        return samples
+    mono = samples.mean(axis=1, keepdims=True)
+    return np.repeat(mono, channels, axis=1)
+
+
+class Narration:
+    """
+    Narration audio held in memory as float32 PCM shaped (n, channels).
+
+    It is handed straight to the video and mux stages; it is only written to disk when a caller
+    needs a file (e.g. to upload it for transcription). Narrations synthesized sentence by
+    sentence keep each sentence's (text, start, end) in seconds in sentences, for the captions.
+    """
+
+    def __init__(self, samples, sample_rate, sentences=None):
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.sentences = sentences
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def channels(self):
+        return self.samples.shape[1]
+
+    def converted(self, sample_rate=None, channels=None):
+        # Copy of the narration at another sample rate and/or channel count
+        samples = resample(self.samples, self.sample_rate, sample_rate or self.sample_rate)
+        return Narration(remix(samples, channels or self.channels), sample_rate or self.sample_rate, self.sentences)
+
+    def mono(self, sample_rate):
+        # 1-D mono samples at the given rate, as used by the subtitle alignment
+        return self.converted(sample_rate, 1).samples[:, 0]
+
+    def digest(self):
+        # Content hash of the audio, used in artifact cache keys
+        digest = hashlib.sha1(np.ascontiguousarray(self.samples).tobytes())
+        digest.update(f"{self.sample_rate}:{self.channels}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def to_audio_clip(self, sample_rate=44100, channels=2):
+        from moviepy.audio.AudioClip import AudioArrayClip
+
+        converted = self.converted(sample_rate, channels)
+        # AudioArrayClip doesn't set its end, which composites need to know their duration
+        return AudioArrayClip(converted.samples, fps=sample_rate).set_duration(converted.duration)
+
+    def write(self, path):
+        """
+        Writes the narration to path: WAV is written losslessly as 16-bit PCM, any other
+        extension (e.g. .mp3) is encoded with ffmpeg.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        if path.lower().endswith(".wav"):
+            # The inverse of pcm16_to_float, so 16-bit samples read back from a WAV file are
+            # written again unchanged and the narration's digest survives the round trip
+            pcm = np.clip(np.round(self.samples * 32768.0), -32768, 32767).astype("<i2")
+            with wave.open(path, "wb") as wav_file:
+                wav_file.setnchannels(self.channels)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(self.sample_rate)
+                wav_file.writeframes(pcm.tobytes())
+        else:
+            encode_audio(self.samples, self.sample_rate, path)
+        return path
+
+    @classmethod
+    def read(cls, path):
+        # Reads a 16-bit PCM WAV file written by write()
+        with wave.open(path, "rb") as wav_file:
+            channels = wav_file.getnchannels()
+            sample_rate = wav_file.getframerate()
+            data = wav_file.readframes(wav_file.getnframes())
+        return cls(pcm16_to_float(data, channels), sample_rate)
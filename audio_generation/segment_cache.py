@@ -0,0 +1,77 @@
+# segment_cache.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+
+import numpy as np
+
+from utils.tiered_cache import TieredCache
+
+QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def normalize_sentence(text):
+    """
+    Text a sentence is cached under: Unicode-normalized, with straight quotes and single spaces.
+    Case and punctuation are kept, since they change how the sentence is spoken.
+    """
+    text = unicodedata.normalize("NFKC", text).translate(QUOTES)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def save_segment(segment_file, segment):
+    np.save(segment_file, segment)
+
+
+class TTSSegmentCache:
+    """
+    Two-tier cache of synthesized sentences, as decoded 16-bit PCM.
+
+    Segments are keyed on the normalized sentence text, the TTS model, the voice and the sample
+    rate. The in-process tier is an LRU bounded by entry count; the optional on-disk tier keeps
+    segments across runs as .npy files and is bounded by total size, evicting the least
+    recently used files first. Recurring sentences, like the call to action at the end of many
+    scripts, are then synthesized once.
+    """
+
+    def __init__(self, max_entries=1024, cache_folder=None, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_folder = cache_folder
+        self._cache = TieredCache(".npy", np.load, save_segment, max_entries, cache_folder, max_disk_bytes, label="TTS segment")
+        # Sentences are looked up by the I/O threads of concurrent jobs
+        self._lock = threading.Lock()
+        self.cached_seconds = 0.0
+
+    @staticmethod
+    def make_key(text, model, voice, sample_rate):
+        payload = json.dumps([normalize_sentence(text), model, voice, sample_rate])
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, text, model, voice, sample_rate):
+        """
+        Returns the cached int16 samples of a sentence, or None on a miss.
+        """
+        segment = self._cache.get(self.make_key(text, model, voice, sample_rate))
+        if segment is not None:
+            with self._lock:
+                self.cached_seconds += len(segment) / sample_rate
+        return segment
+
+    def put(self, text, model, voice, sample_rate, segment):
+        # Stores the int16 samples of a freshly synthesized sentence
+        segment = np.ascontiguousarray(segment, dtype="<i2")
+        self._cache.put(self.make_key(text, model, voice, sample_rate), segment)
+
+    def stats(self):
+        # Seconds of narration served from the cache instead of synthesized
+        return dict(self._cache.stats(), cached_seconds=round(self.cached_seconds, 3))
+
+    def clear(self):
+        self._cache.clear()
+
+
+# Shared cache used by sentence-by-sentence synthesis; segments persist in tts_cache/ across runs
+tts_segment_cache = TTSSegmentCache(cache_folder=os.getenv("TTS_CACHE_FOLDER", "tts_cache"))
@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import time
+import random
+import tempfile
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+from benchmarks.fixtures import make_narration, make_script, WORDS_PER_SECOND
+from utils.ffmpeg import encode_audio, decode_audio
+
+
+class FakeOpenAI:
+    """
+    Local stand-in for the OpenAI client: chat completions return a synthetic script and speech
+    returns synthetic narration of a matching length, after an optional simulated latency.
+    """
+
+    def __init__(self, latency=0.0, word_count=60):
+        self.latency = latency
+        self.word_count = word_count
+        self.api_key = "benchmark"
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+        self.audio = SimpleNamespace(speech=SimpleNamespace(
+            create=self._speak,
+            with_streaming_response=SimpleNamespace(create=lambda **kwargs: FakeStreamedResponse(self._speak(**kwargs).content)),
+        ))
+
+    def _complete(self, model, messages, response_format=None, **kwargs):
+        time.sleep(self.latency)
+        if response_format is not None:
+            # A batch of scripts as structured output, one per numbered brief of the prompt
+            briefs = re.findall(r"^(\d+)\. ", messages[-1]["content"], re.MULTILINE)
+            scripts = [{"index": int(index), "text": make_script(self.word_count, seed=random.random())} for index in briefs]
+            content = json.dumps({"scripts": scripts})
+        else:
+            content = make_script(self.word_count)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _speak(self, model, input, voice, response_format="mp3", **kwargs):
+        time.sleep(self.latency)
+        narration = make_narration(len(input.split()) / WORDS_PER_SECOND, sample_rate=24000)
+
+        if response_format == "pcm":
+            content = (np.clip(narration.samples[:, 0], -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        else:
+            handle, path = tempfile.mkstemp(suffix=f".{response_format}")
+            os.close(handle)
+            try:
+                encode_audio(narration.samples, narration.sample_rate, path)
+                with open(path, "rb") as audio_file:
+                    content = audio_file.read()
+            finally:
+                os.unlink(path)
+        return SimpleNamespace(content=content)
+
+
+class FakeStreamedResponse:
+    # Context manager of a streamed response, yielding the content in chunks
+    def __init__(self, content):
+        self.content = content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_bytes(self, chunk_size=None):
+        chunk_size = chunk_size or len(self.content) or 1
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class FakeSpeechClient:
+    """
+    Local stand-in for google.cloud.speech.SpeechClient: recognition returns one word per
+    WORDS_PER_SECOND slot of the uploaded audio, in the shape of a real response.
+    """
+
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def _duration(self, config, audio):
+        # Imported on first use, so installing the fakes doesn't load the Speech SDK
+        from google.cloud import speech_v1p1beta1 as speech
+
+        content = audio.content
+        if config.encoding == speech.RecognitionConfig.AudioEncoding.LINEAR16:
+            return len(content) / 2 / config.sample_rate_hertz
+
+        # ffmpeg detects the container (MP3, FLAC) from the content
+        handle, path = tempfile.mkstemp(suffix=".audio")
+        os.close(handle)
+        try:
+            with open(path, "wb") as audio_file:
+                audio_file.write(content)
+            # Decoded rather than probed: FLAC streamed from a pipe has no duration in its header
+            return len(decode_audio(path, sample_rate=16000)) / 16000
+        finally:
+            os.unlink(path)
+
+    def recognize(self, config, audio, **kwargs):
+        time.sleep(self.latency)
+        slot = 1.0 / WORDS_PER_SECOND
+        words = [
+            SimpleNamespace(
+                word=f"word{index}",
+                start_time=datetime.timedelta(seconds=index * slot),
+                end_time=datetime.timedelta(seconds=index * slot + slot * 0.8),
+            )
+            for index in range(int(self._duration(config, audio) * WORDS_PER_SECOND))
+        ]
+        alternative = SimpleNamespace(transcript=" ".join(word.word for word in words), words=words)
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative])] if words else [])
+
+    def long_running_recognize(self, config, audio, **kwargs):
+        response = self.recognize(config, audio)
+        return SimpleNamespace(result=lambda timeout=None: response)
+
+
+def install_fakes(latency=0.0):
+    """
+    Replaces the OpenAI and Google Speech clients used by the pipeline with the local fakes.
+    The fakes are installed as the clients of the shared providers, so requests still go through
+    their rate limits, concurrency caps and retries.
+    """
+    from utils.providers import chat, tts, stt
+
+    fake_openai = FakeOpenAI(latency=latency)
+    chat.set_client(fake_openai)
+    tts.set_client(fake_openai)
+    FakeSpeechClient.latency = latency
+    stt.set_client(FakeSpeechClient())
@@ -0,0 +1,111 @@
+import os
+import random
+
+import numpy as np
+from audio_generation.pcm import Narration
+from sub_generation.sub import write_word_srt
+from utils.ffmpeg import run_ffmpeg, encode_audio
+
+# Test patterns cycled through the generated background clips
+CLIP_PATTERNS = ("smptebars", "testsrc", "rgbtestsrc")
+# Pace of the synthetic narration and transcripts
+WORDS_PER_SECOND = 2.5
+
+
+def make_background_clips(folder, resolutions=((1080, 1920),), count=4, duration=5.0, fps=30):
+    """
+    Writes count color-bar clips per resolution to folder with ffmpeg's test sources.
+
+    Returns:
+    - list: Paths of the clips; existing clips are reused.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for width, height in resolutions:
+        for index in range(count):
+            pattern = CLIP_PATTERNS[index % len(CLIP_PATTERNS)]
+            path = os.path.join(folder, f"{pattern}_{width}x{height}_{index}.mp4")
+            if not os.path.exists(path):
+                run_ffmpeg([
+                    "-f", "lavfi", "-i", f"{pattern}=size={width}x{height}:rate={fps}:duration={duration}",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                    path,
+                ])
+            paths.append(path)
+    return paths
+
+
+def make_narration(duration, kind="tone", sample_rate=24000, seed=0):
+    """
+    Synthesizes a narration of duration seconds: bursts of a tone (or of noise) the length of
+    a word, separated by short gaps and a longer pause every sentence, so the level detection
+    of the mixer and the aligner see speech-like audio.
+
+    Returns:
+    - Narration: The audio in memory.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(round(duration * sample_rate))
+    t = np.arange(total) / sample_rate
+
+    if kind == "noise":
+        signal = rng.standard_normal(total).astype(np.float32) * 0.1
+    else:
+        signal = (0.3 * np.sin(2 * np.pi * 180 * t) + 0.1 * np.sin(2 * np.pi * 540 * t)).astype(np.float32)
+
+    # Word-length bursts; every eighth slot is a sentence pause
+    slot = 1.0 / WORDS_PER_SECOND
+    slot_index = (t // slot).astype(np.int64)
+    speaking = ((t % slot) < slot * 0.8) & (slot_index % 8 != 7)
+    return Narration(signal * speaking, sample_rate)
+
+
+def make_music(folder, count=2, duration=30.0, sample_rate=44100):
+    """
+    Writes count stereo MP3 tracks of chords and noise to folder.
+
+    Returns:
+    - list: Paths of the tracks; existing tracks are reused.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(1)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, f"music{index}.mp3")
+        if not os.path.exists(path):
+            root = 110 * (index + 2)
+            chord = sum(np.sin(2 * np.pi * root * ratio * t) for ratio in (1, 1.25, 1.5)) * 0.1
+            left = chord + rng.standard_normal(len(t)) * 0.02
+            right = chord + rng.standard_normal(len(t)) * 0.02
+            encode_audio(np.stack([left, right], axis=1), sample_rate, path)
+        paths.append(path)
+    return paths
+
+
+def make_script(word_count, seed=None):
+    # Script text of word_count words in sentences of seven; with a seed, the words are drawn at
+    # random so scripts of different seeds don't share phrases
+    if seed is None:
+        words = [f"word{index}" for index in range(word_count)]
+    else:
+        rng = random.Random(seed)
+        words = [f"word{rng.randrange(100000)}" for _ in range(word_count)]
+    sentences = [" ".join(words[start:start + 7]).capitalize() + "." for start in range(0, word_count, 7)]
+    return " ".join(sentences)
+
+
+def make_word_srt(path, word_count, words_per_second=WORDS_PER_SECOND):
+    """
+    Writes a word-level SRT of word_count words spoken at a steady pace.
+
+    Returns:
+    - str: path.
+    """
+    slot = 1.0 / words_per_second
+    words = [(f"WORD{index}", index * slot, index * slot + slot * 0.8) for index in range(word_count)]
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    write_word_srt(words, path)
+    return path
@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import importlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.fixtures import make_background_clips, make_narration, make_music, make_script, make_word_srt, WORDS_PER_SECOND
+
+# Benchmarked stages, in pipeline order, and where they live
+STAGES = {
+    "add_audio_to_video": "video_editing.video",
+    "generate_word_level_srt": "sub_generation.sub",
+    "add_subtitles_to_video": "sub_generation.sub",
+    "add_background_music": "music_generation.music",
+    "create_video_with_audio_and_subtitles": "app",
+}
+
+# Import time budgets in seconds of the entry points and of the modules the workers load
+IMPORT_BUDGETS = {
+    "app": 0.1,
+    "pipeline.batch": 0.1,
+    "pipeline.scheduler": 0.1,
+    "pipeline.stages": 0.5,
+}
+
+
+def run_stage(stage, kwargs, latency=0.0):
+    """
+    Runs one stage with the API fakes installed and measures it. Meant to run in a fresh
+    process, so the peak RSS is the stage's own.
+
+    Returns:
+    - dict: output, wall_s, cpu_s (including ffmpeg subprocesses), peak_rss_mb, peak_child_rss_mb.
+    """
+    from benchmarks.fakes import install_fakes
+
+    install_fakes(latency)
+    function = getattr(importlib.import_module(STAGES[stage]), stage)
+
+    own_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+
+    output = function(**kwargs)
+
+    wall = time.perf_counter() - started
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (own.ru_utime + own.ru_stime - own_before.ru_utime - own_before.ru_stime) + (
+        children.ru_utime + children.ru_stime - children_before.ru_utime - children_before.ru_stime
+    )
+
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "output": output,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "peak_rss_mb": round(own.ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(children.ru_maxrss / 1024, 1),
+    }
+
+
+def measure(stage, kwargs, latency=0.0):
+    # Run a stage in its own spawned process and add its frame rate for video outputs
+    from utils.ffmpeg import probe_media
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        result = executor.submit(run_stage, stage, kwargs, latency).result()
+
+    output = result["output"]
+    if isinstance(output, str) and output.endswith(".mp4"):
+        media = probe_media(output)
+        result["frames"] = int(round(media["duration"] * (media["fps"] or 0)))
+        result["fps"] = round(result["frames"] / result["wall_s"], 2) if result["wall_s"] else None
+    return result
+
+
+def measure_import(module):
+    """
+    Imports module in a fresh interpreter with python -X importtime.
+
+    Returns:
+    - dict: import_s (cumulative import time of the module) and wall_s (interpreter start included).
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    # Lines are "import time: self [us] | cumulative | name"; the module itself is reported last
+    for line in reversed(result.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return {"import_s": round(int(fields[1]) / 1e6, 4), "wall_s": round(wall, 3)}
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def benchmark_imports(run_id, commit, budgets=IMPORT_BUDGETS):
+    # One record per module, marked over_budget when its import takes longer than allowed
+    records = []
+    for module, budget in budgets.items():
+        record = {"run_id": run_id, "commit": commit, "case": f"import:{module}", "stage": "import", "module": module, "budget_s": budget}
+        try:
+            record.update(measure_import(module), status="ok")
+            record["over_budget"] = record["import_s"] > budget
+        except Exception as e:
+            record.update(status="failed", error=f"{type(e).__name__}: {e}")
+        records.append(record)
+    return records
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def previous_results(results_file):
+    # Latest earlier record of every case, to compare the new run against
+    latest = {}
+    if os.path.exists(results_file):
+        with open(results_file, "r", encoding="utf-8") as results:
+            for line in results:
+                record = json.loads(line)
+                if record.get("status") == "ok":
+                    latest[record["case"]] = record
+    return latest
+
+
+def run_benchmarks(
+    duration=30.0,
+    resolutions=((1080, 1920),),
+    stages=tuple(STAGES),
+    profile="standard",
+    stt_backend="google",
+    latency=0.0,
+    workdir="benchmark_work",
+    results_file="benchmark_results/results.jsonl",
+    threshold=0.1,
+    imports=True
+):
+    """
+    Benchmarks the pipeline stages on synthetic fixtures with the API clients replaced by fakes.
+
+    Each stage runs in a fresh process; the stages feed each other like in the multi-step
+    pipeline, and the end-to-end run starts from a fixed script. Results are appended to
+    results_file and compared with the previous run of the same case. With imports, the import
+    time of the entry points is measured first and checked against IMPORT_BUDGETS.
+
+    Returns:
+    - list: The records of this run.
+    """
+    run_id = time.strftime("%Y%m%d-%H%M%S")
+    commit = git_commit()
+    earlier = previous_results(results_file)
+
+    # Cold caches, job folders and script pool for this run, inherited by the stage processes,
+    # so a run neither reuses nor leaves behind anything outside the work folder
+    cache_root = os.path.join(workdir, f"caches_{run_id}")
+    os.environ["ARTIFACT_CACHE_FOLDER"] = os.path.join(cache_root, "artifacts")
+    os.environ["CAPTION_CACHE_FOLDER"] = os.path.join(cache_root, "captions")
+    os.environ["MUSIC_CACHE_FOLDER"] = os.path.join(cache_root, "music")
+    os.environ["TTS_CACHE_FOLDER"] = os.path.join(cache_root, "tts")
+    os.environ["JOBS_FOLDER"] = os.path.join(cache_root, "jobs")
+    os.environ["SCRIPT_POOL"] = os.path.join(cache_root, "script_pool.sqlite3")
+
+    word_count = int(duration * WORDS_PER_SECOND)
+    narration = make_narration(duration)
+    music_folder = os.path.join(workdir, "music")
+    make_music(music_folder)
+
+    records = benchmark_imports(run_id, commit) if imports else []
+    try:
+        for width, height in resolutions:
+            resolution = f"{width}x{height}"
+            clips_folder = os.path.join(workdir, f"clips_{resolution}")
+            make_background_clips(clips_folder, resolutions=((width, height),))
+            output_folder = os.path.join(workdir, f"outputs_{run_id}", resolution)
+
+            # Inputs of every stage; later stages use the outputs of earlier ones. Without the
+            # STT stage's transcript, the subtitle stage burns in a synthetic word-level SRT
+            outputs = {}
+            stage_inputs = {
+                "add_audio_to_video": lambda: dict(background_clips_folder=clips_folder, audio_file=narration, output_video="audio.mp4", output_folder=output_folder, profile=profile),
+                "generate_word_level_srt": lambda: dict(audio_file_path=narration, transcripts_folder=output_folder, backend=stt_backend, script_text=make_script(word_count)),
+                "add_subtitles_to_video": lambda: dict(video_file=outputs["add_audio_to_video"], srt_file=outputs.get("generate_word_level_srt") or make_word_srt(os.path.join(output_folder, "words.srt"), word_count), output_video_with_subs="sub.mp4", output_folder=output_folder, profile=profile),
+                "add_background_music": lambda: dict(video_file=outputs["add_subtitles_to_video"], output_video_file="final.mp4", music_folder=music_folder, output_folder=output_folder, profile=profile),
+                "create_video_with_audio_and_subtitles": lambda: dict(background_clips_folder=clips_folder, scratch_folder=os.path.join(output_folder, "scratch"), script_text=make_script(word_count), music_folder=music_folder, output_folder=output_folder, output_video_file="e2e.mp4", stt_backend=stt_backend, profile=profile),
+            }
+
+            for stage in stages:
+                case = f"{stage}@{resolution}/{duration:g}s/{profile}"
+                record = {"run_id": run_id, "commit": commit, "case": case, "stage": stage, "resolution": resolution, "duration": duration, "profile": profile}
+                try:
+                    kwargs = stage_inputs[stage]()
+                except KeyError as e:
+                    record.update(status="skipped", error=f"missing input from {e}")
+                    records.append(record)
+                    continue
+
+                try:
+                    result = measure(stage, kwargs, latency)
+                    outputs[stage] = result.pop("output")
+                    record.update(result, status="ok")
+                except Exception as e:
+                    message = str(e).strip().splitlines()
+                    record.update(status="failed", error=f"{type(e).__name__}: {message[0] if message else ''}")
+                records.append(record)
+    finally:
+        shutil.rmtree(cache_root, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(results_file) or ".", exist_ok=True)
+    with open(results_file, "a", encoding="utf-8") as results:
+        for record in records:
+            results.write(json.dumps(record) + "\n")
+
+    print_summary(records, earlier, threshold)
+    print(f"Results appended to {results_file}")
+    return records
+
+
+def print_summary(records, earlier, threshold=0.1):
+    # One line per case, with the change in wall time against the previous run
+    for record in records:
+        if record["status"] != "ok":
+            print(f"{record['case']:<70} {record['status']}: {record.get('error')}")
+            continue
+
+        if record["stage"] == "import":
+            line = f"{record['case']:<70} {record['import_s']:>8.3f}s import (budget {record['budget_s']:g}s) {record['wall_s']:>8.2f}s wall"
+            if record["over_budget"]:
+                line += " OVER BUDGET"
+            print(line)
+            continue
+
+        line = f"{record['case']:<70} {record['wall_s']:>8.2f}s wall {record['cpu_s']:>8.2f}s cpu {record['peak_rss_mb']:>8.1f} MB"
+        if record.get("fps"):
+            line += f" {record['fps']:>7.2f} fps"
+
+        previous = earlier.get(record["case"])
+        if previous and previous.get("wall_s"):
+            change = record["wall_s"] / previous["wall_s"] - 1
+            line += f" {change:+.1%} vs {previous.get('commit') or previous['run_id']}"
+            if change > threshold:
+                line += " REGRESSION"
+        print(line)
+
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the video pipeline offline on synthetic fixtures.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Narration length in seconds")
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(1080, 1920)])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--profile", default="standard")
+    parser.add_argument("--stt-backend", default="google")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated API latency in seconds")
+    parser.add_argument("--workdir", default="benchmark_work")
+    parser.add_argument("--results", default="benchmark_results/results.jsonl")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Wall time increase reported as a regression")
+    parser.add_argument("--no-imports", action="store_true", help="Skip the import time measurements")
+    args = parser.parse_args()
+
+    run_benchmarks(
+        duration=args.duration,
+        resolutions=args.resolutions,
+        stages=args.stages,
+        profile=args.profile,
+        stt_backend=args.stt_backend,
+        latency=args.latency,
+        workdir=args.workdir,
+        results_file=args.results,
+        threshold=args.threshold,
+        imports=not args.no_imports,
+    )
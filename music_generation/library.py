@@ -0,0 +1,157 @@
+# library.py
+
+import os
+import json
+import random
+import hashlib
+
+import numpy as np
+from utils.ffmpeg import decode_audio
+
+MUSIC_EXTENSIONS = ('.mp3', '.wav', '.aac', '.m4a', '.ogg')
+# Canonical layout every track is decoded to once
+MUSIC_SAMPLE_RATE = 44100
+MUSIC_CHANNELS = 2
+
+
+class MusicTrack:
+    """
+    A decoded music track backed by a read-only memory map of float32 PCM shaped (n, channels).
+
+    Trimming is a slice of the map and looping wraps the sample index, so fitting a track to a
+    video never copies more than the block of samples being read.
+    """
+
+    def __init__(self, path, samples, sample_rate, stats):
+        self.path = path
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.stats = stats
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    def frames(self, start, stop):
+        """
+        Returns samples [start, stop) of the track looped forever; a view when no wrap is needed.
+        """
+        length = len(self.samples)
+        count = stop - start
+        start %= length
+        stop = start + count
+
+        if stop <= length:
+            return self.samples[start:stop]
+        if count <= length:
+            # Block crossing the loop point once
+            return np.concatenate((self.samples[start:], self.samples[:stop - length]))
+        return self.samples.take(np.arange(start, stop) % length, axis=0)
+
+
+class MusicLibrary:
+    """
+    Decodes each track of a music folder once to the canonical sample rate and channel layout
+    and keeps it as raw PCM in cache_folder, next to a JSON sidecar with its loudness stats.
+    Cached tracks are decoded again only when the source's size or mtime changes.
+    """
+
+    def __init__(self, music_folder="music_clips", cache_folder="music_cache", sample_rate=MUSIC_SAMPLE_RATE, channels=MUSIC_CHANNELS):
+        self.music_folder = music_folder
+        self.cache_folder = cache_folder
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._tracks = {}
+
+    def track_paths(self):
+        return [
+            os.path.join(self.music_folder, f)
+            for f in sorted(os.listdir(self.music_folder))
+            if f.lower().endswith(MUSIC_EXTENSIONS)
+        ]
+
+    def choose(self, rng=random):
+        """
+        Returns a random track of the library, or None when the folder has no music.
+        """
+        paths = self.track_paths()
+        if not paths:
+            return None
+        return self.load(rng.choice(paths))
+
+    def load(self, path):
+        stat = os.stat(path)
+        cache_key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        pcm_path = os.path.join(self.cache_folder, f"{cache_key}.f32")
+        meta_path = os.path.join(self.cache_folder, f"{cache_key}.json")
+
+        loaded = self._tracks.get(path)
+        if loaded and loaded[0] == (stat.st_size, stat.st_mtime):
+            return loaded[1]
+
+        meta = None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            pass
+
+        fresh = (
+            meta is not None
+            and meta["size"] == stat.st_size
+            and meta["mtime"] == stat.st_mtime
+            and meta["sample_rate"] == self.sample_rate
+            and meta["channels"] == self.channels
+            and os.path.exists(pcm_path)
+        )
+        if not fresh:
+            meta = self._decode(path, stat, pcm_path, meta_path)
+
+        samples = np.memmap(pcm_path, dtype=np.float32, mode="r", shape=(meta["frames"], self.channels))
+        track = MusicTrack(path, samples, self.sample_rate, meta["stats"])
+        self._tracks[path] = ((stat.st_size, stat.st_mtime), track)
+        return track
+
+    def _decode(self, path, stat, pcm_path, meta_path):
+        print(f"Decoding music track {path}")
+        os.makedirs(self.cache_folder, exist_ok=True)
+        samples = decode_audio(path, sample_rate=self.sample_rate, channels=self.channels)
+        samples = samples.reshape(-1, self.channels)
+
+        # Loudness stats, so the mixer can level tracks without decoding them again
+        rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if len(samples) else 0.0
+        peak = float(np.max(np.abs(samples))) if len(samples) else 0.0
+        stats = {
+            "rms": rms,
+            "rms_db": float(20 * np.log10(rms)) if rms > 0 else -120.0,
+            "peak": peak,
+            "peak_db": float(20 * np.log10(peak)) if peak > 0 else -120.0,
+        }
+
+        tmp_path = f"{pcm_path}.{os.getpid()}.tmp"
+        samples.tofile(tmp_path)
+        os.replace(tmp_path, pcm_path)
+
+        meta = {
+            "source": os.path.abspath(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "frames": len(samples),
+            "stats": stats,
+        }
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+        os.replace(tmp_path, meta_path)
+        return meta
+
+
+_libraries = {}
+
+def get_music_library(music_folder="music_clips"):
+    # One library per folder and process, so decoded tracks stay mapped between videos
+    if music_folder not in _libraries:
+        _libraries[music_folder] = MusicLibrary(music_folder, cache_folder=os.getenv("MUSIC_CACHE_FOLDER", "music_cache"))
+    return _libraries[music_folder]
@@ -0,0 +1,159 @@
+# mixer.py
+
+import os
+import wave
+import tempfile
+
+import numpy as np
+
+# Length of the analysis hops of the ducking envelope follower
+ENVELOPE_SECONDS = 0.01
+# With leveling, tracks are brought to this RMS before the music gain, so quiet and loud
+# tracks sit at the same level under the narration; quiet tracks are boosted by at most
+# MAX_LEVEL_BOOST_DB
+MUSIC_REFERENCE_RMS_DB = -16.0
+MAX_LEVEL_BOOST_DB = 6.0
+# Leveling changes how loud the music of existing jobs is, so it is off unless MUSIC_LEVELING=1;
+# without it tracks play at their own level times the music gain
+LEVEL_MUSIC = os.getenv("MUSIC_LEVELING", "0") == "1"
+
+
+def level_gain(stats, reference_db=MUSIC_REFERENCE_RMS_DB, max_boost_db=MAX_LEVEL_BOOST_DB):
+    """
+    Returns the linear gain bringing a track with the library's loudness stats to reference_db
+    RMS, boosting by at most max_boost_db and never pushing its peak past full scale.
+    """
+    if not stats or stats["rms"] <= 0:
+        return 1.0
+    gain_db = min(reference_db - stats["rms_db"], max_boost_db, -stats["peak_db"])
+    return float(10 ** (gain_db / 20))
+
+
+def ducking_gain(narration, sample_rate, threshold_db=-40.0, duck_db=-9.0, knee_db=6.0, attack=0.05, release=0.4):
+    """
+    Computes the music gain envelope that ducks the music under the narration.
+
+    The narration level is measured over short hops; above threshold_db the music is pulled down
+    by up to duck_db (reached knee_db above the threshold), and the gain moves towards its target
+    with separate attack and release time constants.
+
+    Returns:
+    - tuple: (hop_times, gain) with the linear gain at the centre of every hop.
+    """
+    hop = max(1, int(sample_rate * ENVELOPE_SECONDS))
+    hop_count = int(np.ceil(len(narration) / hop))
+    if hop_count == 0:
+        return np.zeros(1), np.ones(1)
+
+    mono = narration.mean(axis=1) if narration.ndim > 1 else narration
+    padded = np.zeros(hop_count * hop, dtype=np.float32)
+    padded[:len(mono)] = mono
+    level_db = 10 * np.log10(np.mean(padded.reshape(hop_count, hop) ** 2, axis=1) + 1e-10)
+
+    target_db = duck_db * np.clip((level_db - threshold_db) / knee_db, 0.0, 1.0)
+
+    # One-pole smoothing of the gain: fast when ducking (attack), slow when recovering (release)
+    attack_coefficient = np.exp(-ENVELOPE_SECONDS / attack)
+    release_coefficient = np.exp(-ENVELOPE_SECONDS / release)
+    smoothed_db = np.empty_like(target_db)
+    current = 0.0
+    for index, target in enumerate(target_db.tolist()):
+        coefficient = attack_coefficient if target < current else release_coefficient
+        current = target + coefficient * (current - target)
+        smoothed_db[index] = current
+
+    hop_times = (np.arange(hop_count) + 0.5) * hop / sample_rate
+    return hop_times, 10 ** (smoothed_db / 20)
+
+
+def iter_mix(
+    narration,
+    music_track,
+    duration,
+    narration_gain=1.0,
+    music_gain=0.15,
+    fade_in=0.5,
+    fade_out=1.5,
+    block_size=65536,
+    level=LEVEL_MUSIC,
+    **ducking
+):
+    """
+    Mixes the narration and the music block by block with NumPy.
+
+    Parameters:
+    - narration (numpy.ndarray): Narration samples shaped (n, channels) at the music's sample rate.
+    - music_track (MusicTrack): Track from the music library; looped or trimmed to duration.
+    - duration (float): Length of the mix in seconds.
+    - narration_gain, music_gain (float): Linear gains of the two sources; music_gain applies
+      to the track after it is leveled, if it is.
+    - level (bool): Level the track to MUSIC_REFERENCE_RMS_DB from its loudness stats first
+      (LEVEL_MUSIC by default, i.e. off unless MUSIC_LEVELING=1).
+    - fade_in, fade_out (float): Music fade lengths in seconds.
+    - block_size (int): Samples per block; only one block of music and output is held at a time.
+    - ducking: Keyword arguments for ducking_gain.
+
+    Yields:
+    - numpy.ndarray: Consecutive float32 blocks of the mix shaped (block, channels).
+    """
+    sample_rate = music_track.sample_rate
+    total = int(round(duration * sample_rate))
+    channels = music_track.samples.shape[1]
+    hop_times, gain = ducking_gain(narration, sample_rate, **ducking)
+    if level:
+        music_gain *= level_gain(music_track.stats)
+
+    fade_in_samples = max(1, int(fade_in * sample_rate))
+    fade_out_samples = max(1, int(fade_out * sample_rate))
+
+    for start in range(0, total, block_size):
+        stop = min(start + block_size, total)
+        positions = np.arange(start, stop)
+        times = positions / sample_rate
+
+        # Music gain for every sample: fixed level, ducking envelope and fades
+        music_envelope = music_gain * np.interp(times, hop_times, gain)
+        music_envelope *= np.clip(positions / fade_in_samples, 0.0, 1.0)
+        music_envelope *= np.clip((total - positions) / fade_out_samples, 0.0, 1.0)
+
+        block = np.asarray(music_track.frames(start, stop), dtype=np.float32) * music_envelope[:, None].astype(np.float32)
+
+        # Add the narration where it overlaps this block
+        voice = narration[start:min(stop, len(narration))]
+        if len(voice):
+            block[:len(voice)] += voice[:, :channels] * narration_gain
+
+        yield np.clip(block, -1.0, 1.0)
+
+
+def write_mix(output_path, narration, music_track, duration, **options):
+    """
+    Writes the mix to a 16-bit WAV file block by block, so memory stays bounded for long videos.
+
+    Returns:
+    - str: output_path.
+    """
+    with wave.open(output_path, "wb") as wav_file:
+        wav_file.setnchannels(music_track.samples.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(music_track.sample_rate)
+        for block in iter_mix(narration, music_track, duration, **options):
+            wav_file.writeframes((block * 32767).astype("<i2").tobytes())
+    return output_path
+
+
+class TemporaryMix:
+    # A mixed soundtrack in a temporary WAV file that is deleted when its clip is closed
+
+    def __init__(self, narration, music_track, duration, **options):
+        from moviepy.audio.io.AudioFileClip import AudioFileClip
+
+        handle, self.path = tempfile.mkstemp(prefix="mix_", suffix=".wav")
+        os.close(handle)
+        write_mix(self.path, narration, music_track, duration, **options)
+        self.clip = AudioFileClip(self.path)
+
+    def close(self):
+        self.clip.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
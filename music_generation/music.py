@@ -3,18 +3,77 @@
 import os
 import random
 import time
-from moviepy.editor import (
-    VideoFileClip,
-    AudioFileClip,
-    CompositeAudioClip,
-    concatenate_audioclips
-)
+import numpy as np
+from music_generation.library import get_music_library
+from music_generation.mixer import TemporaryMix
+from utils.ffmpeg import decode_audio, probe_media
+from video_editing.readers import reader_pool
+from utils.render_profiles import get_render_profile
+from utils.tracing import tracer
+
+def mix_soundtrack(duration, music_folder='music_clips', rng=random, narration=None, narration_gain=1.0):
+    """
+    Mixes a randomly selected music clip under the narration, trimming or looping the music to
+    duration. The mix is computed with the vectorized mixer, which ducks the music under speech,
+    into a temporary WAV file.
+
+    Parameters:
+    - duration (float): Length of the soundtrack in seconds.
+    - music_folder (str): Path to the folder containing music clips.
+    - rng (random.Random): Source of randomness for the music selection.
+    - narration (str or Narration): The narration as an audio or video file, or in memory;
+      without it the soundtrack is the music only.
+    - narration_gain (float): Level of the narration in the mix.
+
+    Returns:
+    - TemporaryMix: The mixed soundtrack (its clip and WAV path), to close once written,
+      or None if no music is available.
+    """
+
+    # Randomly select a music track, decoded once and memory-mapped by the music library
+    track = get_music_library(music_folder).choose(rng)
+    if track is None:
+        print(f"No music files found in {music_folder}.")
+        return None
+    print(f"Selected background music: {track.path}")
+
+    # Bring the narration to the music's sample rate and channel layout
+    channels = track.samples.shape[1]
+    if narration is None:
+        samples = np.zeros((0, channels), dtype=np.float32)
+    elif isinstance(narration, str):
+        samples = decode_audio(narration, sample_rate=track.sample_rate, channels=channels).reshape(-1, channels)
+    else:
+        samples = narration.converted(track.sample_rate, channels).samples
+
+    # Mix the narration and the music (trimmed or looped to the duration, ducked under speech)
+    with tracer.span("music_mix", duration=round(duration, 3)):
+        return TemporaryMix(samples, track, duration, narration_gain=narration_gain, music_gain=0.15)
+
+
+def mix_background_music(video, music_folder='music_clips', rng=random, narration=None, narration_gain=1.0):
+    """
+    Mixes a randomly selected music clip under the narration of an already loaded video clip,
+    trimming or looping the music to match the video's duration (see mix_soundtrack).
+
+    Returns:
+    - tuple: (video clip with the mixed audio, list of audio clips to close once written),
+      or None if no music is available.
+    """
+    mix = mix_soundtrack(video.duration, music_folder, rng=rng, narration=narration, narration_gain=narration_gain)
+    if mix is None:
+        return None
+
+    # Set the mixed audio to the video clip
+    return video.set_audio(mix.clip), [mix]
+
 
 def add_background_music(
     video_file,
     output_video_file,
     music_folder='music_clips',
-    output_folder="final_videos"
+    output_folder="final_videos",
+    profile="standard"
 ):
     """
     Adds background music to a video by selecting a random music clip from the specified folder,
@@ -25,6 +84,7 @@ def add_background_music(
     - output_video_file (str): Filename for the output video file with background music.
     - music_folder (str): Path to the folder containing music clips.
     - output_folder (str): Path to the folder where the final video will be saved.
+    - profile (str): Render profile (draft, standard or archive) setting the encoder options.
 
     Returns:
     - str: Path to the output video file with background music, or None if an error occurs.
@@ -40,69 +100,28 @@ def add_background_music(
     # Full path for the output video file
     output_path = os.path.join(output_folder, output_video_file)
 
-    # Load the video
-    video = VideoFileClip(video_file)
-    video_duration = video.duration
-
-    # Get a list of all music files in the music_folder
-    music_files = [
-        os.path.join(music_folder, f)
-        for f in os.listdir(music_folder)
-        if f.lower().endswith(('.mp3', '.wav', '.aac', '.m4a', '.ogg'))
-    ]
-
-    if not music_files:
-        print(f"No music files found in {music_folder}.")
-        return None
-
-    # Randomly select a music file
-    selected_music_file = random.choice(music_files)
-    print(f"Selected background music: {selected_music_file}")
-
-    # Load the background music
-    background_music = AudioFileClip(selected_music_file)
-    music_duration = background_music.duration
-
-    # Adjust background music duration to match the video duration
-    # Check if the music clip is longer than the video first
-    if music_duration >= video_duration:
-        # Cut the music to match the video's duration
-        bg_music = background_music.subclip(0, video_duration)
-    else:
-        # Loop the music to match the video's duration
-        loops = int(video_duration // music_duration) + 1
-        music_clips = [background_music] * loops
-        concatenated_music = concatenate_audioclips(music_clips)
-        bg_music = concatenated_music.subclip(0, video_duration)
-
-    # Reduce the volume of the background music
-    bg_music = bg_music.volumex(0.15)  # Adjust volume level as needed
-
-    # If the video has existing audio, combine it with the background music
-    if video.audio:
-        # Adjust the volume of the video's audio if necessary
-        video_audio = video.audio.volumex(1.0)  # Adjust volume level as needed
-
-        # Combine the video's audio and the background music
-        final_audio = CompositeAudioClip([video_audio, bg_music])
-    else:
-        # Use only the background music
-        final_audio = bg_music
-
-    # Set the combined audio to the video clip
-    final_video = video.set_audio(final_audio)
-
-    # Write the final video to the output file
-    final_video.write_videofile(output_path, codec="libx264", audio_codec="aac", fps=video.fps)
-
-    # Close the clips to release resources
-    video.close()
-    background_music.close()
-    if video.audio:
-        video_audio.close()
-    bg_music.close()
-    final_audio.close()
-    final_video.close()
+    # The video's readers are released when the step ends, even if it fails
+    with reader_pool.session() as readers:
+        # Load the video; its audio is decoded by the mixer, so no audio reader is opened
+        video = readers.open(video_file)
+
+        # The existing audio of the video is the narration to mix the music under
+        has_audio = probe_media(video_file)["audio_codec"] is not None
+        mixed = mix_background_music(video, music_folder, narration=video_file if has_audio else None)
+        if mixed is None:
+            return None
+        final_video, audio_clips = mixed
+
+        # Write the final video to the output file
+        options = get_render_profile(profile).write_options(video.fps)
+        try:
+            with tracer.span("composite_encode", step="music", frames=int(final_video.duration * options["fps"])):
+                final_video.write_videofile(output_path, **options)
+        finally:
+            # Close the clips to release resources
+            for clip in audio_clips:
+                clip.close()
+            final_video.close()
 
     print(f"Final video saved to {output_path}")
     return output_path
@@ -0,0 +1,159 @@
+import os
+import json
+import shutil
+import hashlib
+from utils.utils import hash_file
+
+
+class ArtifactCache:
+    """
+    Content-addressed store for pipeline artifacts.
+
+    An artifact's key is the hash of its stage name, its inputs and its parameters; file inputs
+    are hashed by content, so a stage is skipped whenever everything it depends on is unchanged.
+    Artifacts are kept as <stage>/<key><suffix>. The folder is capped at max_bytes and evicts the
+    least recently used artifacts first (hits refresh an artifact's mtime).
+    """
+
+    def __init__(self, cache_folder="artifact_cache", max_bytes=10 * 1024 ** 3):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Content hashes of input files, remembered by (path, size, mtime)
+        self._file_hashes = {}
+
+    def _input_digest(self, value):
+        if isinstance(value, str) and os.path.isfile(value):
+            stat = os.stat(value)
+            file_key = (os.path.abspath(value), stat.st_size, stat.st_mtime)
+            if file_key not in self._file_hashes:
+                self._file_hashes[file_key] = hash_file(value)
+            return ["file", self._file_hashes[file_key]]
+        return ["value", value]
+
+    def key(self, stage, *inputs, **params):
+        """
+        Returns the cache key of an artifact produced by stage from inputs with params.
+
+        Inputs that are paths to existing files are hashed by content; everything else (text,
+        lists, dicts) must be JSON serialisable and is hashed by value.
+        """
+        payload = json.dumps(
+            [stage, [self._input_digest(value) for value in inputs], params],
+            sort_keys=True,
+            default=str,
+        )
+        return f"{stage}/{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_folder, f"{key}{suffix}")
+
+    def cached_path(self, key, suffix):
+        """
+        Returns the path of a cached artifact to read in place, or None on a miss.
+        """
+        cached_path = self._path(key, suffix)
+        try:
+            os.utime(cached_path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        print(f"Reusing cached artifact {key}")
+        return cached_path
+
+    def restore(self, key, suffix, output_path):
+        """
+        Copies a cached artifact to output_path.
+
+        Returns:
+        - str: output_path on a hit, or None on a miss.
+        """
+        cached_path = self._path(key, suffix)
+        if not os.path.exists(cached_path):
+            self.misses += 1
+            return None
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        try:
+            shutil.copyfile(cached_path, output_path)
+            os.utime(cached_path)
+        except OSError:
+            # Evicted by another process in the meantime
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        print(f"Reusing cached artifact {key}")
+        return output_path
+
+    def store(self, key, suffix, source_path):
+        """
+        Copies a freshly produced artifact into the cache and enforces the size cap.
+        """
+        self.store_with(key, suffix, lambda tmp_path: shutil.copyfile(source_path, tmp_path))
+
+    def store_with(self, key, suffix, write):
+        """
+        Stores an artifact by calling write(path) with a temporary path in the cache, which is
+        then moved into place atomically; useful for artifacts that only exist in memory.
+        """
+        cached_path = self._path(key, suffix)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        # Keep the suffix last so writers that pick a format from the extension still work
+        tmp_path = f"{cached_path}.{os.getpid()}.tmp{suffix}"
+        committed = False
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, cached_path)
+            committed = True
+        except OSError as e:
+            print(f"Failed to cache artifact {key}. Reason: {e}")
+            return
+        finally:
+            # A writer that failed in any way leaves no partial file in the cache
+            if not committed:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total_bytes = 0
+        for root, _, filenames in os.walk(self.cache_folder):
+            for filename in filenames:
+                if ".tmp" in filename:
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_bytes += stat.st_size
+
+        # Remove the least recently used artifacts until the cache fits its cap
+        entries.sort()
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_bytes -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# Shared cache used by the pipeline stages
+artifact_cache = ArtifactCache(
+    cache_folder=os.getenv("ARTIFACT_CACHE_FOLDER", "artifact_cache"),
+    max_bytes=int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", 10 * 1024 ** 3)),
+)
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.tracing import tracer
+
+# Job spec fields passed through to create_video_with_audio_and_subtitles
+JOB_OPTIONS = (
+    "background_clips_folder",
+    "single_pass",
+    "script_text",
+    "script_source",
+    "music_folder",
+    "output_folder",
+    "output_video_file",
+    "conform",
+    "seed",
+    "stt_backend",
+    "tts_mode",
+    "profile",
+    "segments",
+    "caption_backend",
+)
+
+
+def load_jobs(requests_file):
+    """
+    Reads one job spec per line from a JSON lines file.
+
+    Each spec may set job_id (or request_id) and any of the create_video_with_audio_and_subtitles
+    options in JOB_OPTIONS; "script" is accepted as an alias of script_text. Jobs without an id
+    are numbered by their line.
+
+    Returns:
+    - list: The job specs, in file order.
+    """
+    jobs = []
+    with open(requests_file, "r", encoding="utf-8") as jobs_file:
+        for line_number, line in enumerate(jobs_file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            job = json.loads(line)
+            if "script" in job and "script_text" not in job:
+                job["script_text"] = job["script"]
+            job["job_id"] = str(job.get("job_id") or job.get("request_id") or f"job-{line_number:04d}")
+            jobs.append(job)
+    return jobs
+
+
+def job_options(job):
+    # The create_video_with_audio_and_subtitles keyword arguments set by a job spec
+    options = {key: job[key] for key in JOB_OPTIONS if key in job}
+    options.setdefault("background_clips_folder", "background_clips")
+    options.setdefault("output_video_file", f"{job['job_id']}.mp4")
+    return options
+
+
+def run_job(job, scratch_root="scratch"):
+    """
+    Renders a single job in its own scratch folder, scratch_root/<job_id>. The job's manifest
+    there checkpoints its stages, so running a failed job again resumes it; the intermediates
+    are removed once the final video is verified.
+
+    Returns:
+    - dict: The job's report entry (job_id, status, output or error, timings).
+    """
+    # Import here so the parent process doesn't pay for moviepy and the API clients
+    from app import create_video_with_audio_and_subtitles
+
+    scratch_folder = os.path.join(scratch_root, job["job_id"])
+    options = job_options(job)
+
+    started = time.time()
+    report = {"job_id": job["job_id"], "started": started, "pid": os.getpid()}
+    try:
+        with tracer.job(job["job_id"]):
+            output_path = create_video_with_audio_and_subtitles(scratch_folder=scratch_folder, **options)
+        if output_path is None:
+            raise RuntimeError("No video was produced")
+        report.update(status="ok", output=output_path)
+    except Exception as e:
+        # The scratch folder is kept, with the manifest, for a rerun to resume from
+        report.update(status="failed", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(), scratch_folder=scratch_folder)
+
+    report["seconds"] = round(time.time() - started, 3)
+    return report
+
+
+def run_batch(requests_file="requests.jsonl", workers=2, scratch_root="scratch", report_folder="batch_reports"):
+    """
+    Renders every job from the requests file across a process pool and writes a report.
+
+    Returns:
+    - str: Path to the JSON report with one result or failure entry per job.
+    """
+    jobs = load_jobs(requests_file)
+    print(f"Running {len(jobs)} jobs with {workers} workers")
+
+    started = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, job, scratch_root): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed or out of memory)
+                result = {"job_id": job["job_id"], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            print(f"[{result['job_id']}] {result['status']}: {result.get('output') or result.get('error')}")
+            results.append(result)
+
+    return write_report(jobs, results, started, report_folder, requests_file=requests_file, workers=workers)
+
+
+def write_report(jobs, results, started, report_folder="batch_reports", **details):
+    """
+    Writes the per-job results of a run, in the order the jobs were requested.
+
+    Returns:
+    - str: Path to the JSON report.
+    """
+    order = {job["job_id"]: index for index, job in enumerate(jobs)}
+    results = sorted(results, key=lambda result: order.get(result["job_id"], len(order)))
+
+    summary = dict(
+        details,
+        seconds=round(time.time() - started, 3),
+        succeeded=sum(1 for result in results if result["status"] == "ok"),
+        failed=sum(1 for result in results if result["status"] != "ok"),
+        jobs=results,
+    )
+
+    os.makedirs(report_folder, exist_ok=True)
+    report_path = os.path.join(report_folder, f"batch_{int(started)}.json")
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(summary, report_file, indent=2)
+
+    print(f"{summary['succeeded']} succeeded, {summary['failed']} failed. Report: {report_path}")
+    return report_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a batch of videos from a JSON lines file of job specs.")
+    parser.add_argument("requests_file", nargs="?", default="requests.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--scratch-root", default="scratch")
+    parser.add_argument("--report-folder", default="batch_reports")
+    args = parser.parse_args()
+
+    run_batch(args.requests_file, workers=args.workers, scratch_root=args.scratch_root, report_folder=args.report_folder)
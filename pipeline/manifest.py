@@ -0,0 +1,213 @@
+import os
+import json
+import time
+
+from utils.ffmpeg import probe_media
+
+MANIFEST_NAME = "manifest.json"
+# Default parent of the per-job folders of single videos; JOBS_FOLDER overrides it
+JOBS_FOLDER = os.getenv("JOBS_FOLDER", "jobs")
+
+
+def normalized(value):
+    # The value as it reads back from the manifest, so recorded and current params compare equal
+    return json.loads(json.dumps(value, default=str))
+
+
+def file_record(path):
+    stat = os.stat(path)
+    return {"path": path, "size": stat.st_size}
+
+
+class JobManifest:
+    """
+    Checkpoints of one job's stages, kept as manifest.json in the job's folder.
+
+    Every stage is recorded with its inputs, params, outputs, status and timings. The file is
+    rewritten atomically (temporary file, then os.replace) on every change, so a job killed at
+    any point leaves either the previous or the new manifest, never a torn one. Running the job
+    again with the same folder skips every stage that finished with the same inputs and params
+    and whose output files are still there, and resumes from the first one that didn't.
+    """
+
+    def __init__(self, folder, job_id=None):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        try:
+            with open(self.path, "r", encoding="utf-8") as manifest_file:
+                self.data = json.load(manifest_file)
+        except (OSError, ValueError):
+            self.data = {"job_id": job_id, "created": time.time(), "status": "running", "stages": {}}
+        self.resumed = bool(self.data["stages"])
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    def save(self):
+        self.data["updated"] = time.time()
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.data, manifest_file, indent=2)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def completed(self, name, inputs=None, params=None):
+        """
+        Returns the outputs of a stage that finished with the same inputs and params and whose
+        output files are unchanged, or None if the stage has to run.
+        """
+        stage = self.data["stages"].get(name)
+        if stage is None or stage["status"] != "done":
+            return None
+        if stage["inputs"] != normalized(inputs or {}) or stage["params"] != normalized(params or {}):
+            return None
+        for record in stage["files"]:
+            if not os.path.isfile(record["path"]) or os.path.getsize(record["path"]) != record["size"]:
+                return None
+        return stage["outputs"]
+
+    def start(self, name, inputs=None, params=None):
+        # Later stages were built on this stage's previous outputs, so they run again too
+        stages = self.data["stages"]
+        if name in stages:
+            names = list(stages)
+            for later in names[names.index(name):]:
+                del stages[later]
+
+        self.data["status"] = "running"
+        stages[name] = {
+            "status": "running",
+            "inputs": normalized(inputs or {}),
+            "params": normalized(params or {}),
+            "outputs": {},
+            "files": [],
+            "started": time.time(),
+        }
+        self.save()
+
+    def finish(self, name, outputs):
+        # Output values that are files are recorded with their size, to detect them going missing
+        stage = self.data["stages"][name]
+        stage["outputs"] = normalized(outputs)
+        stage["files"] = [file_record(value) for value in outputs.values() if isinstance(value, str) and os.path.isfile(value)]
+        stage["status"] = "done"
+        stage["finished"] = time.time()
+        self.save()
+
+    def fail(self, name, error):
+        stage = self.data["stages"][name]
+        stage["status"] = "failed"
+        stage["error"] = f"{type(error).__name__}: {error}"
+        stage["finished"] = time.time()
+        self.data["status"] = "failed"
+        self.save()
+
+    def checkpoint(self, name, run, inputs=None, params=None):
+        """
+        Runs a stage unless it already finished, and records it.
+
+        Parameters:
+        - name (str): Name of the stage.
+        - run (callable): Runs the stage and returns its outputs as a JSON-serializable dict.
+        - inputs (dict): Files and values the stage reads that earlier stages produced.
+        - params (dict): Options of the stage.
+
+        Returns:
+        - dict: The outputs of the stage, recorded or fresh.
+        """
+        outputs = self.completed(name, inputs, params)
+        if outputs is not None:
+            print(f"Reusing the {name} stage of job {self.data['job_id']}")
+            return outputs
+
+        self.start(name, inputs, params)
+        try:
+            outputs = run()
+        except Exception as e:
+            self.fail(name, e)
+            raise
+        self.finish(name, outputs)
+        return outputs
+
+    def finalize(self, output_path, options=None, keep_manifest=True):
+        """
+        Verifies the final video and, if it is sound, removes the intermediates the stages
+        recorded, keeping the manifest. An unverified output leaves everything in place for a rerun.
+
+        Parameters:
+        - output_path (str): Path of the final video.
+        - options (dict): Options of the job, recorded so a rerun with other options isn't
+          answered with this video.
+        - keep_manifest (bool): Keep the manifest to answer reruns of the finished job; without
+          it the manifest, and the folder when it is left empty, are removed too.
+
+        Returns:
+        - str: output_path.
+        """
+        try:
+            media = verify_video(output_path)
+        except Exception as e:
+            self.data["status"] = "failed"
+            self.data["error"] = f"{type(e).__name__}: {e}"
+            self.save()
+            raise
+
+        self.data.update(status="done", options=normalized(options or {}), output=file_record(output_path), duration=media["duration"])
+        self.data.pop("error", None)
+        self.save()
+
+        # Only the files the stages recorded are removed, since the folder may be one the caller
+        # passed in; subfolders left empty by that go too
+        final_path = os.path.abspath(output_path)
+        for stage in self.data["stages"].values():
+            for record in stage["files"]:
+                path = record["path"]
+                if os.path.abspath(path) == final_path:
+                    continue
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                folder = os.path.dirname(path)
+                while folder and os.path.abspath(folder).startswith(os.path.abspath(self.folder) + os.sep):
+                    try:
+                        os.rmdir(folder)
+                    except OSError:
+                        break
+                    folder = os.path.dirname(folder)
+
+        if not keep_manifest:
+            os.unlink(self.path)
+            try:
+                os.rmdir(self.folder)
+            except OSError:
+                pass
+        return output_path
+
+    def finished_output(self, options=None):
+        # Path of the job's final video if the job already finished with these options and the
+        # video is unchanged
+        output = self.data.get("output")
+        if self.status != "done" or output is None or self.data.get("options") != normalized(options or {}):
+            return None
+        if not os.path.isfile(output["path"]) or os.path.getsize(output["path"]) != output["size"]:
+            return None
+        return output["path"]
+
+
+def verify_video(path):
+    """
+    Checks that a rendered video can be read and has a video and an audio stream.
+
+    Returns:
+    - dict: The probed media info.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        raise RuntimeError(f"The final video {path} is missing or empty")
+    media = probe_media(path)
+    if not media["duration"] or media["video_codec"] is None or media["audio_codec"] is None:
+        raise RuntimeError(f"The final video {path} is incomplete: {media}")
+    return media
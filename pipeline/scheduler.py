@@ -0,0 +1,211 @@
+import os
+import time
+import asyncio
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pipeline.batch import load_jobs, job_options, write_report
+from utils.tracing import tracer
+
+# Marks the end of a queue for its consumers
+DONE = object()
+
+
+def prepare_job(job, scratch_root="scratch"):
+    # API-bound stages of a job, run in a thread of the I/O pool; the job's manifest in
+    # scratch_root/<job_id> checkpoints them, so a rerun of a failed job resumes it
+    from app import job_record
+    from pipeline.stages import checkpoint_assets
+    from pipeline.manifest import JobManifest
+
+    scratch_folder = os.path.join(scratch_root, job["job_id"])
+    options = job_options(job)
+    if not options.get("single_pass", True):
+        # The render stage is a single-pass render; a multi-step job would silently become one
+        raise ValueError("The pipeline scheduler only runs single-pass jobs; run multi-step jobs (single_pass false) with pipeline.batch")
+    manifest = JobManifest(scratch_folder, job_id=job["job_id"])
+    finished = manifest.finished_output(job_record(options))
+    if finished is not None:
+        print(f"[{job['job_id']}] already finished: {finished}")
+        return {"scratch_folder": scratch_folder, "output": finished}
+
+    with tracer.job(job["job_id"]), tracer.span("prepare"):
+        assets = checkpoint_assets(manifest, scratch_folder, options.get("script_text"), stt_backend=options.get("stt_backend", "google"), tts_mode=options.get("tts_mode", "single"), script_source=options.get("script_source", "generate"))
+    assets["scratch_folder"] = scratch_folder
+    return assets
+
+
+def render_job(job, assets):
+    # CPU-bound stage of a job, run in a worker of the render process pool; the scratch folder's
+    # intermediates are removed only once the final video is verified
+    from app import job_record
+    from pipeline.stages import checkpoint_render
+    from pipeline.manifest import JobManifest
+
+    if "output" in assets:
+        return assets["output"]
+
+    options = job_options(job)
+    record = job_record(options)
+    options.pop("script_text", None)
+    options.pop("single_pass", None)
+    options.pop("stt_backend", None)
+    options.pop("tts_mode", None)
+    options.pop("script_source", None)
+    manifest = JobManifest(assets["scratch_folder"], job_id=job["job_id"])
+    with tracer.job(job["job_id"]), tracer.span("render"):
+        output_path = checkpoint_render(manifest, assets["scratch_folder"], assets, **options)
+    return manifest.finalize(output_path, record)
+
+
+class PipelineScheduler:
+    """
+    Runs jobs through two stage pools so API waits and renders overlap across videos.
+
+    Script, TTS and STT for each job run in an async I/O pool (the blocking SDK calls are moved
+    to threads, at most io_concurrency at a time). Finished assets go into a bounded queue that
+    feeds a process pool of render_workers renderers. When renders fall behind, the queue fills
+    up and the I/O stage waits, so no more than queue_size jobs are ever prepared ahead.
+    """
+
+    def __init__(self, io_concurrency=4, render_workers=None, queue_size=2, scratch_root="scratch"):
+        self.io_concurrency = io_concurrency
+        self.render_workers = render_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.scratch_root = scratch_root
+
+    async def run(self, jobs):
+        """
+        Runs every job through the pipeline.
+
+        Returns:
+        - list: One report entry per job (job_id, status, output or error, stage timings).
+        """
+        pending = asyncio.Queue()
+        for job in jobs:
+            pending.put_nowait(job)
+
+        prepared = asyncio.Queue(maxsize=self.queue_size)
+        results = []
+
+        with ProcessPoolExecutor(max_workers=self.render_workers) as render_pool:
+            io_workers = [
+                asyncio.create_task(self._io_worker(pending, prepared, results))
+                for _ in range(self.io_concurrency)
+            ]
+            render_workers = [
+                asyncio.create_task(self._render_worker(prepared, results, render_pool))
+                for _ in range(self.render_workers)
+            ]
+
+            # Once every job has been prepared, tell the renderers to stop after draining the queue
+            await asyncio.gather(*io_workers)
+            for _ in render_workers:
+                await prepared.put(DONE)
+            await asyncio.gather(*render_workers)
+
+        return results
+
+    async def _io_worker(self, pending, prepared, results):
+        while True:
+            try:
+                job = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            started = time.time()
+            try:
+                assets = await asyncio.to_thread(prepare_job, job, self.scratch_root)
+            except Exception as e:
+                results.append(self._failure(job, started, e))
+                continue
+
+            # Blocks while the render queue is full
+            await prepared.put((job, assets, started, time.time() - started))
+
+    async def _render_worker(self, prepared, results, render_pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await prepared.get()
+            if item is DONE:
+                return
+
+            job, assets, started, io_seconds = item
+            render_started = time.time()
+            try:
+                output_path = await loop.run_in_executor(render_pool, render_job, job, assets)
+                results.append({
+                    "job_id": job["job_id"],
+                    "status": "ok",
+                    "output": output_path,
+                    "io_seconds": round(io_seconds, 3),
+                    "render_seconds": round(time.time() - render_started, 3),
+                    "seconds": round(time.time() - started, 3),
+                })
+                print(f"[{job['job_id']}] ok: {output_path}")
+            except Exception as e:
+                # The scratch folder and its manifest stay for a rerun to resume from
+                results.append(self._failure(job, started, e))
+
+    @staticmethod
+    def _failure(job, started, error):
+        print(f"[{job['job_id']}] failed: {error}")
+        return {
+            "job_id": job["job_id"],
+            "status": "failed",
+            "error": f"{type(error).__name__}: {error}",
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+            "seconds": round(time.time() - started, 3),
+        }
+
+
+def run_pipeline(
+    requests_file="requests.jsonl",
+    io_concurrency=4,
+    render_workers=None,
+    queue_size=2,
+    scratch_root="scratch",
+    report_folder="batch_reports"
+):
+    """
+    Renders every job from the requests file with overlapping API and render stages.
+
+    Returns:
+    - str: Path to the JSON report.
+    """
+    jobs = load_jobs(requests_file)
+    scheduler = PipelineScheduler(io_concurrency, render_workers, queue_size, scratch_root)
+    print(f"Running {len(jobs)} jobs with {scheduler.io_concurrency} API workers and {scheduler.render_workers} render workers")
+
+    started = time.time()
+    results = asyncio.run(scheduler.run(jobs))
+    return write_report(
+        jobs,
+        results,
+        started,
+        report_folder,
+        requests_file=requests_file,
+        io_concurrency=scheduler.io_concurrency,
+        render_workers=scheduler.render_workers,
+        queue_size=scheduler.queue_size,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a batch of videos with overlapping API and render stages.")
+    parser.add_argument("requests_file", nargs="?", default="requests.jsonl")
+    parser.add_argument("--io-concurrency", type=int, default=4)
+    parser.add_argument("--render-workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--scratch-root", default="scratch")
+    parser.add_argument("--report-folder", default="batch_reports")
+    args = parser.parse_args()
+
+    run_pipeline(
+        args.requests_file,
+        io_concurrency=args.io_concurrency,
+        render_workers=args.render_workers,
+        queue_size=args.queue_size,
+        scratch_root=args.scratch_root,
+        report_folder=args.report_folder,
+    )
@@ -0,0 +1,230 @@
+from script_generation.script import generate_script
+from audio_generation.audio import synthesize_narration, TTS_MODEL, TTS_VOICE, SILENCE_DURATION
+from audio_generation.pcm import Narration
+from sub_generation.sub import generate_word_level_srt, STT_LANGUAGE, CAPTION_LAYER_STYLES
+from video_editing.render import render_video
+from video_editing.clip_index import ClipIndex
+from music_generation.mixer import LEVEL_MUSIC
+from pipeline.artifact_cache import artifact_cache
+from utils.render_profiles import get_render_profile
+from utils.tracing import tracer
+
+import os
+import json
+import time
+
+
+def write_json(path, value):
+    with open(path, "w", encoding="utf-8") as json_file:
+        json.dump(value, json_file)
+
+
+def folder_signature(folder):
+    # Names, sizes and mtimes of a folder's files; changes whenever a file is added, removed or edited
+    signature = []
+    for filename in sorted(os.listdir(folder)):
+        path = os.path.join(folder, filename)
+        if os.path.isfile(path) and not filename.startswith("."):
+            stat = os.stat(path)
+            signature.append([filename, stat.st_size, stat.st_mtime])
+    return signature
+
+
+def write_script(script_text=None, script_source="generate"):
+    # Generate the script using GPT, or take a pre-generated one from the pool
+    if script_text is None:
+        with tracer.span("script", source=script_source):
+            if script_source == "pool":
+                from script_generation.pool import draw_script
+                script_text = draw_script(job_id=tracer.job_id)
+            else:
+                script_text = generate_script()
+        if script_text is None:
+            raise RuntimeError("Script generation failed")
+    return script_text
+
+
+def narrate(script_text, tts_mode="single"):
+    # Generate the audio from the provided script, unless it was already synthesized;
+    # the narration stays in memory and is cached as lossless WAV, with its sentence offsets
+    tts_key = artifact_cache.key("tts", script_text, model=TTS_MODEL, voice=TTS_VOICE, silence=SILENCE_DURATION, mode=tts_mode)
+    with tracer.span("tts", characters=len(script_text), mode=tts_mode) as span:
+        cached_audio = artifact_cache.cached_path(tts_key, ".wav")
+        cached_sentences = artifact_cache.cached_path(tts_key, ".json") if tts_mode == "sentences" else None
+        if cached_audio is not None and (tts_mode != "sentences" or cached_sentences is not None):
+            span.set(cached=True)
+            narration = Narration.read(cached_audio)
+            if cached_sentences is not None:
+                with open(cached_sentences, "r", encoding="utf-8") as sentences_file:
+                    narration.sentences = [tuple(sentence) for sentence in json.load(sentences_file)]
+        else:
+            span.set(cached=False)
+            narration = synthesize_narration(script_text, mode=tts_mode)
+            artifact_cache.store_with(tts_key, ".wav", narration.write)
+            if narration.sentences is not None:
+                artifact_cache.store_with(tts_key, ".json", lambda path: write_json(path, narration.sentences))
+    return narration
+
+
+def transcribe(narration, script_text, transcripts_folder, stt_backend="google"):
+    # Generate the SRT file from the audio, unless this audio was already transcribed
+    if stt_backend == "align":
+        stt_key = artifact_cache.key("stt", narration.digest(), script_text, backend=stt_backend)
+    else:
+        stt_key = artifact_cache.key("stt", narration.digest(), language=STT_LANGUAGE, backend=stt_backend)
+    with tracer.span("stt", backend=stt_backend, duration=round(narration.duration, 3)) as span:
+        srt_file = artifact_cache.restore(stt_key, ".srt", os.path.join(transcripts_folder, f"transcript{int(time.time())}.srt"))
+        span.set(cached=srt_file is not None)
+        if srt_file is None:
+            srt_file = generate_word_level_srt(narration, transcripts_folder=transcripts_folder, backend=stt_backend, script_text=script_text)
+            if srt_file is None:
+                raise RuntimeError("Subtitle generation failed")
+            artifact_cache.store(stt_key, ".srt", srt_file)
+    return srt_file
+
+
+def generate_assets(scratch_folder=None, script_text=None, stt_backend="google", tts_mode="single", script_source="generate"):
+    """
+    Runs the API-bound stages of a video: script, text-to-speech and speech-to-text.
+
+    The narration and the transcript are looked up in the artifact cache first, keyed by the
+    script text and the narration audio respectively, so retries don't pay for TTS and STT again.
+
+    Parameters:
+    - scratch_folder (str): Folder for the intermediates, or None for the shared folders.
+    - script_text (str): Script to narrate; generated with GPT when None.
+    - script_source (str): Without a script_text, "generate" writes one with GPT and "pool" draws
+      a pre-generated one from the script pool.
+    - stt_backend (str): "google" to transcribe the narration, "align" to align the script to it locally.
+    - tts_mode (str): "single" to synthesize the script in one request, "sentences" to synthesize
+      its sentences in parallel and keep their offsets in the narration.
+
+    Returns:
+    - dict: script_text, narration (in-memory PCM) and srt_file.
+    """
+    scratch_root = scratch_folder or ""
+    script_text = write_script(script_text, script_source)
+    narration = narrate(script_text, tts_mode)
+    srt_file = transcribe(narration, script_text, os.path.join(scratch_root, "transcripts"), stt_backend)
+    return {"script_text": script_text, "narration": narration, "srt_file": srt_file}
+
+
+def checkpoint_assets(manifest, scratch_folder, script_text=None, stt_backend="google", tts_mode="single", script_source="generate"):
+    """
+    Runs the stages of generate_assets as the script, tts and stt checkpoints of a job manifest.
+
+    A drawn or generated script is recorded, so a rerun narrates the same one; the narration is
+    kept as narration.wav (and its sentence offsets) in the scratch folder for the later stages.
+
+    Returns:
+    - dict: script_text, narration (in-memory PCM) and srt_file, like generate_assets.
+    """
+    script = manifest.checkpoint(
+        "script",
+        lambda: {"script_text": write_script(script_text, script_source)},
+        params={"script_text": script_text, "script_source": script_source},
+    )
+    script_text = script["script_text"]
+
+    def synthesize():
+        narration = narrate(script_text, tts_mode)
+        return {"narration": narration.write(os.path.join(scratch_folder, "narration.wav")), "sentences": narration.sentences}
+
+    audio = manifest.checkpoint(
+        "tts",
+        synthesize,
+        inputs={"script_text": script_text},
+        params={"model": TTS_MODEL, "voice": TTS_VOICE, "silence": SILENCE_DURATION, "mode": tts_mode},
+    )
+    # Later stages use the narration as it was saved, so a resumed job renders the same audio
+    narration = Narration.read(audio["narration"])
+    if audio["sentences"] is not None:
+        narration.sentences = [tuple(sentence) for sentence in audio["sentences"]]
+
+    transcript = manifest.checkpoint(
+        "stt",
+        lambda: {"srt_file": transcribe(narration, script_text, os.path.join(scratch_folder, "transcripts"), stt_backend)},
+        inputs={"narration": audio["narration"]},
+        params={"backend": stt_backend},
+    )
+    return {"script_text": script_text, "narration": narration, "srt_file": transcript["srt_file"]}
+
+
+def render_assets(
+    assets,
+    background_clips_folder,
+    output_video_file,
+    music_folder="music_clips",
+    output_folder="final_videos",
+    conform=False,
+    seed=None,
+    profile="standard",
+    segments=1,
+    caption_backend="sprites"
+):
+    """
+    Runs the CPU-bound stage of a video: the single-pass render of the generated assets.
+
+    With a seed the clip and music selection is reproducible, so the rendered video is cached
+    by its clips, audio, timings, music, caption style and render profile and reused when none of them changed.
+
+    Returns:
+    - str: Path to the final video file.
+    """
+    output_path = os.path.join(output_folder, output_video_file)
+
+    render_key = None
+    if seed is not None:
+        render_key = artifact_cache.key(
+            "render",
+            assets["narration"].digest(),
+            assets["srt_file"],
+            [[entry["path"], entry["size"], entry["mtime"]] for entry in ClipIndex(background_clips_folder).refresh()],
+            folder_signature(music_folder),
+            CAPTION_LAYER_STYLES,
+            conform=conform,
+            seed=seed,
+            music_leveling=LEVEL_MUSIC,
+            profile=get_render_profile(profile).describe(),
+            caption_backend=caption_backend,
+        )
+        if artifact_cache.restore(render_key, ".mp4", output_path):
+            return output_path
+
+    output_path = render_video(
+        background_clips_folder,
+        assets["narration"],
+        assets["srt_file"],
+        output_video_file=output_video_file,
+        music_folder=music_folder,
+        output_folder=output_folder,
+        conform=conform,
+        seed=seed,
+        profile=profile,
+        segments=segments,
+        caption_backend=caption_backend
+    )
+    if output_path is None:
+        raise RuntimeError("No video was produced")
+
+    if render_key is not None:
+        artifact_cache.store(render_key, ".mp4", output_path)
+    return output_path
+
+
+def checkpoint_render(manifest, scratch_folder, assets, background_clips_folder, output_video_file, **options):
+    """
+    Runs render_assets as the render checkpoint of a job manifest; options are those of render_assets.
+
+    Returns:
+    - str: Path to the final video file.
+    """
+    params = dict(options, background_clips_folder=background_clips_folder, output_video_file=output_video_file)
+    params["profile"] = get_render_profile(params.get("profile", "standard")).describe()
+    render = manifest.checkpoint(
+        "render",
+        lambda: {"video": render_assets(assets, background_clips_folder, output_video_file, **options)},
+        inputs={"narration": os.path.join(scratch_folder, "narration.wav"), "srt_file": assets["srt_file"]},
+        params=params,
+    )
+    return render["video"]
@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import atexit
+import argparse
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from script_generation.script import STYLES, TOPICS, SCRIPT_MODEL, SYSTEM_PROMPT, CALL_TO_ACTION_PROMPT, generate_script
+from utils.providers import chat
+
+# Scripts requested per chat completion
+SCRIPTS_PER_REQUEST = 10
+# Scripts sharing this fraction of their word trigrams with an earlier one are near-duplicates
+DUPLICATE_SIMILARITY = 0.6
+# A background refill starts when fewer unused scripts are left
+REFILL_THRESHOLD = int(os.getenv("SCRIPT_POOL_REFILL_THRESHOLD", 20))
+REFILL_COUNT = int(os.getenv("SCRIPT_POOL_REFILL_COUNT", 50))
+# Seconds a process waits at exit for a running refill, so paid batch requests aren't cut off
+REFILL_EXIT_TIMEOUT = float(os.getenv("SCRIPT_POOL_REFILL_EXIT_TIMEOUT", 300))
+
+WORD = re.compile(r"[a-z0-9']+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL,
+    fingerprint TEXT NOT NULL UNIQUE,
+    style TEXT,
+    topic TEXT,
+    sentences INTEGER,
+    call_to_action INTEGER,
+    created REAL NOT NULL,
+    used REAL,
+    job_id TEXT
+);
+CREATE INDEX IF NOT EXISTS scripts_unused ON scripts (used, id);
+CREATE INDEX IF NOT EXISTS scripts_topic ON scripts (topic);
+"""
+
+# Structured output of a batch request: one script per numbered brief
+SCRIPTS_SCHEMA = {
+    "name": "scripts",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "scripts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"index": {"type": "integer"}, "text": {"type": "string"}},
+                    "required": ["index", "text"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["scripts"],
+        "additionalProperties": False,
+    },
+}
+
+
+def script_words(text):
+    return WORD.findall(text.lower())
+
+
+def fingerprint(text):
+    # Identical for scripts that only differ in case, punctuation or spacing
+    return hashlib.sha1(" ".join(script_words(text)).encode("utf-8")).hexdigest()
+
+
+def shingles(text):
+    words = script_words(text)
+    return {tuple(words[index:index + 3]) for index in range(max(1, len(words) - 2))}
+
+
+def similarity(first, second):
+    # Jaccard similarity of two shingle sets
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class ScriptPool:
+    """
+    Pre-generated scripts in a local SQLite database.
+
+    Every script is stored with its style, topic and length, and with the time and job it was
+    used by. draw() hands out the oldest unused script and marks it used in one transaction,
+    so concurrent jobs, also in other processes, never get the same script.
+    """
+
+    def __init__(self, db_path="script_pool.sqlite3"):
+        self.db_path = db_path
+        self._created = False
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call, so the pool can be used from any thread; the database is
+        # created on first use rather than when the module is imported
+        if not self._created:
+            folder = os.path.dirname(self.db_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if not self._created:
+                connection.executescript(SCHEMA)
+                self._created = True
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    def add(self, scripts):
+        """
+        Adds script dicts (text, style, topic, sentences, call_to_action), skipping the ones that
+        are identical or near-identical to a script of the same topic already in the pool.
+
+        Returns:
+        - int: The number of scripts added.
+        """
+        added = 0
+        with self._connect() as connection:
+            known = {}
+            for script in scripts:
+                text = script["text"].strip()
+                topic = script.get("topic")
+                if topic not in known:
+                    rows = connection.execute("SELECT text FROM scripts WHERE topic IS ?", (topic,)).fetchall()
+                    known[topic] = [shingles(row[0]) for row in rows]
+
+                script_shingles = shingles(text)
+                if not text or any(similarity(script_shingles, other) >= DUPLICATE_SIMILARITY for other in known[topic]):
+                    continue
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO scripts (text, fingerprint, style, topic, sentences, call_to_action, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (text, fingerprint(text), script.get("style"), topic, script.get("sentences"), int(bool(script.get("call_to_action"))), time.time()),
+                )
+                if cursor.rowcount:
+                    known[topic].append(script_shingles)
+                    added += 1
+        return added
+
+    def draw(self, job_id=None):
+        """
+        Marks the oldest unused script as used by job_id and returns its text, or None if the
+        pool is empty.
+        """
+        with self._connect() as connection:
+            # Take the write lock before reading, so no other process can draw the same row
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT id, text FROM scripts WHERE used IS NULL ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                connection.execute("UPDATE scripts SET used = ?, job_id = ? WHERE id = ?", (time.time(), job_id, row[0]))
+        return row[1] if row else None
+
+    def unused_count(self):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM scripts WHERE used IS NULL").fetchone()[0]
+
+    def stats(self):
+        with self._connect() as connection:
+            total, unused = connection.execute("SELECT COUNT(*), COUNT(*) - COUNT(used) FROM scripts").fetchone()
+        return {"scripts": total, "unused": unused, "used": total - unused}
+
+
+def script_briefs(count, rng=random):
+    """
+    Returns count script briefs covering the styles x topics matrix evenly, each with a random
+    length and call to action like generate_script picks them.
+    """
+    cells = [(style, topic) for style in STYLES for topic in TOPICS]
+    briefs = []
+    while len(briefs) < count:
+        rng.shuffle(cells)
+        for style, topic in cells[:count - len(briefs)]:
+            briefs.append({
+                "style": style,
+                "topic": topic,
+                "sentences": rng.randint(2, 8),
+                "call_to_action": rng.choice([True, False]),
+            })
+    return briefs
+
+
+def request_scripts(briefs):
+    """
+    Asks for one script per brief in a single chat completion with structured output.
+
+    Returns:
+    - list: The briefs that came back, each with its text added.
+    """
+    lines = []
+    for index, brief in enumerate(briefs, start=1):
+        line = f"{index}. A {brief['sentences']}-sentence message about {brief['topic']} in the style of {brief['style']}."
+        if brief["call_to_action"]:
+            line += " " + CALL_TO_ACTION_PROMPT
+        lines.append(line)
+
+    prompt = (
+        "Write a powerful motivational message in paragraph form for each numbered brief below. Each message should "
+        "inspire the viewer to take immediate action and feel a sense of urgency. Use strong, direct language that "
+        "challenges the viewer. Make every message distinct. Return them as scripts, each with the index of its brief.\n\n"
+        + "\n".join(lines)
+    )
+
+    completion = chat.call(lambda client: client.chat.completions.create(
+        model=SCRIPT_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        response_format={"type": "json_schema", "json_schema": SCRIPTS_SCHEMA},
+    ))
+
+    scripts = []
+    for item in json.loads(completion.choices[0].message.content)["scripts"]:
+        if 1 <= item["index"] <= len(briefs):
+            scripts.append(dict(briefs[item["index"] - 1], text=item["text"]))
+    return scripts
+
+
+def build_pool(pool, count, per_request=SCRIPTS_PER_REQUEST, max_workers=None):
+    """
+    Generates count scripts in batched chat completions, run concurrently through the chat
+    provider, and adds them to the pool.
+
+    Returns:
+    - int: The number of scripts added after removing duplicates.
+    """
+    briefs = script_briefs(count)
+    batches = [briefs[start:start + per_request] for start in range(0, len(briefs), per_request)]
+    max_workers = max_workers or chat.concurrency.max_concurrency
+
+    added = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(request_scripts, batch) for batch in batches]
+        for future in futures:
+            try:
+                added += pool.add(future.result())
+            except Exception as e:
+                # One failed batch shouldn't lose the others
+                print(f"A script batch failed: {e}")
+
+    print(f"Added {added} of {len(briefs)} requested scripts to the pool: {pool.stats()}")
+    return added
+
+
+_refill_lock = threading.Lock()
+_refill_thread = None
+
+
+def refill_in_background(pool, count=REFILL_COUNT):
+    """
+    Starts a refill unless one is already running in this process. The process waits for it
+    at exit (see wait_for_refill), so a short-lived CLI run doesn't kill it mid-request.
+    """
+    global _refill_thread
+    if not _refill_lock.acquire(blocking=False):
+        return None
+
+    def refill():
+        try:
+            build_pool(pool, count)
+        except Exception as e:
+            print(f"Refilling the script pool failed: {e}")
+        finally:
+            _refill_lock.release()
+
+    thread = threading.Thread(target=refill, name="script-pool-refill", daemon=True)
+    if _refill_thread is None:
+        atexit.register(wait_for_refill)
+    _refill_thread = thread
+    thread.start()
+    return thread
+
+
+def wait_for_refill(timeout=REFILL_EXIT_TIMEOUT):
+    """
+    Waits up to timeout seconds for a running background refill to finish.
+
+    Returns:
+    - bool: True if no refill is running anymore.
+    """
+    thread = _refill_thread
+    if thread is None or not thread.is_alive():
+        return True
+    print(f"Waiting up to {timeout:g}s for the script pool refill to finish")
+    thread.join(timeout)
+    if thread.is_alive():
+        # Every finished batch is already in the pool; only the requests in flight are lost
+        print("The script pool refill is still running and will be cut off")
+        return False
+    return True
+
+
+def draw_script(pool=None, job_id=None):
+    """
+    Returns a script for a video from the pool, refilling it in the background when it runs
+    low. When the pool is empty the script is generated directly.
+    """
+    pool = pool or script_pool
+    script_text = pool.draw(job_id)
+    if pool.unused_count() < REFILL_THRESHOLD:
+        refill_in_background(pool)
+    if script_text is None:
+        print("The script pool is empty; generating a script directly")
+        return generate_script()
+    return script_text
+
+
+# Shared pool of the pipeline; SCRIPT_POOL sets the database path
+script_pool = ScriptPool(os.getenv("SCRIPT_POOL", "script_pool.sqlite3"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill or inspect the pool of pre-generated scripts.")
+    parser.add_argument("command", choices=("build", "stats"))
+    parser.add_argument("--count", type=int, default=100, help="Scripts to generate")
+    parser.add_argument("--per-request", type=int, default=SCRIPTS_PER_REQUEST)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_pool(script_pool, args.count, per_request=args.per_request)
+    else:
+        print(json.dumps(script_pool.stats(), indent=2))
@@ -0,0 +1,113 @@
+# align.py
+
+import re
+
+import numpy as np
+
+# Analysis frame length for the voice activity detection
+FRAME_SECONDS = 0.01
+# Pauses shorter than this are treated as part of the surrounding speech
+MIN_SILENCE_SECONDS = 0.12
+# Bursts of energy shorter than this are treated as noise
+MIN_SPEECH_SECONDS = 0.05
+
+VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+DISPLAY_CHARACTERS = re.compile(r"[^\w'’-]")
+
+
+def speech_segments(samples, sample_rate):
+    """
+    Finds the spans of speech in mono PCM from the frame energy.
+
+    The threshold sits between the noise floor and the speech level of the clip itself, so it
+    adapts to how loud the narration was synthesized.
+
+    Returns:
+    - list: (start, end) pairs in seconds.
+    """
+    hop = max(1, int(sample_rate * FRAME_SECONDS))
+    frame_count = len(samples) // hop
+    if frame_count == 0:
+        return []
+
+    frames = np.asarray(samples[:frame_count * hop], dtype=np.float32).reshape(frame_count, hop)
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+    noise_floor = np.percentile(energy_db, 10)
+    speech_level = np.percentile(energy_db, 95)
+    voiced = energy_db > noise_floor + 0.35 * (speech_level - noise_floor)
+
+    # Run boundaries of the voiced mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2)
+
+    segments = []
+    for start_frame, end_frame in runs:
+        start = start_frame * FRAME_SECONDS
+        end = end_frame * FRAME_SECONDS
+        if segments and start - segments[-1][1] < MIN_SILENCE_SECONDS:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+
+    return [(start, end) for start, end in segments if end - start >= MIN_SPEECH_SECONDS]
+
+
+def word_weight(word):
+    # Rough spoken length of a word: its syllables, plus a little for every letter
+    letters = word.lower()
+    syllables = max(1, len(VOWEL_GROUPS.findall(letters)))
+    return syllables + 0.1 * len(letters)
+
+
+def align_words(script_text, samples, sample_rate):
+    """
+    Aligns the known script to its narration without a recognizer.
+
+    Silences are found with an energy-based voice activity detector and skipped; the words are
+    then laid out over the remaining speech time in proportion to their estimated syllable and
+    character length.
+
+    Returns:
+    - list: (word, start, end) tuples in seconds, in script order.
+    """
+    words = [DISPLAY_CHARACTERS.sub("", word) for word in script_text.split()]
+    words = [word for word in words if word]
+    segments = speech_segments(samples, sample_rate)
+    if not words or not segments:
+        return []
+
+    segment_starts = np.array([start for start, _ in segments])
+    segment_lengths = np.array([end - start for start, end in segments])
+    # Speech time at which each segment begins, with the silences removed
+    segment_offsets = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+    total_speech = segment_offsets[-1]
+
+    weights = np.array([word_weight(word) for word in words])
+    boundaries = np.concatenate(([0.0], np.cumsum(weights))) / weights.sum() * total_speech
+
+    def segment_index(speech_time, is_end):
+        # Segment containing a position in speech time; ends stay in the segment they close
+        side = "left" if is_end else "right"
+        return int(np.clip(np.searchsorted(segment_offsets, speech_time, side=side) - 1, 0, len(segments) - 1))
+
+    aligned = []
+    for index, word in enumerate(words):
+        speech_start, speech_end = boundaries[index], boundaries[index + 1]
+        first = segment_index(speech_start, is_end=False)
+        last = segment_index(speech_end, is_end=True)
+
+        if first != last:
+            # The word straddles a pause: keep it on the side of the pause holding most of it
+            if segment_offsets[first + 1] - speech_start >= speech_end - segment_offsets[first + 1]:
+                last = first
+                speech_end = segment_offsets[first + 1]
+            else:
+                first = first + 1
+                speech_start = segment_offsets[first]
+
+        start = segment_starts[first] + (speech_start - segment_offsets[first])
+        end = segment_starts[last] + (speech_end - segment_offsets[last])
+        aligned.append((word, float(start), float(max(end, start + 0.05))))
+
+    return aligned
@@ -0,0 +1,89 @@
+# ass.py
+
+# Caption look of the TextClip layers in sub.py, as an ASS style: white Palatino Bold with a
+# black outline and a soft shadow, wrapped to 88% of the width, top edge at 44% of the height
+ASS_FONT = "Palatino"
+ASS_FONT_SIZE = 55
+ASS_OUTLINE = 3
+ASS_SHADOW = 1
+ASS_TEXT_WIDTH = 0.88
+ASS_TOP = 0.44
+
+
+def format_ass_timestamp(seconds):
+    # ASS timestamps are H:MM:SS.cc (centiseconds)
+    centiseconds = int(round(max(seconds, 0) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    seconds, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02}:{seconds:02}.{centiseconds:02}"
+
+
+def escape_ass_text(text):
+    # Braces start override blocks and backslashes escapes; newlines become hard breaks
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+
+
+def write_word_ass(words, output_ass_path, play_res=(1080, 1920), scale=1.0):
+    """
+    Writes (word, start, end) tuples as a styled ASS file for ffmpeg's libass filters.
+
+    Parameters:
+    - words (list): (text, start, end) tuples in seconds.
+    - output_ass_path (str): Path of the ASS file.
+    - play_res (tuple): (width, height) the positions and sizes refer to; libass scales them
+      to the frame size of the video it is burned into.
+    - scale (float): Scale of the font and outline, like the render profile's caption scale.
+
+    Returns:
+    - str: output_ass_path.
+    """
+    width, height = play_res
+    margin = int(width * (1 - ASS_TEXT_WIDTH) / 2)
+    x = width // 2
+    y = int(height * ASS_TOP)
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{ASS_FONT},{ASS_FONT_SIZE * scale:g},&H00FFFFFF,&H00FFFFFF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,"
+        f"{ASS_OUTLINE * scale:g},{ASS_SHADOW * scale:g},8,{margin},{margin},0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+
+    for word_text, start_time_seconds, end_time_seconds in words:
+        # Same minimum duration as the SRT writer
+        if end_time_seconds <= start_time_seconds:
+            end_time_seconds = start_time_seconds + 0.1
+        lines.append(
+            f"Dialogue: 0,{format_ass_timestamp(start_time_seconds)},{format_ass_timestamp(end_time_seconds)},Caption,,0,0,0,,"
+            f"{{\\pos({x},{y})}}{escape_ass_text(word_text.upper())}"
+        )
+
+    with open(output_ass_path, "w", encoding="utf-8") as ass_file:
+        ass_file.write("\n".join(lines) + "\n")
+    return output_ass_path
+
+
+def ass_filter(ass_path, offset=0.0):
+    """
+    Returns the ffmpeg video filter that burns ass_path in; offset is the time of the subtitle
+    timeline at which the video starts (for segments of a longer video).
+    """
+    # The path is escaped twice: for the filter's options (":" separates them), then quoted
+    # for the filtergraph (where "," and ";" separate filters)
+    escaped = ass_path.replace("\\", "\\\\").replace(":", "\\:").replace("'", "\\'")
+    escaped = "'" + escaped.replace("'", "'\\''") + "'"
+    if not offset:
+        return f"ass={escaped}"
+    return f"setpts=PTS+{offset:.6f}/TB,ass={escaped},setpts=PTS-STARTPTS"
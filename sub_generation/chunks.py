@@ -0,0 +1,96 @@
+# chunks.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from sub_generation.align import speech_segments
+from utils.ffmpeg import encode_audio_bytes
+from utils.providers import stt
+from utils.tracing import tracer
+
+# Synchronous recognition accepts about a minute of inline audio per request
+MAX_CHUNK_SECONDS = 55.0
+# Speech at the edges of the narration keeps this much of the surrounding silence
+CHUNK_PADDING_SECONDS = 0.2
+
+
+def plan_chunks(samples, sample_rate, max_chunk_seconds=MAX_CHUNK_SECONDS):
+    """
+    Splits mono PCM into chunks of at most max_chunk_seconds, cut in the middle of pauses.
+
+    Leading and trailing silence is left out. A single stretch of speech longer than
+    max_chunk_seconds is cut at fixed intervals.
+
+    Returns:
+    - list: (start, end) pairs in seconds, in order.
+    """
+    duration = len(samples) / sample_rate
+    segments = [(float(start), float(end)) for start, end in speech_segments(samples, sample_rate)]
+    if not segments:
+        return []
+
+    chunks = []
+    chunk_start = max(0.0, segments[0][0] - CHUNK_PADDING_SECONDS)
+    previous_end = None
+    for start, end in segments:
+        # Cut before this segment if it would make the chunk too long
+        if previous_end is not None and end - chunk_start > max_chunk_seconds:
+            cut = (previous_end + start) / 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+        while end - chunk_start > max_chunk_seconds:
+            chunks.append((chunk_start, chunk_start + max_chunk_seconds))
+            chunk_start += max_chunk_seconds
+        previous_end = end
+
+    chunks.append((chunk_start, min(duration, previous_end + CHUNK_PADDING_SECONDS)))
+    return chunks
+
+
+def encode_chunk(samples, sample_rate, encoding="flac"):
+    # FLAC is lossless at about half the size of LINEAR16, which is the raw 16-bit samples
+    if encoding == "flac":
+        return encode_audio_bytes(samples, sample_rate, "flac", extra_args=("-sample_fmt", "s16"))
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def recognize_chunks(samples, sample_rate, recognize_chunk, encoding="flac", max_workers=None, max_chunk_seconds=MAX_CHUNK_SECONDS):
+    """
+    Recognizes mono PCM chunk by chunk, at most max_workers chunks at a time.
+
+    Parameters:
+    - samples (numpy.ndarray): Mono float32 PCM.
+    - sample_rate (int): Sample rate of samples, also the rate the chunks are uploaded at.
+    - recognize_chunk (callable): Called as recognize_chunk(content, offset) with one encoded
+      chunk and its start in seconds; returns its (word, start, end) tuples on the full timeline.
+    - encoding (str): "flac" or "linear16".
+    - max_workers (int): Chunks recognized at the same time; defaults to the STT provider's
+      concurrency cap (STT_CONCURRENCY).
+
+    Returns:
+    - list: (word, start, end) tuples of all chunks, in time order.
+    """
+    chunks = plan_chunks(samples, sample_rate, max_chunk_seconds)
+    if max_workers is None:
+        max_workers = stt.concurrency.max_concurrency
+
+    def recognize(chunk):
+        start, end = chunk
+        content = encode_chunk(samples[int(start * sample_rate):int(end * sample_rate)], sample_rate, encoding)
+        started = time.perf_counter()
+        words = recognize_chunk(content, start)
+        return words, len(content), time.perf_counter() - started
+
+    words = []
+    uploaded = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for chunk_words, size, seconds in executor.map(recognize, chunks):
+            # The workers' spans are not this thread's, so record the API time here
+            tracer.observe("api", seconds)
+            words.extend(chunk_words)
+            uploaded += size
+
+    print(f"Recognized {len(chunks)} chunks ({uploaded} bytes uploaded)")
+    return sorted(words, key=lambda word: word[1])
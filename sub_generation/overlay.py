@@ -0,0 +1,146 @@
+# overlay.py
+
+from bisect import bisect_right
+
+import numpy as np
+
+
+class CaptionSprite:
+    """
+    A rasterized caption ready to blend: its colors and alpha as float32, cropped to the box of
+    its visible pixels. width and height are those of the full raster, and (x, y) is where the
+    cropped box sits in it, so captions are still laid out by their full size.
+
+    A sprite is converted once and shared by every event that shows it.
+    """
+
+    __slots__ = ("rgb", "alpha", "x", "y", "width", "height")
+
+    def __init__(self, rgb, mask, x=0, y=0, width=None, height=None):
+        self.width = width or rgb.shape[1]
+        self.height = height or rgb.shape[0]
+
+        # Crop to the bounding box of the pixels with any opacity
+        rows = np.flatnonzero(mask.any(axis=1))
+        columns = np.flatnonzero(mask.any(axis=0))
+        if len(rows) == 0:
+            y0 = y1 = x0 = x1 = 0
+        else:
+            y0, y1 = rows[0], rows[-1] + 1
+            x0, x1 = columns[0], columns[-1] + 1
+
+        self.x = x + int(x0)
+        self.y = y + int(y0)
+        self.rgb = np.ascontiguousarray(rgb[y0:y1, x0:x1], dtype=np.float32)
+        self.alpha = np.ascontiguousarray(mask[y0:y1, x0:x1], dtype=np.float32)[:, :, None]
+
+    def arrays(self):
+        # The cropped sprite as compact arrays (uint8 colors, float32 mask) for storing on disk
+        return {
+            "rgb": self.rgb.astype(np.uint8),
+            "mask": self.alpha[:, :, 0],
+            "offset": np.array([self.x, self.y, self.width, self.height]),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        # Sprites stored before cropping have no offset and cover the full raster
+        if "offset" not in arrays:
+            return cls(arrays["rgb"], arrays["mask"])
+        x, y, width, height = (int(value) for value in arrays["offset"])
+        return cls(arrays["rgb"], arrays["mask"], x, y, width, height)
+
+
+class CaptionEvent:
+    """
+    A caption sprite shown with its full raster's top-left corner at (x, y) of the frame
+    between start and end (seconds).
+    """
+
+    __slots__ = ("start", "end", "x", "y", "rgb", "alpha")
+
+    def __init__(self, start, end, x, y, sprite):
+        self.start = start
+        self.end = end
+        # Position of the cropped box; the arrays are the sprite's own, not copies
+        self.x = int(x) + sprite.x
+        self.y = int(y) + sprite.y
+        self.rgb = sprite.rgb
+        self.alpha = sprite.alpha
+
+
+class SubtitleOverlay:
+    """
+    Composites caption sprites onto video frames using a sorted interval index.
+
+    Events are sorted by start time. For a frame at time t, a binary search finds the last event
+    that started at or before t, and only the events that could still be running (those that
+    started less than the longest event duration before t) are checked. Each active sprite is
+    alpha-blended into its own bounding box only, so the cost of a frame depends on how many
+    captions are on screen rather than on the length of the transcript.
+    """
+
+    def __init__(self, events):
+        # Keep the input order for events that start together, so shadows stay under the text
+        self.events = sorted(events, key=lambda event: event.start)
+        self._starts = [event.start for event in self.events]
+        self._max_duration = max((event.end - event.start for event in self.events), default=0)
+
+    def active_events(self, t):
+        """
+        Returns the events visible at time t, in compositing order.
+        """
+        index = bisect_right(self._starts, t)
+        earliest_start = t - self._max_duration
+
+        # Walk back from the last event that has started until they are too old to be running
+        active = []
+        j = index - 1
+        while j >= 0 and self._starts[j] >= earliest_start:
+            event = self.events[j]
+            if t < event.end:
+                active.append(event)
+            j -= 1
+
+        active.reverse()
+        return active
+
+    def apply(self, frame, t):
+        """
+        Returns a copy of the frame with the captions active at time t blended in.
+        """
+        active = self.active_events(t)
+        if not active:
+            return frame
+
+        frame = np.array(frame, dtype=np.uint8, copy=True)
+        frame_height, frame_width = frame.shape[:2]
+
+        for event in active:
+            sprite_height, sprite_width = event.alpha.shape[:2]
+
+            # Clip the sprite's bounding box to the frame
+            x0 = max(event.x, 0)
+            y0 = max(event.y, 0)
+            x1 = min(event.x + sprite_width, frame_width)
+            y1 = min(event.y + sprite_height, frame_height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+
+            sx0 = x0 - event.x
+            sy0 = y0 - event.y
+            rgb = event.rgb[sy0:sy0 + (y1 - y0), sx0:sx0 + (x1 - x0)]
+            alpha = event.alpha[sy0:sy0 + (y1 - y0), sx0:sx0 + (x1 - x0)]
+
+            region = frame[y0:y1, x0:x1].astype(np.float32)
+            region += (rgb - region) * alpha
+            frame[y0:y1, x0:x1] = np.rint(region).astype(np.uint8)
+
+        return frame
+
+    def apply_to(self, video, offset=0.0):
+        """
+        Returns the video clip with the captions drawn on every frame; offset is the time of
+        the caption timeline at which the clip starts (for clips covering part of a video).
+        """
+        return video.fl(lambda get_frame, t: self.apply(get_frame(t), t + offset))
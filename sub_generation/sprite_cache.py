@@ -0,0 +1,83 @@
+# sprite_cache.py
+
+import os
+import hashlib
+import json
+
+import numpy as np
+
+from sub_generation.overlay import CaptionSprite
+from utils.tiered_cache import TieredCache
+
+
+def rasterize_caption(text, **style):
+    """
+    Renders a caption with ImageMagick once and returns its pixels.
+
+    Parameters:
+    - text (str): The caption text, already cased the way it should be displayed.
+    - style: Keyword arguments forwarded to TextClip (font, fontsize, color, stroke, size, ...).
+
+    Returns:
+    - tuple: (rgb, mask) where rgb is an HxWx3 uint8 array and mask an HxW float32 array in [0, 1].
+    """
+    # Imported on first use, so importing the pipeline doesn't load moviepy
+    from moviepy.video.VideoClip import TextClip
+
+    clip = TextClip(text, **style)
+    rgb = np.ascontiguousarray(clip.get_frame(0), dtype=np.uint8)
+    mask = np.ascontiguousarray(clip.mask.get_frame(0), dtype=np.float32)
+    clip.close()
+    return rgb, mask
+
+
+def load_sprite(path):
+    with np.load(path) as data:
+        return CaptionSprite.from_arrays(data)
+
+
+def save_sprite(sprite_file, sprite):
+    np.savez(sprite_file, **sprite.arrays())
+
+
+class CaptionSpriteCache:
+    """
+    Two-tier cache of rasterized caption sprites.
+
+    Sprites are keyed on the caption text and every TextClip style argument (font, fontsize,
+    colors, stroke, box width, ...). The in-process tier is an LRU bounded by entry count and
+    holds blend-ready CaptionSprites; the optional on-disk tier persists the cropped sprites
+    across runs as .npz files and is bounded by total size, evicting the least recently used
+    files first.
+    """
+
+    def __init__(self, max_entries=512, cache_folder=None, max_disk_bytes=256 * 1024 * 1024):
+        self.cache_folder = cache_folder
+        self._cache = TieredCache(".npz", load_sprite, save_sprite, max_entries, cache_folder, max_disk_bytes, label="caption sprite")
+
+    @staticmethod
+    def make_key(text, **style):
+        # Style values may be tuples such as size=(width, None), so serialise them as JSON
+        payload = json.dumps([text, sorted(style.items())], default=list)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, text, **style):
+        """
+        Returns the CaptionSprite of a caption, rasterizing it only on a miss.
+        """
+        key = self.make_key(text, **style)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            sprite = CaptionSprite(*rasterize_caption(text, **style))
+            self._cache.put(key, sprite)
+        return sprite
+
+    def stats(self):
+        return self._cache.stats()
+
+    def clear(self):
+        self._cache.clear()
+
+
+# Shared cache used by add_subtitles_to_video; sprites persist in caption_cache/ across runs
+caption_sprite_cache = CaptionSpriteCache(cache_folder=os.getenv("CAPTION_CACHE_FOLDER", "caption_cache"))
@@ -4,44 +4,110 @@ import re
 import time
 import chardet
 import shutil
-from google.cloud import speech_v1p1beta1 as speech
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-
-timestamp = int(time.time())
+import tempfile
+import numpy as np
+from sub_generation.sprite_cache import caption_sprite_cache
+from sub_generation.overlay import CaptionEvent, SubtitleOverlay
+from sub_generation.align import align_words
+from sub_generation.chunks import recognize_chunks
+from sub_generation.ass import write_word_ass, ass_filter
+from video_editing.readers import reader_pool
+from utils.ffmpeg import decode_audio, probe_media, run_ffmpeg
+from utils.render_profiles import get_render_profile
+from utils.providers import stt, PROVIDER_TIMEOUT
+from utils.tracing import tracer
+
+# Recognition language; part of the cache key of generated transcripts
+STT_LANGUAGE = "en-US"
+
+# Word timing backends selectable in generate_word_level_srt
+STT_BACKENDS = ("google", "google_chunked", "align")
+
+# Rate and channel count the narration is uploaded at by the chunked backend
+STT_SAMPLE_RATE = 16000
+
+# Caption renderers: rasterized sprites composited in Python, or ASS burned in by ffmpeg's libass
+CAPTION_BACKENDS = ("sprites", "ass")
 
 def generate_word_level_srt(
     audio_file_path,
     transcripts_folder="transcripts",
-    output_srt_filename=f"transcript{timestamp}.srt",
+    output_srt_filename=None,
+    backend="google",
+    script_text=None,
+    output_format="srt",
 ):
+    # audio_file_path may also be an in-memory Narration from audio_generation.pcm;
+    # output_format "ass" writes the captions as styled ASS instead of SRT
+
     # Ensure the output folder for transcripts exists
     os.makedirs(transcripts_folder, exist_ok=True)
 
+    # Name the transcript after the time of this call rather than the time of import
+    if output_srt_filename is None:
+        output_srt_filename = f"transcript{int(time.time())}.{output_format}"
+
     # Generate full path for the output SRT file
     output_srt_path = os.path.join(transcripts_folder, output_srt_filename)
 
-    # Initialize the Google Cloud client
-    client = speech.SpeechClient()
+    if backend == "google":
+        words = recognize_words_google(audio_file_path)
+    elif backend == "google_chunked":
+        words = recognize_words_chunked(audio_file_path)
+    elif backend == "align":
+        # The narration is synthesized from a known script, so align it locally instead
+        if script_text is None:
+            raise ValueError("The align backend needs the script_text of the narration")
+        words = align_words_offline(audio_file_path, script_text)
+    else:
+        raise ValueError(f"Unknown subtitle backend {backend!r}, expected one of {STT_BACKENDS}")
+
+    if not words:
+        print("No word timings were produced.")
+        return None
+
+    if output_format == "ass":
+        write_word_ass(words, output_srt_path)
+    else:
+        write_word_srt(words, output_srt_path)
+
+    print(f"{output_format.upper()} file created at: {output_srt_path}")
+    return output_srt_path
+
+
+# Function to get word timings from Google Cloud Speech
+def recognize_words_google(audio_file_path):
+    # The Speech SDK is imported only when a recognition runs; it takes a while to load
+    from google.cloud import speech_v1p1beta1 as speech
 
-    # Load the audio file
-    with open(audio_file_path, "rb") as audio_file:
-        content = audio_file.read()
+    if isinstance(audio_file_path, str):
+        # Load the audio file
+        with open(audio_file_path, "rb") as audio_file:
+            content = audio_file.read()
+        encoding = speech.RecognitionConfig.AudioEncoding.MP3
+    else:
+        # Narration in memory: upload it as 16 kHz mono LINEAR16 without writing a file
+        content = (np.clip(audio_file_path.mono(16000), -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        encoding = speech.RecognitionConfig.AudioEncoding.LINEAR16
 
     audio = speech.RecognitionAudio(content=content)
 
     # Configure the recognition settings
     config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.MP3,  # Adjust if needed
-        language_code="en-US",
+        encoding=encoding,
+        language_code=STT_LANGUAGE,
         sample_rate_hertz=16000,
         enable_word_time_offsets=True,
     )
 
-    # Perform the transcription using long_running_recognize
-    try:
-        operation = client.long_running_recognize(config=config, audio=audio)
+    # Perform the transcription using long_running_recognize, through the shared STT provider
+    def transcribe(client):
+        operation = client.long_running_recognize(config=config, audio=audio, timeout=PROVIDER_TIMEOUT)
         print("Waiting for operation to complete...")
-        response = operation.result(timeout=600)
+        return operation.result(timeout=600)
+
+    try:
+        response = stt.call(transcribe)
         print("Transcription completed.")
     except Exception as e:
         print(f"An error occurred during transcription: {e}")
@@ -51,107 +117,223 @@ def generate_word_level_srt(
         print("No transcription results were returned.")
         return None
 
-    # Process the response to create SRT entries for each word
-    srt_lines = []
-    counter = 1
+    return words_from_response(response)
+
+
+# Function to get word timings from Google Cloud Speech by recognizing 16 kHz mono chunks of the
+# narration, cut at pauses, in parallel; client may be any object with a recognize() like SpeechClient's,
+# used instead of the shared STT provider's client
+def recognize_words_chunked(audio_file_path, client=None, encoding="flac", max_workers=None):
+    from google.cloud import speech_v1p1beta1 as speech
+
+    if isinstance(audio_file_path, str):
+        samples = decode_audio(audio_file_path, sample_rate=STT_SAMPLE_RATE)
+    else:
+        samples = audio_file_path.mono(STT_SAMPLE_RATE)
+
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.FLAC if encoding == "flac" else speech.RecognitionConfig.AudioEncoding.LINEAR16,
+        language_code=STT_LANGUAGE,
+        sample_rate_hertz=STT_SAMPLE_RATE,
+        audio_channel_count=1,
+        enable_word_time_offsets=True,
+    )
+
+    def recognize_chunk(content, offset):
+        # The provider's client is shared by the worker threads
+        response = stt.call(
+            lambda client: client.recognize(config=config, audio=speech.RecognitionAudio(content=content), timeout=PROVIDER_TIMEOUT),
+            client=client,
+        )
+        return words_from_response(response, offset)
+
+    try:
+        words = recognize_chunks(samples, STT_SAMPLE_RATE, recognize_chunk, encoding=encoding, max_workers=max_workers)
+    except Exception as e:
+        print(f"An error occurred during transcription: {e}")
+        return None
 
+    if not words:
+        print("No transcription results were returned.")
+        return None
+    return words
+
+
+# Function to extract (word, start, end) tuples from a recognition response
+def words_from_response(response, offset=0.0):
+    words = []
     for result in response.results:
         alternative = result.alternatives[0]
-        words = alternative.words
 
-        for word in words:
+        for word in alternative.words:
             # Extract start and end times using total_seconds()
-            start_time_seconds = word.start_time.total_seconds()
-            end_time_seconds = word.end_time.total_seconds()
-            word_text = word.word.strip()
+            start_time_seconds = word.start_time.total_seconds() + offset
+            end_time_seconds = word.end_time.total_seconds() + offset
+            words.append((word.word.strip(), start_time_seconds, end_time_seconds))
 
-            # Ensure that end_time is after start_time
-            if end_time_seconds <= start_time_seconds:
-                end_time_seconds = start_time_seconds + 0.1  # Add a small duration
+    return words
 
-            # Format the timestamps into SRT format
-            start_time_srt = format_timestamp(start_time_seconds)
-            end_time_srt = format_timestamp(end_time_seconds)
 
-            # Create SRT entry
-            srt_lines.append(f"{counter}\n{start_time_srt} --> {end_time_srt}\n{word_text}\n\n")
-            counter += 1
+# Function to align the known script to the narration without any network call
+def align_words_offline(audio_file_path, script_text, sample_rate=16000):
+    if isinstance(audio_file_path, str):
+        samples = decode_audio(audio_file_path, sample_rate=sample_rate)
+    else:
+        samples = audio_file_path.mono(sample_rate)
+
+        # A narration synthesized sentence by sentence knows where each sentence is, so every
+        # sentence is aligned within its own span and errors can't carry over to the next one
+        if audio_file_path.sentences:
+            words = []
+            for sentence, start, end in audio_file_path.sentences:
+                sentence_samples = samples[int(round(start * sample_rate)):int(round(end * sample_rate))]
+                words.extend((word, word_start + start, word_end + start) for word, word_start, word_end in align_words(sentence, sentence_samples, sample_rate))
+            return words
+
+    return align_words(script_text, samples, sample_rate)
+
+
+# Function to write (word, start, end) tuples as a word-level SRT file
+def write_word_srt(words, output_srt_path):
+    srt_lines = []
+
+    for counter, (word_text, start_time_seconds, end_time_seconds) in enumerate(words, start=1):
+        # Ensure that end_time is after start_time
+        if end_time_seconds <= start_time_seconds:
+            end_time_seconds = start_time_seconds + 0.1  # Add a small duration
+
+        # Format the timestamps into SRT format
+        start_time_srt = format_timestamp(start_time_seconds)
+        end_time_srt = format_timestamp(end_time_seconds)
+
+        # Create SRT entry
+        srt_lines.append(f"{counter}\n{start_time_srt} --> {end_time_srt}\n{word_text}\n\n")
 
     # Write the SRT file
     with open(output_srt_path, "w", encoding="utf-8") as srt_file:
         srt_file.writelines(srt_lines)
 
-    print(f"SRT file created at: {output_srt_path}")
-    return output_srt_path
-
 def format_timestamp(total_seconds):
-    # Convert seconds to hours, minutes, seconds, milliseconds
-    hours = int(total_seconds // 3600)
-    minutes = int((total_seconds % 3600) // 60)
-    seconds = int(total_seconds % 60)
-    milliseconds = int(round((total_seconds % 1) * 1000))
+    # Convert seconds to hours, minutes, seconds, milliseconds; rounding to whole milliseconds
+    # first, so e.g. 1.9996 becomes 00:00:02,000 rather than 00:00:01,1000
+    total_milliseconds = int(round(total_seconds * 1000))
+    hours, total_milliseconds = divmod(total_milliseconds, 3600000)
+    minutes, total_milliseconds = divmod(total_milliseconds, 60000)
+    seconds, milliseconds = divmod(total_milliseconds, 1000)
 
     # Format into SRT timestamp format
     return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
 
 
-# Function to add subtitles to video
-def add_subtitles_to_video(video_file, srt_file, output_video_with_subs, output_folder="sub_vids"):
-    # Load the video
-    video = VideoFileClip(video_file)
-    video_width = video.w
-    video_height = video.h
-
-    # Parse the SRT file to get subtitle timings and text
-    subtitles = parse_srt(srt_file)
-
-    # Create TextClips for each subtitle line
-    text_clips = []
+# Caption layers drawn for every subtitle, bottom to top: a black shadow, then the white text
+CAPTION_LAYER_STYLES = [
+    dict(
+        fontsize=55,
+        color='black',  # Shadow color
+        font='Palatino-Bold',  # Ensure this font is available or provide the path
+        stroke_color='black',
+        stroke_width=5,
+        method='caption',
+        align='center',
+        interline=-5
+    ),
+    dict(
+        fontsize=55,   # Slightly smaller font size
+        color='white',
+        font='Palatino-Bold',  # Updated font
+        stroke_color='white',  # Outline for readability
+        stroke_width=2.5,        # Increased stroke width for more pronounced outline
+        method='caption',      # Enable text wrapping
+        align='center',        # Center-align the text
+        interline=-5          # Adjust line spacing if needed
+    ),
+]
+
+
+def caption_styles(scale=1.0):
+    # Caption layer styles with the font and stroke sized for a video rendered at scale
+    if scale == 1:
+        return CAPTION_LAYER_STYLES
+    return [
+        dict(style, fontsize=style['fontsize'] * scale, stroke_width=style['stroke_width'] * scale, interline=style['interline'] * scale)
+        for style in CAPTION_LAYER_STYLES
+    ]
+
+
+# Function to build the caption events for a video of the given size
+def build_caption_events(subtitles, video_width, video_height, scale=1.0):
+    with tracer.span("caption_build", captions=len(subtitles)):
+        return _build_caption_events(subtitles, video_width, video_height, scale)
+
+
+def _build_caption_events(subtitles, video_width, video_height, scale):
+    caption_events = []
 
     # Define maximum width for the subtitle text box (e.g., 80% of video width)
     max_text_width = int(video_width * 0.88)
 
+    # Calculate desired vertical position (adjust the multiplier to move text higher or lower)
+    text_y_position = int(video_height * 0.44)  # 40% from the top
+
+    for start_time, end_time, text in subtitles:
+        for style in caption_styles(scale):
+            # Rasterized once per text and style, then reused from the cache;
+            # the height is auto-calculated from the wrapped text
+            sprite = caption_sprite_cache.get(text.upper(), size=(max_text_width, None), **style)
+
+            # Center the sprite horizontally
+            x_position = (video_width - sprite.width) // 2
+            caption_events.append(CaptionEvent(start_time, end_time, x_position, text_y_position, sprite))
+
+    print(f"Caption sprite cache: {caption_sprite_cache.stats()}")
+    return caption_events
 
-    for i, (start_time, end_time, text) in enumerate(subtitles):
-        duration = end_time - start_time
-
-        # Calculate desired vertical position (adjust the multiplier to move text higher or lower)
-        text_y_position = int(video_height * 0.44)  # 40% from the top
-
-        # Create shadow TextClip
-        shadow_text_clip = TextClip(
-            text.upper(),
-            fontsize=55,
-            color='black',  # Shadow color
-            font='Palatino-Bold',  # Ensure this font is available or provide the path
-            stroke_color='black',
-            stroke_width=5,
-            method='caption',
-            size=(max_text_width, None),
-            align='center',
-            interline=-5
-        ).set_position(('center', text_y_position)).set_start(start_time).set_duration(duration)
-
-
-        # Create a TextClip for each subtitle phrase with requested styles
-        text_clip = TextClip(
-            text.upper(),  # Convert text to uppercase
-            fontsize=55,   # Slightly smaller font size
-            color='white',
-            font='Palatino-Bold',  # Updated font
-            stroke_color='white',  # Outline for readability
-            stroke_width=2.5,        # Increased stroke width for more pronounced outline
-            method='caption',      # Enable text wrapping
-            size=(max_text_width, None),  # Set the width, height will be auto-calculated
-            align='center',        # Center-align the text
-            interline=-5          # Adjust line spacing if needed
-        ).set_position(('center', text_y_position)).set_start(start_time).set_duration(duration)
-
-         # Append both shadow and main text clips
-        text_clips.extend([shadow_text_clip, text_clip])
+
+# Function to overlay the subtitles from an SRT file on an already loaded video clip,
+# scale being the render profile's resolution scale the video was opened at and offset
+# the time in the SRT at which the clip starts; only the captions shown during the clip
+# are built, so a segment of a longer video rasterizes just its own words
+def overlay_subtitles(video, srt_file, scale=1.0, offset=0.0):
+    # Parse the SRT file to get subtitle timings and text
+    end = offset + video.duration
+    subtitles = [
+        (start_time, end_time, text) for start_time, end_time, text in parse_srt(srt_file)
+        if end_time > offset and start_time < end
+    ]
+
+    # Index the captions by time so each frame only blends the ones on screen
+    overlay = SubtitleOverlay(build_caption_events(subtitles, video.w, video.h, scale))
 
     # Overlay subtitles on the video
-    video_with_subtitles = CompositeVideoClip([video] + text_clips)
+    return overlay.apply_to(video, offset)
+
+
+# Function to write the captions of an SRT file as ASS for libass, sized for a video_width x
+# video_height frame rendered at scale; ASS files are used as they are
+def captions_to_ass(srt_file, video_width, video_height, scale=1.0):
+    """
+    Returns:
+    - tuple: (path of the ASS file, True if it is a temporary file the caller has to remove).
+    """
+    if srt_file.lower().endswith(".ass"):
+        return srt_file, False
+
+    words = [(text, start_time, end_time) for start_time, end_time, text in parse_srt(srt_file)]
+    handle, ass_path = tempfile.mkstemp(suffix=".ass")
+    os.close(handle)
+    write_word_ass(words, ass_path, play_res=(video_width, video_height), scale=scale)
+    return ass_path, True
+
+
+def check_caption_backend(caption_backend):
+    if caption_backend not in CAPTION_BACKENDS:
+        raise ValueError(f"Unknown caption backend {caption_backend!r}, expected one of {CAPTION_BACKENDS}")
+
+
+# Function to add subtitles to video
+def add_subtitles_to_video(video_file, srt_file, output_video_with_subs, output_folder="sub_vids", profile="standard", caption_backend="sprites"):
+    profile = get_render_profile(profile)
+    check_caption_backend(caption_backend)
 
     # Ensure the output folder exists for the final video
     if not os.path.exists(output_folder):
@@ -159,8 +341,46 @@ def add_subtitles_to_video(video_file, srt_file, output_video_with_subs, output_
 
     output_path = os.path.join(output_folder, output_video_with_subs)
 
-    # Write the final video with subtitles
-    video_with_subtitles.write_videofile(output_path, codec="libx264", audio_codec="aac", fps=video.fps)
+    if caption_backend == "ass":
+        return burn_in_subtitles(video_file, srt_file, output_path, profile)
+
+    # The video's readers are released when the step ends, even if it fails
+    with reader_pool.session() as readers:
+        # Load the video, already at the profile's resolution, with its narration
+        video = readers.open(video_file, audio=True)
+
+        # Overlay subtitles on the video
+        video_with_subtitles = overlay_subtitles(video, srt_file, profile.scale)
+
+        # Write the final video with subtitles
+        options = profile.write_options(video.fps)
+        with tracer.span("composite_encode", step="subtitles", frames=int(video_with_subtitles.duration * options["fps"])):
+            video_with_subtitles.write_videofile(output_path, **options)
+
+    return output_path
+
+
+# Function to burn the subtitles in with ffmpeg's libass filter, without decoding frames in Python;
+# the narration is copied as it is
+def burn_in_subtitles(video_file, srt_file, output_path, profile="standard"):
+    profile = get_render_profile(profile)
+    media = probe_media(video_file)
+    ass_path, temporary = captions_to_ass(srt_file, media["width"], media["height"], profile.scale)
+
+    # Without a profile or probed frame rate the output keeps whatever rate ffmpeg reads
+    fps = profile.fps or media["fps"]
+    try:
+        with tracer.span("composite_encode", step="subtitles", backend="ass", frames=int(media["duration"] * fps) if fps else None):
+            run_ffmpeg(
+                ["-i", video_file, "-vf", ass_filter(ass_path)]
+                + (["-r", fps] if fps else [])
+                + ["-c:v", "libx264", "-preset", profile.preset]
+                + (["-threads", profile.threads] if profile.threads else [])
+                + ["-crf", profile.crf, "-pix_fmt", "yuv420p", "-c:a", "copy", output_path]
+            )
+    finally:
+        if temporary:
+            os.unlink(ass_path)
 
     return output_path
 
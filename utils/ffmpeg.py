@@ -0,0 +1,193 @@
+import os
+import re
+import subprocess
+from utils.tracing import tracer
+
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+VIDEO_STREAM_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Video: (\w+)(.*)")
+AUDIO_STREAM_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Audio: (\w+)")
+SIZE_PATTERN = re.compile(r"\b(\d{2,5})x(\d{2,5})\b")
+FPS_PATTERN = re.compile(r"([\d.]+) (?:fps|tbr)")
+
+
+def ffmpeg_binary():
+    # Use the same ffmpeg build as moviepy so probing and rendering agree
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except ImportError:
+        return os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+def run_ffmpeg(args):
+    """
+    Runs ffmpeg with the given arguments, overwriting outputs, and raises on failure.
+
+    Returns:
+    - subprocess.CompletedProcess: The finished process, with stderr captured as text.
+    """
+    command = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + [str(arg) for arg in args]
+    with tracer.timed("ffmpeg"):
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {result.stderr.strip()}")
+    return result
+
+
+def probe_media(path):
+    """
+    Reads a media file's stream information from the ffmpeg banner without decoding it.
+
+    Returns:
+    - dict: duration (s), width, height, fps, video_codec and audio_codec (None when absent).
+    """
+    # ffmpeg with an input and no output prints the stream info and exits with an error
+    with tracer.timed("ffmpeg"):
+        result = subprocess.run(
+            [ffmpeg_binary(), "-hide_banner", "-i", path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        )
+    info = result.stderr
+
+    duration_match = DURATION_PATTERN.search(info)
+    if duration_match is None:
+        raise RuntimeError(f"Could not read the duration of {path}: {info.strip()}")
+    hours, minutes, seconds = duration_match.groups()
+    media = {
+        "duration": int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        "width": None,
+        "height": None,
+        "fps": None,
+        "video_codec": None,
+        "audio_codec": None,
+    }
+
+    video_match = VIDEO_STREAM_PATTERN.search(info)
+    if video_match:
+        media["video_codec"] = video_match.group(1)
+        details = video_match.group(2)
+        size_match = SIZE_PATTERN.search(details)
+        if size_match:
+            media["width"], media["height"] = int(size_match.group(1)), int(size_match.group(2))
+        fps_match = FPS_PATTERN.search(details)
+        if fps_match:
+            media["fps"] = float(fps_match.group(1))
+
+    audio_match = AUDIO_STREAM_PATTERN.search(info)
+    if audio_match:
+        media["audio_codec"] = audio_match.group(1)
+
+    return media
+
+
+def decode_audio(path, sample_rate=16000, channels=1):
+    """
+    Decodes any audio (or the audio track of a video) to float32 PCM with ffmpeg.
+
+    Returns:
+    - numpy.ndarray: Samples in [-1, 1], shaped (n,) for mono or (n, channels) otherwise.
+    """
+    import numpy as np
+
+    command = [
+        ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+        "-i", path,
+        "-vn", "-ac", str(channels), "-ar", str(sample_rate),
+        "-f", "f32le", "-",
+    ]
+    with tracer.timed("ffmpeg"):
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {path}: {result.stderr.decode(errors='replace').strip()}")
+
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return samples
+
+
+def encode_audio(samples, sample_rate, output_path, extra_args=()):
+    """
+    Encodes float32 PCM shaped (n, channels) to output_path, choosing the codec from its extension.
+    """
+    import numpy as np
+
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    command = [
+        ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "-",
+    ] + [str(arg) for arg in extra_args] + [output_path]
+    with tracer.timed("ffmpeg"):
+        result = subprocess.run(command, input=samples.tobytes(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {output_path}: {result.stderr.decode(errors='replace').strip()}")
+    return output_path
+
+
+# Resampler of resample_audio: soxr when ffmpeg is built with it, swr's windowed sinc otherwise
+_resamplers = ["aresample={rate}:resampler=soxr:precision=28", "aresample={rate}:filter_size=64:cutoff=0.95"]
+
+
+def resample_audio(samples, source_rate, target_rate):
+    """
+    Resamples float32 PCM shaped (n, channels) with ffmpeg's band-limited resampler, which
+    low-pass filters the signal so there is no aliasing or imaging.
+
+    Returns:
+    - numpy.ndarray: float32 samples shaped (round(n * target_rate / source_rate), channels).
+    """
+    import numpy as np
+
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    channels = samples.shape[1]
+    target_length = int(round(len(samples) * target_rate / source_rate))
+
+    while True:
+        command = [
+            ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+            "-f", "f32le", "-ar", str(source_rate), "-ac", str(channels), "-i", "-",
+            "-af", _resamplers[0].format(rate=target_rate),
+            "-f", "f32le", "-ar", str(target_rate), "-",
+        ]
+        with tracer.timed("ffmpeg"):
+            result = subprocess.run(command, input=samples.tobytes(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode == 0:
+            break
+        if len(_resamplers) == 1:
+            raise RuntimeError(f"ffmpeg failed to resample audio: {result.stderr.decode(errors='replace').strip()}")
+        # This ffmpeg has no soxr; use the built-in resampler from now on
+        _resamplers.pop(0)
+
+    resampled = np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+    # The filter's delay compensation can be a few samples off the exact length
+    if len(resampled) >= target_length:
+        return resampled[:target_length]
+    return np.concatenate([resampled, np.zeros((target_length - len(resampled), channels), dtype=np.float32)])
+
+
+def encode_audio_bytes(samples, sample_rate, audio_format="flac", extra_args=()):
+    """
+    Encodes float32 PCM shaped (n,) or (n, channels) in memory, e.g. for an API upload.
+
+    Returns:
+    - bytes: The encoded audio in the given ffmpeg container format.
+    """
+    import numpy as np
+
+    samples = np.ascontiguousarray(samples, dtype=np.float32)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    command = [
+        ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "-",
+    ] + [str(arg) for arg in extra_args] + [
+        "-f", audio_format, "-",
+    ]
+    with tracer.timed("ffmpeg"):
+        result = subprocess.run(command, input=samples.tobytes(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {audio_format}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
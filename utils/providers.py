@@ -0,0 +1,356 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from utils.tracing import tracer
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# Client-side failures without a status (connection resets, timeouts), by exception class name
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError")
+
+# Seconds before a request to any provider gives up; PROVIDER_TIMEOUT overrides it
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", 60))
+
+
+def status_code(error):
+    # HTTP status of an OpenAI (status_code) or Google API (code) error, if it has one
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(error):
+    return status_code(error) == 429
+
+
+def is_retryable(error):
+    if status_code(error) in RETRYABLE_STATUS:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after(error):
+    # Seconds the server asked us to wait, from the Retry-After header of an HTTP error
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Limits the request rate to rate per second on average, with bursts of up to burst requests.
+    rate None disables the limit.
+
+    Like AdaptiveLimit, the rate backs off when the provider throttles: every rate-limited
+    response halves it (down to 1/RATE_STEPS of the configured rate), and every successful
+    request adds 1/RATE_STEPS of the configured rate back, up to the configured rate.
+    """
+
+    RATE_STEPS = 16
+
+    def __init__(self, rate=None, burst=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token and returns the seconds to wait before using it; tokens are handed out in
+        order, so waiting callers don't race each other.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def update(self, throttled=False):
+        # Adjusts the rate after a response; the tokens earned so far are kept at the old rate
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if throttled:
+                self.rate = max(self.max_rate / self.RATE_STEPS, self.rate / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / self.RATE_STEPS)
+
+
+class AdaptiveLimit:
+    """
+    Caps the requests in flight. Every rate-limited response halves the cap (down to
+    min_concurrency); it grows back by one after as many successful requests as the cap, up to
+    max_concurrency, so the provider settles just under its quota instead of being hammered.
+    """
+
+    def __init__(self, max_concurrency, min_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def try_enter(self):
+        with self._condition:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def enter(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+
+    async def enter_async(self):
+        # Polls instead of blocking, so waiting doesn't hold up the event loop
+        while not self.try_enter():
+            await asyncio.sleep(0.05)
+
+    def leave(self, throttled=False):
+        with self._condition:
+            self.active -= 1
+            if throttled:
+                self.limit = max(self.min_concurrency, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class Provider:
+    """
+    Shared access to one API (chat, TTS or STT).
+
+    The sync and async clients are created on first use and then shared by every caller, so
+    connections are pooled. Every request waits for the provider's token bucket and for a slot
+    under its adaptive concurrency cap; rate-limited responses lower both the rate and the cap.
+    Retryable failures are retried with exponential backoff and full jitter (or after the
+    server's Retry-After).
+    """
+
+    def __init__(self, name, factory, async_factory=None, rate=None, burst=None, max_concurrency=8, max_retries=4, base_delay=0.5, max_delay=30.0):
+        self.name = name
+        self.factory = factory
+        self.async_factory = async_factory
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveLimit(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.throttled = 0
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.factory()
+            return self._client
+
+    @property
+    def async_client(self):
+        with self._lock:
+            if self._async_client is None:
+                if self.async_factory is None:
+                    raise RuntimeError(f"The {self.name} provider has no async client")
+                self._async_client = self.async_factory()
+            return self._async_client
+
+    def set_client(self, client=None, async_client=None):
+        # Use the given clients instead of creating them, e.g. stand-ins for tests and benchmarks
+        with self._lock:
+            self._client = client
+            self._async_client = async_client
+
+    def backoff(self, attempt, error):
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return delay
+
+    def _failed(self, attempt, error):
+        # Returns the delay before the next attempt, or None if the error should be raised
+        throttled = is_rate_limited(error)
+        self.concurrency.leave(throttled)
+        self.bucket.update(throttled)
+        if throttled:
+            self.throttled += 1
+        if attempt == self.max_retries or not is_retryable(error):
+            return None
+        self.retries += 1
+        delay = self.backoff(attempt, error)
+        print(f"{self.name} request failed ({type(error).__name__}: {error}); retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    def _succeeded(self):
+        self.concurrency.leave()
+        self.bucket.update()
+
+    def call(self, request, client=None):
+        """
+        Runs request(client) with rate limiting, concurrency control and retries.
+
+        Parameters:
+        - request (callable): Makes one API call with the client it is given and returns its result.
+        - client: Client to use instead of the provider's shared one.
+        """
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.bucket.reserve())
+            self.concurrency.enter()
+            try:
+                with tracer.timed("api"):
+                    result = request(client or self.client)
+            except Exception as error:
+                delay = self._failed(attempt, error)
+                if delay is None:
+                    raise
+            else:
+                self._succeeded()
+                return result
+            time.sleep(delay)
+
+    @contextmanager
+    def stream(self, request, client=None):
+        """
+        Opens a streamed response with the same rate limiting, concurrency control and retries
+        as call(), and keeps its concurrency slot while the caller reads it.
+
+        Parameters:
+        - request (callable): Returns the context manager of a streamed response for the client
+          it is given (e.g. a with_streaming_response method).
+        - client: Client to use instead of the provider's shared one.
+
+        Failures while the body is read are raised to the caller, not retried: part of it has
+        already been consumed.
+        """
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.bucket.reserve())
+            self.concurrency.enter()
+            try:
+                manager = request(client or self.client)
+                response = manager.__enter__()
+            except Exception as error:
+                delay = self._failed(attempt, error)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            break
+
+        # The response is open: the request counts as a success for the rate
+        self.bucket.update()
+        try:
+            with tracer.timed("api"):
+                yield response
+        except BaseException:
+            manager.__exit__(*sys.exc_info())
+            raise
+        else:
+            manager.__exit__(None, None, None)
+        finally:
+            self.concurrency.leave()
+
+    async def acall(self, request, client=None):
+        """
+        Async version of call(); request(client) gets the provider's async client and returns an awaitable.
+        """
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.bucket.reserve())
+            await self.concurrency.enter_async()
+            try:
+                with tracer.timed("api"):
+                    result = await request(client or self.async_client)
+            except Exception as error:
+                delay = self._failed(attempt, error)
+                if delay is None:
+                    raise
+            else:
+                self._succeeded()
+                return result
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        return {
+            "rate": self.bucket.rate,
+            "limit": self.concurrency.limit,
+            "active": self.concurrency.active,
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
+
+
+def openai_client():
+    # OPENAI_BASE_URL points the client at a local stub server; retries are done by the provider
+    from openai import OpenAI
+    return OpenAI(timeout=PROVIDER_TIMEOUT, max_retries=0)
+
+
+def openai_async_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(timeout=PROVIDER_TIMEOUT, max_retries=0)
+
+
+def speech_client():
+    # SPEECH_API_ENDPOINT (host:port) points the client at a local stub server, without TLS
+    from google.cloud import speech_v1p1beta1 as speech
+
+    endpoint = os.getenv("SPEECH_API_ENDPOINT")
+    if not endpoint:
+        return speech.SpeechClient()
+
+    import grpc
+    from google.cloud.speech_v1p1beta1.services.speech.transports import SpeechGrpcTransport
+    return speech.SpeechClient(transport=SpeechGrpcTransport(channel=grpc.insecure_channel(endpoint)))
+
+
+def speech_async_client():
+    from google.cloud import speech_v1p1beta1 as speech
+
+    endpoint = os.getenv("SPEECH_API_ENDPOINT")
+    if not endpoint:
+        return speech.SpeechAsyncClient()
+
+    import grpc
+    from google.cloud.speech_v1p1beta1.services.speech.transports import SpeechGrpcAsyncIOTransport
+    return speech.SpeechAsyncClient(transport=SpeechGrpcAsyncIOTransport(channel=grpc.aio.insecure_channel(endpoint)))
+
+
+# Shared providers of the process; <NAME>_RATE (requests per second) and <NAME>_CONCURRENCY
+# (requests in flight) override the limits. Chat and TTS share one OpenAI connection pool.
+chat = Provider(
+    "chat", openai_client, openai_async_client,
+    rate=float(os.getenv("CHAT_RATE", 5)), max_concurrency=int(os.getenv("CHAT_CONCURRENCY", 8)),
+)
+tts = Provider(
+    "tts", lambda: chat.client, lambda: chat.async_client,
+    rate=float(os.getenv("TTS_RATE", 2)), max_concurrency=int(os.getenv("TTS_CONCURRENCY", 4)),
+)
+stt = Provider(
+    "stt", speech_client, speech_async_client,
+    rate=float(os.getenv("STT_RATE", 5)), max_concurrency=int(os.getenv("STT_CONCURRENCY", 8)),
+)
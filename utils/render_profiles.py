@@ -0,0 +1,70 @@
+class RenderProfile:
+    """
+    Encoding settings shared by every step that writes a video.
+
+    scale shrinks the background clips as ffmpeg decodes them (and the captions with them), so
+    a draft composites and encodes only a fraction of the pixels. fps None keeps the source rate
+    and threads None lets ffmpeg pick.
+    """
+
+    def __init__(self, name, scale, preset, crf, fps=None, threads=None, audio_bitrate="192k"):
+        self.name = name
+        self.scale = scale
+        self.preset = preset
+        self.crf = crf
+        self.fps = fps
+        self.threads = threads
+        self.audio_bitrate = audio_bitrate
+
+    def target_resolution(self, width, height):
+        """
+        Returns the (height, width) a width x height source is decoded at, or None at full size.
+        Dimensions are kept even, as required by yuv420p.
+        """
+        if self.scale == 1 or not width or not height:
+            return None
+        return (max(2, int(height * self.scale) // 2 * 2), max(2, int(width * self.scale) // 2 * 2))
+
+    def write_options(self, fps=None):
+        """
+        Returns the keyword arguments for write_videofile, falling back to fps for the frame rate.
+        """
+        return dict(
+            codec="libx264",
+            audio_codec="aac",
+            fps=self.fps or fps,
+            preset=self.preset,
+            threads=self.threads,
+            audio_bitrate=self.audio_bitrate,
+            ffmpeg_params=["-crf", str(self.crf), "-pix_fmt", "yuv420p"],
+        )
+
+    def describe(self):
+        # Settings that change the rendered output, used in cache keys
+        return {
+            "name": self.name,
+            "scale": self.scale,
+            "preset": self.preset,
+            "crf": self.crf,
+            "fps": self.fps,
+            "audio_bitrate": self.audio_bitrate,
+        }
+
+
+RENDER_PROFILES = {
+    # Third of the resolution, half the frame rate and the fastest preset, for previews
+    "draft": RenderProfile("draft", scale=1 / 3, preset="ultrafast", crf=30, fps=15, audio_bitrate="64k"),
+    "standard": RenderProfile("standard", scale=1, preset="medium", crf=23),
+    "archive": RenderProfile("archive", scale=1, preset="slow", crf=17, audio_bitrate="320k"),
+}
+
+
+def get_render_profile(profile="standard"):
+    """
+    Returns the render profile with the given name; RenderProfile instances are passed through.
+    """
+    if isinstance(profile, RenderProfile):
+        return profile
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile {profile!r}; expected one of {', '.join(RENDER_PROFILES)}")
+    return RENDER_PROFILES[profile]
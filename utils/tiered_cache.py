@@ -0,0 +1,157 @@
+# tiered_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class TieredCache:
+    """
+    Two-tier LRU cache shared by the caption sprite and TTS segment caches.
+
+    The in-process tier is an LRU bounded by entry count. The optional on-disk tier keeps
+    values across runs as files in cache_folder, bounded by total size, and evicts the least
+    recently used files first. load(path) reads a value back from its file and save(file, value)
+    writes one to an open binary file.
+
+    The lock only guards the in-process tier and the counters: disk reads, writes and eviction
+    scans run outside it, so threads looking up different keys never wait on each other's I/O.
+    """
+
+    def __init__(self, suffix, load, save, max_entries, cache_folder=None, max_disk_bytes=None, label="entry"):
+        self.suffix = suffix
+        self.load = load
+        self.save = save
+        self.max_entries = max_entries
+        self.cache_folder = cache_folder
+        self.max_disk_bytes = max_disk_bytes
+        self.label = label
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Only one thread scans the folder for eviction at a time; others skip the scan
+        self._evict_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def get(self, key):
+        """
+        Returns the value cached under key, from memory or from disk, or None on a miss.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._load_from_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+        self._save_to_disk(key, value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, value):
+        # Called with the lock held
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.cache_folder, f"{key}{self.suffix}")
+
+    def _load_from_disk(self, key):
+        if not self.cache_folder:
+            return None
+
+        path = self._path(key)
+        try:
+            value = self.load(path)
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Refresh the modification time so disk eviction is least-recently-used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _save_to_disk(self, key, value):
+        if not self.cache_folder:
+            return
+
+        # Written under a name of its own and renamed, so readers never see a partial file
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            with open(tmp_path, "wb") as cache_file:
+                self.save(cache_file, value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Failed to cache {self.label} {path}. Reason: {e}")
+            return
+
+        if self.max_disk_bytes is not None and self._evict_lock.acquire(blocking=False):
+            try:
+                self._evict_disk()
+            finally:
+                self._evict_lock.release()
+
+    def _evict_disk(self):
+        entries = []
+        total_bytes = 0
+        for filename in os.listdir(self.cache_folder):
+            if not filename.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_folder, filename)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+            total_bytes += info.st_size
+
+        # Remove the least recently used files until the folder fits the size bound
+        entries.sort()
+        evicted = 0
+        for _, size, path in entries:
+            if total_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total_bytes -= size
+            evicted += 1
+
+        with self._lock:
+            self.disk_evictions += evicted
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import argparse
+import resource
+import threading
+from contextlib import contextmanager
+
+
+def io_counters():
+    # Bytes read and written by this process so far (all threads), from /proc on Linux
+    counters = {}
+    try:
+        with open("/proc/self/io", "r") as io_file:
+            for line in io_file:
+                key, value = line.split(":")
+                counters[key] = int(value)
+    except OSError:
+        pass
+    return counters.get("rchar", 0), counters.get("wchar", 0)
+
+
+def cpu_times():
+    # CPU seconds of this process and of its finished subprocesses (e.g. ffmpeg)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+
+class Span:
+    """
+    A timed stage of a job. Attributes set on it (frame counts, sizes) and the durations
+    observed while it is open (ffmpeg runs, API calls) end up in its trace record.
+    """
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key, value):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+
+class Tracer:
+    """
+    Records per-stage spans of the video pipeline.
+
+    Every finished span is appended as one JSON line to trace_file (when set), tagged with the
+    job it belongs to, so traces of many jobs and processes can be aggregated afterwards; see
+    aggregate() and prometheus_text(). Wall time, CPU time (own and of ffmpeg subprocesses) and
+    bytes read and written are measured for the whole process, so spans of jobs running in
+    parallel threads of one process overlap.
+    """
+
+    def __init__(self, trace_file=None):
+        self.trace_file = trace_file
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def job_id(self):
+        return getattr(self._local, "job_id", None)
+
+    @contextmanager
+    def job(self, job_id):
+        # Tag the spans recorded by this thread with job_id
+        previous = self.job_id
+        self._local.job_id = job_id
+        try:
+            yield
+        finally:
+            self._local.job_id = previous
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block as a span named name; yields the Span for extra attributes.
+        """
+        stack = self._stack()
+        span = Span(name, stack[-1].name if stack else None, **attributes)
+        stack.append(span)
+
+        started = time.time()
+        wall_started = time.perf_counter()
+        cpu_started, child_cpu_started = cpu_times()
+        read_started, written_started = io_counters()
+        status = "ok"
+        try:
+            yield span
+        except BaseException:
+            status = "failed"
+            raise
+        finally:
+            wall = time.perf_counter() - wall_started
+            cpu, child_cpu = cpu_times()
+            read, written = io_counters()
+            stack.pop()
+
+            record = {
+                "job": self.job_id,
+                "span": name,
+                "parent": span.parent,
+                "pid": os.getpid(),
+                "start": round(started, 3),
+                "status": status,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(cpu - cpu_started, 4),
+                "child_cpu_s": round(child_cpu - child_cpu_started, 4),
+                "read_bytes": read - read_started,
+                "written_bytes": written - written_started,
+            }
+            record.update(span.attributes)
+            self._emit(record)
+
+    def observe(self, name, seconds):
+        """
+        Adds a duration (e.g. of an ffmpeg run or an API call) to every open span of this thread,
+        as <name>_s and <name>_calls.
+        """
+        for span in self._stack():
+            span.add(f"{name}_s", round(seconds, 4))
+            span.add(f"{name}_calls", 1)
+
+    @contextmanager
+    def timed(self, name):
+        # Observe the duration of the enclosed block under name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def _emit(self, record):
+        if not self.trace_file:
+            return
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            folder = os.path.dirname(self.trace_file)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            # A single appended write per span, so processes sharing the file don't interleave lines
+            with open(self.trace_file, "a", encoding="utf-8") as trace:
+                trace.write(line)
+
+
+def aggregate(records):
+    """
+    Sums the numeric fields of span records per span name.
+
+    Returns:
+    - dict: {span name: {"count": n, "failed": n, field: total, ...}}.
+    """
+    totals = {}
+    for record in records:
+        stage = totals.setdefault(record["span"], {"count": 0, "failed": 0})
+        stage["count"] += 1
+        if record.get("status") != "ok":
+            stage["failed"] += 1
+        for key, value in record.items():
+            if key in ("start", "pid") or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            stage[key] = stage.get(key, 0) + value
+    return totals
+
+
+def prometheus_text(totals, prefix="vidmaker"):
+    """
+    Formats aggregated span totals in the Prometheus text exposition format.
+    """
+    lines = []
+    metrics = sorted({key for stage in totals.values() for key in stage})
+    for metric in metrics:
+        name = f"{prefix}_stage_{metric}_total" if not metric.endswith("_s") else f"{prefix}_stage_{metric[:-2]}_seconds_total"
+        lines.append(f"# TYPE {name} counter")
+        for stage, values in sorted(totals.items()):
+            if metric in values:
+                value = values[metric]
+                lines.append(f'{name}{{stage="{stage}"}} {round(value, 6) if isinstance(value, float) else value}')
+    return "\n".join(lines) + "\n"
+
+
+def read_traces(trace_file):
+    with open(trace_file, "r", encoding="utf-8") as trace:
+        return [json.loads(line) for line in trace if line.strip()]
+
+
+# Shared tracer of the pipeline; spans are written only when TRACE_FILE is set
+tracer = Tracer(os.getenv("TRACE_FILE"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate pipeline traces into per-stage totals.")
+    parser.add_argument("trace_file", nargs="?", default=os.getenv("TRACE_FILE", "traces/spans.jsonl"))
+    parser.add_argument("--format", choices=("prometheus", "json"), default="prometheus")
+    args = parser.parse_args()
+
+    totals = aggregate(read_traces(args.trace_file))
+    if args.format == "json":
+        print(json.dumps(totals, indent=2))
+    else:
+        print(prometheus_text(totals), end="")
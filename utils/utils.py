@@ -1,5 +1,15 @@
 import os
+import hashlib
 
 def ensure_folder_exists(folder_path):
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    # SHA-1 of a file's contents, read in chunks so large videos don't have to fit in memory
+    digest = hashlib.sha1()
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
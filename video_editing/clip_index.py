@@ -0,0 +1,122 @@
+import os
+import json
+import random
+from utils.ffmpeg import probe_media
+
+CLIP_EXTENSIONS = (".mp4",)
+
+
+class ClipIndex:
+    """
+    Persistent metadata index for a folder of background clips.
+
+    Each clip's duration, resolution, fps, codec, size and mtime are stored in a JSON file next
+    to the clips. Clips are only probed again when their size or mtime changes, so selecting
+    clips for a video doesn't need to open any of them.
+    """
+
+    def __init__(self, clips_folder, index_path=None):
+        self.clips_folder = clips_folder
+        self.index_path = index_path or os.path.join(clips_folder, ".clip_index.json")
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self._entries, index_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def refresh(self):
+        """
+        Brings the index up to date with the folder and returns its entries.
+
+        Returns:
+        - list: One dict per clip with path, duration, width, height, fps, codec, size and mtime.
+        """
+        changed = False
+        seen = set()
+
+        for filename in sorted(os.listdir(self.clips_folder)):
+            if not filename.endswith(CLIP_EXTENSIONS):
+                continue
+            seen.add(filename)
+            stat = os.stat(os.path.join(self.clips_folder, filename))
+
+            entry = self._entries.get(filename)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+
+            # New or modified clip: probe it once and remember the result
+            try:
+                media = probe_media(os.path.join(self.clips_folder, filename))
+            except RuntimeError as e:
+                print(f"Skipping unreadable clip {filename}. Reason: {e}")
+                self._entries.pop(filename, None)
+                changed = True
+                continue
+
+            self._entries[filename] = {
+                "duration": media["duration"],
+                "width": media["width"],
+                "height": media["height"],
+                "fps": media["fps"],
+                "codec": media["video_codec"],
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+            changed = True
+
+        # Forget clips that were removed from the folder
+        for filename in list(self._entries):
+            if filename not in seen:
+                del self._entries[filename]
+                changed = True
+
+        if changed:
+            self._save()
+
+        return self.entries()
+
+    def entries(self):
+        return [
+            dict(entry, path=os.path.join(self.clips_folder, filename))
+            for filename, entry in sorted(self._entries.items())
+        ]
+
+
+def select_clips(entries, duration, rng=random):
+    """
+    Picks a random run of clips covering the requested duration using only index metadata.
+
+    Returns:
+    - list: (path, clip_duration) pairs in playback order; the last clip's duration is trimmed
+      so the total matches the requested duration. If the library is shorter than the requested
+      duration, every clip is used.
+    """
+    entries = list(entries)
+    rng.shuffle(entries)
+
+    selection = []
+    total_duration = 0
+
+    for entry in entries:
+        if total_duration >= duration:
+            break
+        clip_duration = entry["duration"]
+
+        if total_duration + clip_duration > duration:
+            # Trim the clip to match the remaining duration
+            selection.append((entry["path"], duration - total_duration))
+            break
+
+        selection.append((entry["path"], clip_duration))
+        total_duration += clip_duration
+
+    return selection
@@ -0,0 +1,155 @@
+import os
+import json
+import random
+import math
+import shutil
+import hashlib
+import tempfile
+from utils.ffmpeg import run_ffmpeg, probe_media
+from utils.utils import hash_file
+from video_editing.clip_index import ClipIndex, select_clips
+
+# Canonical profile every background clip is conformed to once
+MEZZANINE_WIDTH = 1080
+MEZZANINE_HEIGHT = 1920
+MEZZANINE_FPS = 30
+# Keyframe interval in seconds; every GOP boundary is a clean stream-copy cut point
+MEZZANINE_GOP_SECONDS = 1
+
+MEZZANINE_ENCODE_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "medium",
+    "-crf", "18",
+    "-pix_fmt", "yuv420p",
+    "-r", str(MEZZANINE_FPS),
+    # Fixed, closed GOPs without scene-cut keyframes so cut points are predictable
+    "-g", str(MEZZANINE_FPS * MEZZANINE_GOP_SECONDS),
+    "-keyint_min", str(MEZZANINE_FPS * MEZZANINE_GOP_SECONDS),
+    "-sc_threshold", "0",
+    "-x264-params", "open-gop=0",
+    "-an",
+]
+
+MEZZANINE_FILTER = (
+    f"scale={MEZZANINE_WIDTH}:{MEZZANINE_HEIGHT}:force_original_aspect_ratio=increase,"
+    f"crop={MEZZANINE_WIDTH}:{MEZZANINE_HEIGHT},setsar=1,fps={MEZZANINE_FPS}"
+)
+
+# Changing the profile changes every cache key, so stale conforms are never reused
+PROFILE_SIGNATURE = json.dumps([MEZZANINE_FILTER, MEZZANINE_ENCODE_ARGS])
+
+
+def conform_clip(source_path, output_path):
+    # Transcode a clip to the canonical resolution, frame rate and GOP structure
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.mp4"
+    run_ffmpeg(["-i", source_path, "-vf", MEZZANINE_FILTER] + MEZZANINE_ENCODE_ARGS + [tmp_path])
+    os.replace(tmp_path, output_path)
+
+
+def conform_library(background_clips_folder, cache_folder="mezzanine_clips"):
+    """
+    Conforms every clip in the background folder to the mezzanine profile, once.
+
+    Conformed clips are cached as <source hash>.mp4. Source hashes are remembered by size and
+    mtime in sources.json so unchanged clips are neither re-hashed nor re-encoded.
+
+    Returns:
+    - list: One dict per conformed clip with its path and duration, usable with select_clips.
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    sources_path = os.path.join(cache_folder, "sources.json")
+    try:
+        with open(sources_path, "r", encoding="utf-8") as sources_file:
+            sources = json.load(sources_file)
+    except (OSError, ValueError):
+        sources = {}
+
+    conformed = []
+    for entry in ClipIndex(background_clips_folder).refresh():
+        source_path = entry["path"]
+        known = sources.get(source_path)
+
+        if known and known["size"] == entry["size"] and known["mtime"] == entry["mtime"]:
+            key = known["key"]
+        else:
+            key = hashlib.sha1((hash_file(source_path) + PROFILE_SIGNATURE).encode("utf-8")).hexdigest()
+            known = None
+
+        conformed_path = os.path.join(cache_folder, f"{key}.mp4")
+        if not os.path.exists(conformed_path):
+            print(f"Conforming {source_path}")
+            conform_clip(source_path, conformed_path)
+            known = None
+
+        if known is None:
+            known = {
+                "size": entry["size"],
+                "mtime": entry["mtime"],
+                "key": key,
+                "duration": probe_media(conformed_path)["duration"],
+            }
+            sources[source_path] = known
+
+        conformed.append({"path": conformed_path, "duration": known["duration"]})
+
+    tmp_path = f"{sources_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as sources_file:
+        json.dump(sources, sources_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, sources_path)
+
+    return conformed
+
+
+def build_background_track(background_clips_folder, duration, output_path, cache_folder="mezzanine_clips", rng=random):
+    """
+    Builds a background track of the requested duration from conformed clips with a concat
+    that stream-copies everything except the final partial GOP.
+
+    Whole clips are copied as they are. The last clip is cut at the last keyframe before the
+    remaining duration (stream copy) and only the remainder after that keyframe is re-encoded.
+
+    Returns:
+    - str: Path to the background track (video only).
+    """
+    conformed = conform_library(background_clips_folder, cache_folder)
+    full_durations = {entry["path"]: entry["duration"] for entry in conformed}
+    selection = select_clips(conformed, duration, rng)
+
+    work_folder = tempfile.mkdtemp(prefix="track_", dir=cache_folder)
+    try:
+        parts = []
+        for clip_path, clip_duration in selection:
+            if clip_duration >= full_durations[clip_path]:
+                parts.append(os.path.abspath(clip_path))
+                continue
+
+            # Keyframe-aligned head of the partial clip: stream copy
+            head_duration = math.floor(clip_duration / MEZZANINE_GOP_SECONDS) * MEZZANINE_GOP_SECONDS
+            if head_duration > 0:
+                head_path = os.path.join(work_folder, "head.mp4")
+                run_ffmpeg(["-i", clip_path, "-t", f"{head_duration:.3f}", "-c", "copy", head_path])
+                parts.append(os.path.abspath(head_path))
+
+            # Remainder after the last keyframe: the only re-encoded segment
+            tail_duration = clip_duration - head_duration
+            if tail_duration >= 1 / MEZZANINE_FPS:
+                tail_path = os.path.join(work_folder, "tail.mp4")
+                run_ffmpeg(
+                    ["-ss", f"{head_duration:.3f}", "-i", clip_path, "-t", f"{tail_duration:.3f}"]
+                    + MEZZANINE_ENCODE_ARGS
+                    + [tail_path]
+                )
+                parts.append(os.path.abspath(tail_path))
+
+        list_path = os.path.join(work_folder, "concat.txt")
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            for part in parts:
+                escaped = part.replace("'", "'\\''")
+                list_file.write(f"file '{escaped}'\n")
+
+        # Stitch the parts without re-encoding
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path])
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    return output_path
@@ -0,0 +1,139 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def process_rss():
+    # Resident memory of this process in bytes, from /proc on Linux
+    try:
+        with open("/proc/self/status", "r") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class ReaderSession:
+    """
+    The readers a stage acquired from a ReaderPool; closing the session releases all of them,
+    so a stage frees its ffmpeg processes when it ends even if it fails half way.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.clips = []
+
+    def open(self, path, audio=False, target_resolution=None):
+        clip = self.pool.acquire(path, audio=audio, target_resolution=target_resolution)
+        self.clips.append(clip)
+        return clip
+
+    def close(self):
+        while self.clips:
+            self.pool.release(self.clips.pop())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReaderPool:
+    """
+    Shares and bounds the ffmpeg readers behind VideoFileClips.
+
+    Opening the same file with the same options again returns the clip that is already open.
+    At most max_open video readers keep an ffmpeg process running: when another one is needed,
+    the least recently read idle reader is suspended (its process is stopped) and moviepy
+    restarts it at the right position the next time a frame is read from it. A clip is closed
+    as soon as the last session holding it is closed.
+    """
+
+    def __init__(self, max_open=8):
+        self.max_open = max_open
+        self._entries = {}
+        # Video readers with a running process, least recently read first
+        self._live = OrderedDict()
+        self._lock = threading.RLock()
+        self.opened = 0
+        self.reused = 0
+        self.suspended = 0
+
+    def session(self):
+        return ReaderSession(self)
+
+    def acquire(self, path, audio=False, target_resolution=None):
+        # Imported on first use, so importing the pipeline doesn't load moviepy
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+
+        key = (os.path.abspath(path), audio, tuple(target_resolution) if target_resolution else None)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["references"] += 1
+                self.reused += 1
+                return entry["clip"]
+
+            # The reader starts decoding as soon as the clip is created, so free a slot first;
+            # background clips never need their audio, which would be a second ffmpeg process
+            self._make_room(None)
+            clip = VideoFileClip(path, audio=audio, target_resolution=target_resolution)
+            self.opened += 1
+            self._entries[key] = {"clip": clip, "references": 1}
+            self._track(clip.reader)
+            return clip
+
+    def release(self, clip):
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["clip"] is clip:
+                    entry["references"] -= 1
+                    if entry["references"] == 0:
+                        del self._entries[key]
+                        self._live.pop(id(clip.reader), None)
+                        clip.close()
+                    return
+
+    def _track(self, reader):
+        # Route the reader's frame reads through the pool, to keep the live set bounded
+        get_frame = reader.get_frame
+
+        def pooled_get_frame(t):
+            with self._lock:
+                if not reader.proc:
+                    self._make_room(reader)
+                self._live[id(reader)] = reader
+                self._live.move_to_end(id(reader))
+            return get_frame(t)
+
+        reader.get_frame = pooled_get_frame
+        self._live[id(reader)] = reader
+
+    def _make_room(self, keep):
+        # Suspend the least recently read readers so that, with keep running, at most max_open run
+        running = [reader for reader in self._live.values() if reader.proc and reader is not keep]
+        for reader in running[:max(0, len(running) - (self.max_open - 1))]:
+            reader.close()
+            del self._live[id(reader)]
+            self.suspended += 1
+
+    def stats(self):
+        with self._lock:
+            live = [reader for reader in self._live.values() if reader.proc]
+            return {
+                "clips": len(self._entries),
+                "open_readers": len(live),
+                "opened": self.opened,
+                "reused": self.reused,
+                "suspended": self.suspended,
+                # Decoded frame held by every running reader
+                "frame_buffer_bytes": sum(reader.size[0] * reader.size[1] * reader.depth for reader in live),
+                "rss_bytes": process_rss(),
+            }
+
+
+# Shared pool of the process; READER_POOL_MAX_OPEN caps the running ffmpeg readers
+reader_pool = ReaderPool(max_open=int(os.getenv("READER_POOL_MAX_OPEN", 8)))
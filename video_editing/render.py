@@ -0,0 +1,117 @@
+import os
+import random
+from video_editing.video import build_background_video, close_clips, load_narration, NARRATION_VOLUME
+from video_editing.readers import reader_pool
+from sub_generation.sub import overlay_subtitles, captions_to_ass, check_caption_backend
+from sub_generation.ass import ass_filter
+from music_generation.music import mix_background_music
+from utils.render_profiles import get_render_profile
+from video_editing.segments import render_video_segmented
+from utils.tracing import tracer
+
+def render_video(
+    background_clips_folder,
+    audio_file,
+    srt_file,
+    output_video_file,
+    music_folder="music_clips",
+    output_folder="final_videos",
+    conform=False,
+    seed=None,
+    profile="standard",
+    segments=1,
+    caption_backend="sprites"
+):
+    """
+    Renders the finished video in a single encode. The background clip concat, the narration,
+    the subtitle overlays and the background music mix are composed into one timeline and
+    written once, instead of going through add_audio_to_video, add_subtitles_to_video and
+    add_background_music, which each decode and re-encode the previous step's output.
+
+    Parameters:
+    - background_clips_folder (str): Path to the folder containing background video clips.
+    - audio_file (str or Narration): Path to the narration audio file, or the narration in memory.
+    - srt_file (str): Path to the word-level SRT file generated from the narration.
+    - output_video_file (str): Filename for the final video.
+    - music_folder (str): Path to the folder containing music clips.
+    - output_folder (str): Path to the folder where the final video will be saved.
+    - conform (bool): Build the background from the conformed clip cache with a stream-copy concat.
+    - seed (int): Seed for the clip and music selection, making the render reproducible.
+    - profile (str): Render profile (draft, standard or archive) setting resolution and encoder options.
+    - segments (int): With more than one, render segments in parallel processes and stitch them
+      (see render_video_segmented); None uses one segment per CPU. Requires conform.
+    - caption_backend (str): "sprites" composites the captions in Python, "ass" has ffmpeg's
+      libass filter burn them in during the encode.
+
+    Returns:
+    - str: Path to the final video file, or None if no background music is available.
+    """
+
+    if segments != 1:
+        return render_video_segmented(
+            background_clips_folder,
+            audio_file,
+            srt_file,
+            output_video_file,
+            music_folder=music_folder,
+            output_folder=output_folder,
+            conform=conform,
+            seed=seed,
+            profile=profile,
+            segments=segments,
+            caption_backend=caption_backend
+        )
+
+    rng = random.Random(seed) if seed is not None else random
+    profile = get_render_profile(profile)
+    check_caption_backend(caption_backend)
+
+    # Load the narration; it and every clip and reader opened below are released when the
+    # render ends, also when it fails
+    audio = load_narration(audio_file)
+    source_clips, audio_clips, final_video = [], [], None
+    ass_path, temporary_ass = None, False
+    try:
+        # Build the background track covering the narration
+        background, source_clips = build_background_video(background_clips_folder, audio.duration, conform=conform, rng=rng, profile=profile)
+        video = background.set_audio(audio)
+
+        # Overlay the subtitles on the same timeline, or leave them to libass in the encode
+        if caption_backend == "ass":
+            ass_path, temporary_ass = captions_to_ass(srt_file, background.w, background.h, profile.scale)
+            video_with_subtitles = video
+        else:
+            video_with_subtitles = overlay_subtitles(video, srt_file, profile.scale)
+
+        # Mix the background music under the narration, replacing the narration-only audio
+        mixed = mix_background_music(video_with_subtitles, music_folder, rng=rng, narration=audio_file, narration_gain=NARRATION_VOLUME)
+        if mixed is None:
+            return None
+        final_video, audio_clips = mixed
+
+        # Ensure the output folder exists
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+        output_path = os.path.join(output_folder, output_video_file)
+
+        # Write the final video file with the only encode of the pipeline
+        options = profile.write_options(background.fps)
+        if ass_path:
+            options["ffmpeg_params"] += ["-vf", ass_filter(ass_path)]
+        with tracer.span("composite_encode", step="render", captions=caption_backend, frames=int(final_video.duration * options["fps"])):
+            final_video.write_videofile(output_path, **options)
+    finally:
+        # Close the clips to release resources
+        close_clips(audio_clips)
+        if final_video is not None:
+            final_video.close()
+        close_clips(source_clips)
+        audio.close()
+        if temporary_ass:
+            os.unlink(ass_path)
+
+    print(f"Reader pool: {reader_pool.stats()}")
+
+    print(f"Final video saved to {output_path}")
+    return output_path
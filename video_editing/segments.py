@@ -0,0 +1,207 @@
+import os
+import math
+import random
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from video_editing.video import plan_background, open_background_range, close_clips, NARRATION_VOLUME
+from video_editing.mezzanine import MEZZANINE_GOP_SECONDS
+from sub_generation.sub import overlay_subtitles, captions_to_ass, check_caption_backend
+from sub_generation.ass import ass_filter
+from music_generation.music import mix_soundtrack
+from audio_generation.pcm import Narration
+from utils.ffmpeg import run_ffmpeg, probe_media
+from utils.render_profiles import get_render_profile
+from utils.tracing import tracer
+
+
+def available_cpus():
+    # CPUs this process may run on, which can be fewer than the machine has (e.g. in containers)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def check_segments(segments, conform):
+    # Unconformed clips have keyframes wherever their encoder put them, so segments of them
+    # would neither start on a keyframe nor seek to their first frame without decoding ahead
+    if segments != 1 and not conform:
+        raise ValueError("Segmented renders need the conformed background (conform=True, --conform)")
+
+
+def plan_segments(duration, fps, segments, boundary_seconds=MEZZANINE_GOP_SECONDS):
+    """
+    Splits a timeline of duration seconds at fps into at most segments ranges of whole frames.
+
+    Boundaries fall on multiples of boundary_seconds, the keyframe interval of conformed clips,
+    so every segment starts on a source keyframe and seeks to it without decoding ahead.
+
+    Returns:
+    - list: (start_frame, frame_count) of each segment, in order.
+    """
+    total_frames = int(round(duration * fps))
+    boundary_frames = max(1, int(round(boundary_seconds * fps)))
+    segment_frames = math.ceil(total_frames / max(1, segments) / boundary_frames) * boundary_frames
+
+    plan = []
+    for start_frame in range(0, total_frames, max(1, segment_frames)):
+        plan.append((start_frame, min(segment_frames, total_frames - start_frame)))
+    return plan
+
+
+def render_segment(background, srt_file, start_frame, frame_count, fps, profile, output_path, job_id=None, caption_backend="sprites"):
+    """
+    Renders frames [start_frame, start_frame + frame_count) of the background with its captions
+    to a video-only file. Runs in a worker process, rebuilding its part of the timeline from the
+    background plan. With the "ass" caption backend libass burns the captions in during the
+    encode, shifted to the segment's place on the subtitle timeline.
+
+    Returns:
+    - str: output_path.
+    """
+    profile = get_render_profile(profile)
+    start = start_frame / fps
+    end = (start_frame + frame_count) / fps
+
+    with tracer.job(job_id), tracer.span("segment_encode", frames=frame_count):
+        clip, source_clips = open_background_range(background, start, end, profile)
+        segment = None
+        ass_path, temporary_ass = None, False
+        # The clips and their readers are released when the segment ends, also when it fails
+        try:
+            options = profile.write_options(fps)
+            if caption_backend == "ass":
+                ass_path, temporary_ass = captions_to_ass(srt_file, clip.w, clip.h, profile.scale)
+                # The retimed filter output loses the input rate, so set it on the output again
+                options["ffmpeg_params"] += ["-vf", ass_filter(ass_path, offset=start), "-r", str(fps)]
+                segment = clip
+            else:
+                segment = overlay_subtitles(clip, srt_file, profile.scale, offset=start)
+
+            # Stop half a frame early so moviepy's frame loop yields exactly frame_count frames
+            segment = segment.subclip(0, min((frame_count - 0.5) / fps, segment.duration))
+            segment.write_videofile(output_path, audio=False, logger=None, **options)
+        finally:
+            if segment is not None:
+                segment.close()
+            close_clips(source_clips)
+            if temporary_ass:
+                os.unlink(ass_path)
+
+    return output_path
+
+
+def render_video_segmented(
+    background_clips_folder,
+    audio_file,
+    srt_file,
+    output_video_file,
+    music_folder="music_clips",
+    output_folder="final_videos",
+    conform=False,
+    seed=None,
+    profile="standard",
+    segments=None,
+    caption_backend="sprites"
+):
+    """
+    Renders the finished video like render_video, but splits the timeline into segments that
+    are composited and encoded in parallel worker processes. The segments are stitched with an
+    ffmpeg stream-copy concat and the soundtrack is mixed and muxed once at the end, so a single
+    long video uses every core instead of one Python frame loop.
+
+    Segment boundaries are only keyframes of the background when it is built from conformed
+    clips, whose GOPs are MEZZANINE_GOP_SECONDS long, so segmented renders require conform.
+
+    Parameters:
+    - segments (int): Number of segments and worker processes; defaults to, and is capped at,
+      the number of CPUs this process may use. With one segment or CPU it renders in a single pass.
+    - conform (bool): Must be True.
+    - See render_video for the other parameters.
+
+    Returns:
+    - str: Path to the final video file, or None if no background music is available.
+    """
+    check_segments(segments, conform)
+
+    # Segments beyond the CPUs only add overhead; with a single CPU a plain single pass is faster
+    cpus = available_cpus()
+    segments = min(segments or cpus, cpus)
+    if segments < 2:
+        from video_editing.render import render_video
+        print(f"Rendering in a single pass: {cpus} CPU(s) available")
+        return render_video(
+            background_clips_folder,
+            audio_file,
+            srt_file,
+            output_video_file,
+            music_folder=music_folder,
+            output_folder=output_folder,
+            conform=conform,
+            seed=seed,
+            profile=profile,
+            segments=1,
+            caption_backend=caption_backend
+        )
+
+    rng = random.Random(seed) if seed is not None else random
+    profile = get_render_profile(profile)
+    check_caption_backend(caption_backend)
+
+    duration = audio_file.duration if isinstance(audio_file, Narration) else probe_media(audio_file)["duration"]
+
+    # Pick the background and the music in the same order as render_video
+    with tracer.span("background_concat", conform=conform):
+        background = plan_background(background_clips_folder, duration, conform=conform, rng=rng)
+    mix = mix_soundtrack(duration, music_folder, rng=rng, narration=audio_file, narration_gain=NARRATION_VOLUME)
+    if mix is None:
+        if "track" in background:
+            os.unlink(background["track"])
+        return None
+
+    fps = profile.fps or background["fps"]
+    plan = plan_segments(duration, fps, segments)
+    segment_folder = tempfile.mkdtemp(prefix="segments_")
+
+    try:
+        with tracer.span("composite_encode", step="segments", segments=len(plan), frames=sum(count for _, count in plan)):
+            # Composite and encode the segments in parallel; each one starts with a keyframe
+            segment_paths = [os.path.join(segment_folder, f"segment{index:04d}.mp4") for index in range(len(plan))]
+            with ProcessPoolExecutor(max_workers=min(segments, len(plan))) as executor:
+                futures = [
+                    executor.submit(render_segment, background, srt_file, start_frame, frame_count, fps, profile, path, tracer.job_id, caption_backend)
+                    for (start_frame, frame_count), path in zip(plan, segment_paths)
+                ]
+                for future in futures:
+                    future.result()
+            print(f"Rendered {len(plan)} segments")
+
+            concat_list = os.path.join(segment_folder, "segments.txt")
+            with open(concat_list, "w", encoding="utf-8") as list_file:
+                for path in segment_paths:
+                    list_file.write(f"file '{os.path.abspath(path)}'\n")
+
+            if not os.path.exists(output_folder):
+                os.makedirs(output_folder)
+            output_path = os.path.join(output_folder, output_video_file)
+
+            # Stitch the segments without re-encoding and mux the soundtrack, the only audio encode
+            run_ffmpeg([
+                "-f", "concat", "-safe", "0", "-i", concat_list,
+                "-i", mix.path,
+                "-map", "0:v", "-map", "1:a",
+                "-c:v", "copy",
+                "-c:a", "aac", "-b:a", profile.audio_bitrate,
+                "-movflags", "+faststart",
+                output_path,
+            ])
+    finally:
+        shutil.rmtree(segment_folder, ignore_errors=True)
+        mix.close()
+        if "track" in background:
+            os.unlink(background["track"])
+
+    print(f"Final video saved to {output_path}")
+    return output_path
@@ -1,50 +1,154 @@
 import os
 import random
-from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_videoclips
+import tempfile
+# moviepy's submodules rather than moviepy.editor, which also imports IPython and every effect
+from video_editing.clip_index import ClipIndex, select_clips
+from video_editing.readers import reader_pool
+from video_editing.mezzanine import build_background_track, MEZZANINE_WIDTH, MEZZANINE_HEIGHT, MEZZANINE_FPS
+from utils.render_profiles import get_render_profile
+from utils.tracing import tracer
 
-def add_audio_to_video(background_clips_folder, audio_file, output_video, output_folder="audio_vids"):
-    # Load the generated audio file to get its duration
-    audio = AudioFileClip(audio_file).volumex(0.85)
-    audio_duration = audio.duration
+# Level of the narration in the final mix
+NARRATION_VOLUME = 0.85
 
 
-    # Load all video files from the specified folder
-    background_clips = [os.path.join(background_clips_folder, f) for f in os.listdir(background_clips_folder) if f.endswith(".mp4")]
+class TemporaryTrack:
+    # A background track file that is deleted when its clip is closed
 
-    # Shuffle the background clips for random order
-    random.shuffle(background_clips)
+    def __init__(self, path, target_resolution=None):
+        self.path = path
+        self.readers = reader_pool.session()
+        self.clip = self.readers.open(path, target_resolution=target_resolution)
 
-    clips = []
-    total_duration = 0
+    def close(self):
+        self.readers.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
 
-    # Loop through background clips and trim them to fit audio duration
-    for clip_file in background_clips:
-        clip = VideoFileClip(clip_file)
-        clip_duration = clip.duration
 
-        if total_duration + clip_duration > audio_duration:
-            # Trim the clip to match the remaining duration
-            remaining_duration = (audio_duration) - total_duration
-            clip = clip.subclip(0, remaining_duration)
-            clips.append(clip)
-            break
-        else:
+def plan_background(background_clips_folder, duration, conform=False, rng=random):
+    """
+    Decides which footage covers the duration, without opening any clip.
+
+    Returns:
+    - dict: Either {"track": path, ...} for a stream-copied conformed track (a temporary file the
+      caller removes), or {"selection": [(path, duration), ...], "sizes": {path: (w, h)}, ...};
+      both carry the frame rate as "fps". The plan is plain data, so worker processes can
+      rebuild any range of the background from it.
+    """
+    if conform:
+        # Concatenate conformed clips with ffmpeg stream copy into one temporary track
+        handle, track_path = tempfile.mkstemp(prefix="background_", suffix=".mp4")
+        os.close(handle)
+        build_background_track(background_clips_folder, duration, track_path, rng=rng)
+        return {"track": track_path, "fps": MEZZANINE_FPS}
+
+    # Pick a randomized run of clips covering the duration from the clip index alone
+    entries = ClipIndex(background_clips_folder).refresh()
+    selection = select_clips(entries, duration, rng)
+    picked = [entry for entry in entries if entry["path"] in dict(selection)]
+    return {
+        "selection": selection,
+        "sizes": {entry["path"]: (entry["width"], entry["height"]) for entry in picked},
+        "fps": max((entry["fps"] or 0 for entry in picked), default=0) or MEZZANINE_FPS,
+    }
+
+
+def open_background_range(background, start, end, profile="standard"):
+    """
+    Opens the part [start, end) of a planned background as one clip starting at 0.
+
+    Returns:
+    - tuple: (clip, [reader session to close once the result is written]).
+    """
+    # Clips are opened at the profile's resolution, so ffmpeg scales them while decoding
+    profile = get_render_profile(profile)
+    readers = reader_pool.session()
+
+    try:
+        if "track" in background:
+            clip = readers.open(background["track"], target_resolution=profile.target_resolution(MEZZANINE_WIDTH, MEZZANINE_HEIGHT))
+            return clip.subclip(start, min(end, clip.duration)), [readers]
+
+        # Open only the clips overlapping the range, trimming them to it
+        clips = []
+        offset = 0.0
+        for clip_file, clip_duration in background["selection"]:
+            clip_start = max(start - offset, 0.0)
+            clip_end = min(end - offset, clip_duration)
+            offset += clip_duration
+            if clip_start >= clip_end:
+                continue
+
+            clip = readers.open(clip_file, target_resolution=profile.target_resolution(*background["sizes"][clip_file]))
+            if clip_start > 0 or clip_end < clip.duration:
+                clip = clip.subclip(clip_start, min(clip_end, clip.duration))
             clips.append(clip)
-            total_duration += clip_duration
 
-    # Concatenate the video clips
-    final_clip = concatenate_videoclips(clips)
+        # Concatenate the video clips; the readers must be released once the result is written
+        from moviepy.video.compositing.concatenate import concatenate_videoclips
+        return concatenate_videoclips(clips), [readers]
+    except Exception:
+        readers.close()
+        raise
 
-    # Set the generated audio as the video’s audio
-    final_clip = final_clip.set_audio(audio)
 
-    # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+def build_background_video(background_clips_folder, duration, conform=False, rng=random, profile="standard"):
+    with tracer.span("background_concat", conform=conform):
+        background = plan_background(background_clips_folder, duration, conform=conform, rng=rng)
 
-    output_path = os.path.join(output_folder, output_video)
+        if "track" in background:
+            # Read the conformed track back as one clip, deleting it once closed
+            track = TemporaryTrack(background["track"], get_render_profile(profile).target_resolution(MEZZANINE_WIDTH, MEZZANINE_HEIGHT))
+            return track.clip, [track]
 
-    # Write the final video file
-    final_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
-    return output_path
+        return open_background_range(background, 0.0, duration, profile)
+
+
+def close_clips(clips):
+    # Release the ffmpeg readers held by the given clips
+    for clip in clips:
+        clip.close()
 
+
+def load_narration(audio_file):
+    # Load the narration, from a file or from memory, at the level used in the final mix
+    from moviepy.audio.io.AudioFileClip import AudioFileClip
+    from moviepy.audio.fx.volumex import volumex
+
+    if isinstance(audio_file, str):
+        return AudioFileClip(audio_file).fx(volumex, NARRATION_VOLUME)
+    return audio_file.to_audio_clip().fx(volumex, NARRATION_VOLUME)
+
+
+def add_audio_to_video(background_clips_folder, audio_file, output_video, output_folder="audio_vids", conform=False, profile="standard"):
+    profile = get_render_profile(profile)
+
+    # Load the generated audio file to get its duration
+    audio = load_narration(audio_file)
+    audio_duration = audio.duration
+
+    # Build the randomized background track covering the audio; the clips are released when
+    # the step ends, also when it fails
+    source_clips = []
+    try:
+        final_clip, source_clips = build_background_video(background_clips_folder, audio_duration, conform=conform, profile=profile)
+
+        # Set the generated audio as the video’s audio
+        final_clip = final_clip.set_audio(audio)
+
+        # Ensure the output folder exists
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+        output_path = os.path.join(output_folder, output_video)
+
+        # Write the final video file
+        options = profile.write_options(final_clip.fps)
+        with tracer.span("composite_encode", step="audio", frames=int(final_clip.duration * options["fps"])):
+            final_clip.write_videofile(output_path, **options)
+    finally:
+        # Close the clips to release resources
+        close_clips(source_clips)
+        audio.close()
+    return output_path